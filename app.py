@@ -3,20 +3,52 @@ import logging
 from flask import Flask
 from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
+from config import get_config, configure_logging
+from request_metrics import init_request_metrics
+from app_logging import init_request_id
+from compression import init_compression
+from rate_limit import init_rate_limit
+from db_routing import init_db_routing
+from warmup import init_template_cache
+from http_cache import init_http_cache
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging for the selected runtime mode (APP_ENV)
+config = get_config()
+configure_logging(config)
 
 # Create the app
 app = Flask(__name__)
+app.config.from_object(config)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+# One trusted proxy hop (the Fly.io edge) sets X-Forwarded-For
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
+
+# Request ids for log records and the X-Request-ID header
+init_request_id(app)
+
+# Round-trip and render-time accounting (Server-Timing header)
+init_request_metrics(app)
+
+# Per-client and global request limits, checked before any database work
+init_rate_limit(app)
+
+# Replay admin writes to the primary region; read-your-writes after them
+init_db_routing(app)
+
+# Minify HTML and gzip/brotli-compress HTML and JSON responses
+init_compression(app)
+
+# Persistent bytecode cache for compiled templates
+init_template_cache(app)
+
+# ETag/304 validators for public pages and surrogate-key purge headers
+init_http_cache(app)
 
 # Import routes after app creation to avoid circular imports
 from routes import *
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=app.config['DEBUG'])
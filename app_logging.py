@@ -0,0 +1,131 @@
+"""
+Non-blocking, structured application logging.
+
+Request threads only append records to an in-memory queue; one
+QueueListener thread formats them and writes them to stderr, so a request
+never waits on a write() to the log pipe. With LOG_JSON every record is one
+JSON line carrying the id of the request that logged it (taken from the
+X-Request-ID or Fly-Request-Id header, or generated).
+
+Log calls should use lazy %-style arguments (``logger.info("x %s", y)``):
+the message is then only built on the listener thread, and not at all for
+suppressed levels.
+"""
+import os
+import sys
+import json
+import uuid
+import queue
+import atexit
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from flask import g, request, has_request_context
+
+REQUEST_ID_HEADERS = ('X-Request-ID', 'Fly-Request-Id')
+MAX_REQUEST_ID_LENGTH = 128
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id (or None) to every record."""
+
+    def filter(self, record):
+        record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; ``extra={'fields': {...}}`` adds top-level keys."""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        data.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread.
+
+    The stock handler merges args into the message in the logging thread so
+    records can be pickled; this queue never leaves the process.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class QueueLogging:
+    """The root logger's queue handler and the listener thread draining it."""
+
+    def __init__(self, handler: logging.Handler):
+        self.target = handler
+        self.handler = DeferredQueueHandler(queue.SimpleQueue())
+        self.handler.addFilter(RequestIdFilter())
+        self.listener = None
+
+    def start(self):
+        self.listener = logging.handlers.QueueListener(self.handler.queue, self.target,
+                                                       respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        """Flush queued records and stop the listener thread."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def restart_after_fork(self):
+        # The parent's listener thread does not exist in a forked child
+        # (gunicorn workers with preload_app), so give the child its own
+        self.listener = None
+        self.handler.queue = queue.SimpleQueue()
+        self.start()
+
+
+_installed = None
+
+
+def install_queue_logging(level, formatter: logging.Formatter) -> QueueLogging:
+    """Route all records of the root logger through a queue to stderr."""
+    global _installed
+    if _installed is not None:
+        _installed.stop()
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(formatter)
+    installed = QueueLogging(stream)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(installed.handler)
+    root.setLevel(level)
+    installed.start()
+
+    if _installed is None:
+        atexit.register(lambda: _installed and _installed.stop())
+        os.register_at_fork(after_in_child=lambda: _installed and _installed.restart_after_fork())
+    _installed = installed
+    return installed
+
+
+def init_request_id(app):
+    """Assign every request an id, echoed in the X-Request-ID response header."""
+    @app.before_request
+    def assign_request_id():
+        g.request_id = next((request.headers[name][:MAX_REQUEST_ID_LENGTH] for name in REQUEST_ID_HEADERS
+                             if request.headers.get(name)), None) or uuid.uuid4().hex
+
+    @app.after_request
+    def echo_request_id(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
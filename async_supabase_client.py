@@ -0,0 +1,484 @@
+"""
+Asyncio counterpart of SupabaseClient, for the async admin views.
+
+Flask runs every async view on an event loop of its own, and connections
+opened on one loop cannot be used from another. So that requests share one
+connection pool, each worker keeps a single client on an event loop thread
+of its own (WorkerLoop) and views await its queries there with run().
+"""
+import os
+import asyncio
+import logging
+import threading
+from dataclasses import replace
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+from datetime import datetime
+from models import CourseStats, Level, Section, Lesson, as_models
+from request_metrics import db_call, record_snapshot_read
+from supabase_client import (LEVEL_COLUMNS, SECTION_COLUMNS, LESSON_SUMMARY_COLUMNS, LESSON_COLUMNS,
+                             COURSE_STATS_COLUMNS, get_supabase_client)
+
+if TYPE_CHECKING:
+    import httpx
+    from supabase import AsyncClient
+    from course_snapshot import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on queries a single gather() keeps in flight
+DEFAULT_MAX_CONCURRENCY = 10
+
+
+class WorkerLoop:
+    """An event loop running on a daemon thread of the worker."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='supabase-async', daemon=True)
+        self._thread.start()
+
+    def run_sync(self, coro):
+        """Run coro on the loop and wait for its result from a thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def run(self, coro):
+        """Await coro on the loop from another event loop.
+
+        The coroutine runs in a copy of the caller's context, so request
+        metrics still count its queries.
+        """
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+
+class AsyncSupabaseClient:
+    """Asyncio counterpart of SupabaseClient with the same method surface.
+
+    The underlying HTTP connections belong to the event loop they were opened
+    on. Views use the worker's client from get_async_supabase_client():
+
+        db = get_async_supabase_client()
+        levels = await db.run(db.get_course_tree())
+
+    Scripts with a loop of their own use an instance as a context manager,
+    which closes its connections on exit:
+
+        async with AsyncSupabaseClient() as db:
+            levels = await db.get_course_tree()
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 http_client: Optional["httpx.AsyncClient"] = None,
+                 snapshot: Optional["SnapshotStore"] = None, worker_loop: Optional[WorkerLoop] = None):
+        """Read Supabase settings from environment variables.
+
+        Args:
+            max_concurrency: Queries a single gather() keeps in flight
+            http_client: HTTP client of every Supabase service; defaults to
+                the pooled, retrying client from http_transport
+            snapshot: Snapshot to read from when a read fails
+            worker_loop: Loop that run() executes queries on; None runs them
+                on the caller's loop
+        """
+        self.url = os.environ.get("SUPABASE_URL")
+        self.key = os.environ.get("SUPABASE_ANON_KEY")
+        self.service_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+        self.http_client = http_client
+        self.snapshot = snapshot
+        self.worker_loop = worker_loop
+        self.client: Optional["AsyncClient"] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self) -> "AsyncSupabaseClient":
+        await self._ensure_connection()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _ensure_connection(self):
+        """Establish connection to Supabase."""
+        if self.client:
+            return
+        if not self.url or not self.key:
+            logger.error("Missing Supabase URL or API key in environment variables")
+            return
+
+        try:
+            from supabase import acreate_client, AsyncClientOptions
+            from http_transport import build_async_http_client
+
+            if self.http_client is None:
+                self.http_client = build_async_http_client()
+            # Use service key for full access if available
+            self.client = await acreate_client(
+                self.url,
+                self.service_key or self.key,
+                options=AsyncClientOptions(httpx_client=self.http_client)
+            )
+        except Exception as e:
+            logger.error("Failed to initialize async Supabase client: %s", e)
+            self.client = None
+
+    async def close(self):
+        """Close the HTTP connections of every Supabase service of this client."""
+        self.client = None
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+    async def run(self, coro):
+        """Await a query (or gather() of queries) on the worker loop, if the client has one."""
+        if self.worker_loop is None:
+            return await coro
+        return await self.worker_loop.run(coro)
+
+    def _from_snapshot(self, method_name: str, *args, default=None):
+        """Answer a read from the on-disk snapshot after Supabase failed."""
+        snapshot = self.snapshot.get() if self.snapshot is not None else None
+        if snapshot is None:
+            return default
+        record_snapshot_read()
+        return getattr(snapshot, method_name)(*args)
+
+    @db_call
+    async def is_connected(self) -> bool:
+        """Check if the client is connected to Supabase."""
+        if not self.client:
+            return False
+        try:
+            await self.client.table('levels').select('id').limit(1).execute()
+            return True
+        except Exception as e:
+            logger.error("Connection check failed: %s", e)
+            return False
+
+    async def gather(self, *coros) -> List[Any]:
+        """Run independent queries concurrently, at most max_concurrency at a time."""
+        async def limited(coro):
+            async with self._semaphore:
+                return await coro
+        return await asyncio.gather(*(limited(coro) for coro in coros))
+
+    async def get_course_tree(self) -> Tuple[Level, ...]:
+        """Get all levels with their sections and each section's lessons.
+
+        Sections of all levels are fetched concurrently, then lessons of all
+        sections, so the whole tree costs three sequential waits instead of
+        one per row.
+        """
+        levels = await self.get_all_levels()
+        sections_by_level = await self.gather(
+            *(self.get_sections_by_level(level.id) for level in levels)
+        )
+        sections = [section for group in sections_by_level for section in group]
+        lessons_by_section = await self.gather(
+            *(self.get_lessons_by_section(section.id) for section in sections)
+        )
+        lessons_by_section_id = {
+            section.id: lessons for section, lessons in zip(sections, lessons_by_section)
+        }
+
+        return tuple(
+            replace(level, sections=tuple(
+                replace(section, lessons=lessons_by_section_id[section.id])
+                for section in level_sections
+            ))
+            for level, level_sections in zip(levels, sections_by_level)
+        )
+
+    async def get_level_sections(self, level_id: int) -> Tuple[Section, ...]:
+        """Get the sections of one level with their lessons in two sequential waits."""
+        sections = await self.get_sections_by_level(level_id)
+        lessons_by_section = await self.gather(
+            *(self.get_lessons_by_section(section.id) for section in sections)
+        )
+        return tuple(replace(section, lessons=lessons)
+                     for section, lessons in zip(sections, lessons_by_section))
+
+    @db_call
+    async def get_course_stats(self) -> Optional[CourseStats]:
+        """Counters of the course, each level and each section in one query."""
+        if not self.client:
+            return None
+        try:
+            response = await self.client.table('course_stats').select(COURSE_STATS_COLUMNS).execute()
+            return CourseStats.from_rows(response.data)
+        except Exception as e:
+            logger.error("Error fetching course stats: %s", e)
+            return None
+
+    # ===== LEVELS =====
+    @as_models(Level)
+    @db_call
+    async def get_all_levels(self) -> Tuple[Level, ...]:
+        """Get all levels ordered by order_index."""
+        if not self.client:
+            return self._from_snapshot('get_all_levels', default=[])
+        try:
+            response = await self.client.table('levels')\
+                .select(LEVEL_COLUMNS)\
+                .order('order_index')\
+                .execute()
+            return response.data
+        except Exception as e:
+            logger.error("Error fetching levels: %s", e)
+            return self._from_snapshot('get_all_levels', default=[])
+
+    @as_models(Level)
+    @db_call
+    async def create_level(self, title: str, order_index: int) -> Optional[Level]:
+        """Create a new level."""
+        if not self.client:
+            return None
+        try:
+            response = await self.client.table('levels')\
+                .insert({
+                    'title': title,
+                    'order_index': order_index
+                })\
+                .execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error("Error creating level: %s", e)
+            return None
+
+    @as_models(Level)
+    @db_call
+    async def update_level(self, level_id: int, title: str) -> Optional[Level]:
+        """Update an existing level."""
+        if not self.client:
+            return None
+        try:
+            response = await self.client.table('levels')\
+                .update({
+                    'title': title,
+                    'updated_at': datetime.utcnow().isoformat()
+                })\
+                .eq('id', level_id)\
+                .execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error("Error updating level: %s", e)
+            return None
+
+    @db_call
+    async def delete_level(self, level_id: int) -> bool:
+        """Delete a level by ID."""
+        if not self.client:
+            return False
+        try:
+            await self.client.table('levels')\
+                .delete()\
+                .eq('id', level_id)\
+                .execute()
+            return True
+        except Exception as e:
+            logger.error("Error deleting level: %s", e)
+            return False
+
+    # ===== SECTIONS =====
+    @as_models(Section)
+    @db_call
+    async def get_sections_by_level(self, level_id: int) -> Tuple[Section, ...]:
+        """Get all sections for a specific level."""
+        if not self.client:
+            return self._from_snapshot('get_sections_by_level', level_id, default=[])
+        try:
+            response = await self.client.table('sections')\
+                .select(SECTION_COLUMNS)\
+                .eq('level_id', level_id)\
+                .order('order_index')\
+                .execute()
+            return response.data
+        except Exception as e:
+            logger.error("Error fetching sections: %s", e)
+            return self._from_snapshot('get_sections_by_level', level_id, default=[])
+
+    @as_models(Section)
+    @db_call
+    async def create_section(self, level_id: int, title: str, order_index: int) -> Optional[Section]:
+        """Create a new section in a level."""
+        if not self.client:
+            return None
+        try:
+            response = await self.client.table('sections')\
+                .insert({
+                    'level_id': level_id,
+                    'title': title,
+                    'order_index': order_index
+                })\
+                .execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error("Error creating section: %s", e)
+            return None
+
+    @as_models(Section)
+    @db_call
+    async def update_section(self, section_id: int, title: str) -> Optional[Section]:
+        """Update an existing section."""
+        if not self.client:
+            return None
+        try:
+            response = await self.client.table('sections')\
+                .update({
+                    'title': title,
+                    'updated_at': datetime.utcnow().isoformat()
+                })\
+                .eq('id', section_id)\
+                .execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error("Error updating section: %s", e)
+            return None
+
+    @db_call
+    async def delete_section(self, section_id: int) -> bool:
+        """Delete a section by ID."""
+        if not self.client:
+            return False
+        try:
+            response = await self.client.table('sections')\
+                .delete()\
+                .eq('id', section_id)\
+                .execute()
+            return bool(response.data and len(response.data) > 0)
+        except Exception as e:
+            logger.error("Error deleting section %s: %s", section_id, e)
+            return False
+
+    # ===== LESSONS =====
+    @as_models(Lesson)
+    @db_call
+    async def get_lessons_by_section(self, section_id: int) -> Tuple[Lesson, ...]:
+        """Get summary rows (no content) of all lessons in a section."""
+        if not self.client:
+            return self._from_snapshot('get_lessons_by_section', section_id, default=[])
+        try:
+            response = await self.client.table('lessons')\
+                .select(LESSON_SUMMARY_COLUMNS)\
+                .eq('section_id', section_id)\
+                .order('order_index')\
+                .execute()
+            return response.data
+        except Exception as e:
+            logger.error("Error fetching lessons: %s", e)
+            return self._from_snapshot('get_lessons_by_section', section_id, default=[])
+
+    @as_models(Lesson)
+    @db_call
+    async def create_lesson(self, section_id: int, title: str, order_index: int,
+                            content: Optional[Dict] = None) -> Optional[Lesson]:
+        """Create a new lesson in a section."""
+        if not self.client:
+            return None
+        try:
+            data = {
+                'section_id': section_id,
+                'title': title,
+                'order_index': order_index
+            }
+            if content is not None:
+                data['content'] = content
+
+            response = await self.client.table('lessons')\
+                .insert(data)\
+                .execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error("Error creating lesson: %s", e)
+            return None
+
+    @as_models(Lesson)
+    @db_call
+    async def get_lesson_by_id(self, lesson_id: int) -> Optional[Lesson]:
+        """Get a specific lesson by ID, including its content."""
+        if not self.client:
+            return self._from_snapshot('get_lesson_by_id', lesson_id)
+        try:
+            response = await self.client.table('lessons')\
+                .select(LESSON_COLUMNS)\
+                .eq('id', lesson_id)\
+                .single()\
+                .execute()
+            return response.data if response.data else None
+        except Exception as e:
+            logger.error("Error fetching lesson %s: %s", lesson_id, e)
+            return self._from_snapshot('get_lesson_by_id', lesson_id)
+
+    @as_models(Lesson)
+    @db_call
+    async def update_lesson(self, lesson_id: int, title: str, content: Dict[str, Any]) -> Optional[Lesson]:
+        """Update an existing lesson."""
+        if not self.client:
+            return None
+        try:
+            response = await self.client.table('lessons')\
+                .update({
+                    'title': title,
+                    'content': content,
+                    'updated_at': datetime.utcnow().isoformat()
+                })\
+                .eq('id', lesson_id)\
+                .execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error("Error updating lesson %s: %s", lesson_id, e)
+            return None
+
+    @db_call
+    async def delete_lesson(self, lesson_id: int) -> bool:
+        """Delete a lesson by ID."""
+        if not self.client:
+            return False
+        try:
+            response = await self.client.table('lessons')\
+                .delete()\
+                .eq('id', lesson_id)\
+                .execute()
+            return bool(response.data and len(response.data) > 0)
+        except Exception as e:
+            logger.error("Error deleting lesson %s: %s", lesson_id, e)
+            return False
+
+    # ===== FILE UPLOADS =====
+    @db_call
+    async def upload_file(self, bucket_name: str, file_path: str, file_content: bytes,
+                          content_type: str = 'image/jpeg') -> Optional[str]:
+        """Upload a file to Supabase storage."""
+        if not self.client:
+            return None
+        try:
+            try:
+                await self.client.storage.get_bucket(bucket_name)
+            except Exception:
+                await self.client.storage.create_bucket(bucket_name, options={"public": True})
+
+            await self.client.storage.from_('local').upload(
+                path=file_path,
+                file=file_content,
+                file_options={"content-type": content_type}
+            )
+            return await self.client.storage.from_('local').get_public_url(file_path)
+        except Exception as e:
+            logger.error("Error uploading file: %s", e)
+            return None
+
+
+_worker_client: Optional[AsyncSupabaseClient] = None
+_worker_client_lock = threading.Lock()
+
+
+def get_async_supabase_client() -> AsyncSupabaseClient:
+    """The worker's AsyncSupabaseClient, connected on the worker's event loop thread.
+
+    It is created on first use, after gunicorn forks, and falls back to the
+    snapshot of the sync client.
+    """
+    global _worker_client
+    with _worker_client_lock:
+        if _worker_client is None:
+            client = AsyncSupabaseClient(snapshot=get_supabase_client().snapshot, worker_loop=WorkerLoop())
+            client.worker_loop.run_sync(client._ensure_connection())
+            _worker_client = client
+    return _worker_client
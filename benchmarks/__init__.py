@@ -0,0 +1,5 @@
+"""
+Benchmarks for the data layer and routes.
+
+Run from the repository root, e.g. ``python -m benchmarks.bench_async_dashboard``.
+"""
@@ -0,0 +1,91 @@
+"""
+Compare sync and async latency of loading the admin dashboard data set.
+
+Needs SUPABASE_URL and a key in the environment (or .env), and talks to the
+live project, so run it against a staging database.
+
+    python -m benchmarks.bench_async_dashboard --runs 20
+"""
+import time
+import asyncio
+import argparse
+import statistics
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from supabase_client import SupabaseClient
+from async_supabase_client import AsyncSupabaseClient, get_async_supabase_client
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{name:<28} median {statistics.median(timings) * 1000:8.1f} ms"
+          f"   p95 {p95 * 1000:8.1f} ms   min {timings[0] * 1000:8.1f} ms")
+
+
+def bench_sync(runs):
+    client = SupabaseClient()
+    client.cache.ttl = 0  # measure round trips, not the cache
+    client.get_course_tree()  # open the connection pool
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        client.get_course_tree()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def bench_async_per_request(runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        async with AsyncSupabaseClient() as db:
+            await db.get_course_tree()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def bench_async_reused(runs):
+    timings = []
+    async with AsyncSupabaseClient() as db:
+        await db.get_course_tree()
+        for _ in range(runs):
+            start = time.perf_counter()
+            await db.get_course_tree()
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_async_worker_client(runs):
+    """As the admin views run: a new event loop per request, queries on the worker's loop."""
+    db = get_async_supabase_client()
+    asyncio.run(db.run(db.get_course_tree()))
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        asyncio.run(db.run(db.get_course_tree()))
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    levels = SupabaseClient().get_course_tree()
+    sections = sum(len(level.sections) for level in levels)
+    lessons = sum(len(section.lessons) for level in levels for section in level.sections)
+    print(f"Dataset: {len(levels)} levels, {sections} sections, {lessons} lessons "
+          f"({1 + len(levels) + sections} queries per tree)\n")
+
+    report('sync', bench_sync(args.runs))
+    report('async, client per request', asyncio.run(bench_async_per_request(args.runs)))
+    report('async, reused client', asyncio.run(bench_async_reused(args.runs)))
+    report('async, worker client', bench_async_worker_client(args.runs))
+
+
+if __name__ == '__main__':
+    main()
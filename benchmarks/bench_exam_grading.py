@@ -0,0 +1,78 @@
+"""
+Exam grading time: a per-student Python loop vs the vectorized pass.
+
+A random class answers an exam; stronger students answer more questions
+right. Two graders produce the same scores, difficulty and discrimination:
+
+    loop        per-student, per-question Python loops over the submissions
+                (as checking quiz answers one at a time would)
+    vectorized  exam_grading.grade on the packed answer matrix
+
+Packing the JSON submissions into the matrix is timed separately, since a
+request pays for it too.
+
+    python -m benchmarks.bench_exam_grading --students 100 1000 5000 --questions 40
+"""
+import time
+import random
+import argparse
+from exam_grading import ExamQuestion, grade, pack_answer_key, pack_submissions
+
+
+def make_exam(students, questions, seed=0):
+    rng = random.Random(seed)
+    exam = [ExamQuestion(1, n, f'Q{n}', ('a', 'b', 'c', 'd'), rng.randrange(4)) for n in range(questions)]
+    submissions = []
+    for student in range(students):
+        skill = rng.random()
+        answers = [q.correct_answer if rng.random() < skill else rng.choice([None, 0, 1, 2, 3]) for q in exam]
+        submissions.append({'student': student, 'answers': answers})
+    return exam, submissions
+
+
+def grade_loop(exam, submissions):
+    key = [q.correct_answer for q in exam]
+    correct = [[answer == right for answer, right in zip(s['answers'], key)] for s in submissions]
+    scores = [sum(row) for row in correct]
+    difficulty, discrimination = [], []
+    for q in range(len(key)):
+        x = [float(row[q]) for row in correct]
+        rest = [score - xi for score, xi in zip(scores, x)]
+        mx, mr = sum(x) / len(x), sum(rest) / len(rest)
+        covariance = sum((a - mx) * (b - mr) for a, b in zip(x, rest))
+        spread = (sum((a - mx) ** 2 for a in x) * sum((b - mr) ** 2 for b in rest)) ** 0.5
+        difficulty.append(mx)
+        discrimination.append(covariance / spread if spread else float('nan'))
+    return scores, difficulty, discrimination
+
+
+def best_of(repeat, fn, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare loop and vectorized exam grading')
+    parser.add_argument('--students', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--questions', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'students':>9}{'loop ms':>10}{'pack ms':>10}{'grade ms':>10}{'speedup':>9}")
+    for students in args.students:
+        exam, submissions = make_exam(students, args.questions)
+        loop_ms, (scores, _, _) = best_of(args.repeat, grade_loop, exam, submissions)
+        pack_ms, (_, answers) = best_of(args.repeat, pack_submissions, submissions, len(exam))
+        grade_ms, report = best_of(args.repeat, grade, pack_answer_key(exam), answers)
+        assert report.scores.tolist() == scores
+        print(f"{students:9}{loop_ms:10.2f}{pack_ms:10.2f}{grade_ms:10.2f}{loop_ms / (pack_ms + grade_ms):8.1f}x")
+
+    print(f"\n{args.questions} questions, best of {args.repeat}; speedup counts packing and grading.")
+
+
+if __name__ == '__main__':
+    main()
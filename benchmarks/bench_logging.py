@@ -0,0 +1,136 @@
+"""
+Per-request logging overhead: synchronous handler vs the queue listener.
+
+Worker threads replay the log calls of one request (the request line with
+its metrics fields, a few suppressed DEBUG calls and an occasional error)
+many times. Two setups are compared:
+
+    sync    f-string messages, JSON formatted and written to the sink by the
+            request thread (the previous logging setup)
+    queued  lazy %-style messages put on the queue; formatting and writes
+            happen on the QueueListener thread (app_logging.py)
+
+The sink is a file; --write-delay-ms adds a sleep per write to model a slow
+or back-pressured log pipe.
+
+    python -m benchmarks.bench_logging --threads 8 --requests 2000
+"""
+import time
+import logging
+import argparse
+import tempfile
+import statistics
+import threading
+from app_logging import JsonFormatter, QueueLogging
+
+SETUPS = ['sync', 'queued']
+
+
+class SlowFileHandler(logging.FileHandler):
+    def __init__(self, path, delay):
+        super().__init__(path, encoding='utf-8')
+        self.write_delay = delay
+
+    def emit(self, record):
+        if self.write_delay:
+            time.sleep(self.write_delay)
+        super().emit(record)
+
+
+def request_fields(i):
+    return {'event': 'request', 'method': 'GET', 'path': f'/level-{i % 10}', 'endpoint': 'level_page',
+            'status': 200, 'duration_ms': 4.2, 'db_calls': 0, 'db_ms': 0.0, 'cache_hits': 3,
+            'snapshot_reads': 0, 'collapsed_reads': 0, 'template_ms': 1.1}
+
+
+def log_request_sync(logger, i):
+    fields = request_fields(i)
+    for table in ('levels', 'sections', 'lessons'):
+        logger.debug(f"Evicted cache for UPDATE on {table} {i} with {fields}")
+    if i % 50 == 0:
+        logger.error(f"Error fetching lesson {i}: {ConnectionError('connection reset')}")
+    logger.info(f"{fields['method']} {fields['path']} {fields['status']} in {fields['duration_ms']:.1f} ms",
+                extra={'fields': fields})
+
+
+def log_request_queued(logger, i):
+    fields = request_fields(i)
+    for table in ('levels', 'sections', 'lessons'):
+        logger.debug("Evicted cache for UPDATE on %s %s with %s", table, i, fields)
+    if i % 50 == 0:
+        logger.error("Error fetching lesson %s: %s", i, ConnectionError('connection reset'))
+    logger.info("%s %s %s in %.1f ms", fields['method'], fields['path'], fields['status'], fields['duration_ms'],
+                extra={'fields': fields})
+
+
+def run(setup, threads, requests, write_delay):
+    with tempfile.NamedTemporaryFile(suffix='.log') as sink:
+        target = SlowFileHandler(sink.name, write_delay)
+        target.setFormatter(JsonFormatter())
+        logger = logging.getLogger(f'bench_logging.{setup}')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        queued = None
+        if setup == 'queued':
+            queued = QueueLogging(target)
+            logger.handlers = [queued.handler]
+            queued.start()
+            log_request = log_request_queued
+        else:
+            logger.handlers = [target]
+            log_request = log_request_sync
+
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(offset):
+            own = []
+            for i in range(offset, offset + requests):
+                start = time.perf_counter()
+                log_request(logger, i)
+                own.append(time.perf_counter() - start)
+            with lock:
+                latencies.extend(own)
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=worker, args=(n * requests,)) for n in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        requests_done = time.perf_counter() - start
+        if queued:
+            queued.stop()
+        drained = time.perf_counter() - start
+        target.close()
+
+    latencies.sort()
+    return {
+        'mean': statistics.mean(latencies) * 1e6,
+        'p99': latencies[int(len(latencies) * 0.99)] * 1e6,
+        'requests_s': requests_done,
+        'drained_s': drained,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-request logging cost of sync and queued handlers')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000, help='requests per thread')
+    parser.add_argument('--write-delay-ms', type=float, default=0.0, help='extra time per write to the sink')
+    args = parser.parse_args()
+
+    print(f"{'setup':<8}{'mean us':>10}{'p99 us':>10}{'requests s':>12}{'drained s':>11}")
+    results = {}
+    for setup in SETUPS:
+        results[setup] = run(setup, args.threads, args.requests, args.write_delay_ms / 1000)
+        r = results[setup]
+        print(f"{setup:<8}{r['mean']:10.1f}{r['p99']:10.1f}{r['requests_s']:12.2f}{r['drained_s']:11.2f}")
+
+    print(f"\nPer-request logging time in the request thread, {args.threads} threads x {args.requests} requests.")
+    print(f"Saved per request: {results['sync']['mean'] - results['queued']['mean']:.1f} us mean, "
+          f"{results['sync']['p99'] - results['queued']['p99']:.1f} us p99")
+
+
+if __name__ == '__main__':
+    main()
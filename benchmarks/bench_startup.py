@@ -0,0 +1,112 @@
+"""
+Cold-start timing: template compilation at boot vs on the first requests.
+
+Each run starts a fresh interpreter, imports the app and sends the first
+index, level_page and lesson_page requests against the in-memory Supabase
+stand-in. Three boot strategies are compared:
+
+    lazy        no precompilation, templates compile on the first requests
+    precompile  all templates compiled from source at boot
+    bytecode    all templates loaded from a populated bytecode cache at boot
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+STRATEGIES = ['lazy', 'precompile', 'bytecode']
+FIRST_REQUESTS = [
+    ('index', '/'),
+    ('level_page', '/level-1'),
+    ('lesson_page', '/level-1/section-1-intro/lesson-1-intro'),
+]
+
+
+def run_child(strategy):
+    """Boot the app with one strategy and print timings as JSON."""
+    logging.disable(logging.WARNING)
+    start = time.perf_counter()
+    from app import app
+    from warmup import warmup_templates
+    from benchmarks.fixtures import generate_course
+    from benchmarks.run_benchmarks import install_fake_backend
+    timings = {'import': (time.perf_counter() - start) * 1000}
+
+    install_fake_backend(generate_course(10), latency=0)
+    if strategy != 'bytecode':
+        app.jinja_env.bytecode_cache = None
+
+    start = time.perf_counter()
+    if strategy != 'lazy':
+        warmup_templates(app)
+    timings['templates'] = (time.perf_counter() - start) * 1000
+
+    client = app.test_client()
+    for name, path in FIRST_REQUESTS:
+        start = time.perf_counter()
+        client.get(path).get_data()
+        timings[name] = (time.perf_counter() - start) * 1000
+    print(json.dumps(timings))
+
+
+def measure(strategy, cache_dir):
+    env = dict(os.environ, APP_ENV='production', JINJA_BYTECODE_CACHE_DIR=cache_dir)
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_startup', '--child', strategy],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def results_first(results, strategy):
+    """Median time of the first requests alone for a strategy."""
+    return sum(statistics.median(run[name] for run in results[strategy]) for name, _ in FIRST_REQUESTS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold-start time with and without template precompilation')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per strategy')
+    parser.add_argument('--child', choices=STRATEGIES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    cache_dir = tempfile.mkdtemp(prefix='jinja-cache-')
+    try:
+        # One throwaway boot fills the bytecode cache for the 'bytecode' runs
+        measure('bytecode', cache_dir)
+        results = {strategy: [measure(strategy, cache_dir) for _ in range(args.runs)]
+                   for strategy in STRATEGIES}
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    columns = ['import', 'templates'] + [name for name, _ in FIRST_REQUESTS]
+    print(f"{'strategy':<12}" + ''.join(f"{column:>13}" for column in columns) + f"{'cold start':>13}")
+    cold_start = {}
+    for strategy in STRATEGIES:
+        medians = {column: statistics.median(run[column] for run in results[strategy]) for column in columns}
+        cold_start[strategy] = sum(medians[column] for column in columns[1:])
+        print(f"{strategy:<12}" + ''.join(f"{medians[column]:13.1f}" for column in columns)
+              + f"{cold_start[strategy]:13.1f}")
+
+    print(f"\nMedian of {args.runs} runs, ms. 'cold start' = template warmup + first requests.")
+    print(f"Removed from the first requests by precompiling: "
+          f"{cold_start['lazy'] - results_first(results, 'precompile'):.1f} ms")
+    print(f"Removed from boot by the bytecode cache: "
+          f"{cold_start['precompile'] - cold_start['bytecode']:.1f} ms")
+    print(f"Cold start removed overall (lazy -> bytecode): "
+          f"{cold_start['lazy'] - cold_start['bytecode']:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
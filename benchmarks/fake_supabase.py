@@ -0,0 +1,459 @@
+"""
+An in-memory Supabase for SupabaseClient and AsyncSupabaseClient.
+
+FakePostgrest answers the PostgREST requests of the real clients from a
+FakeCourseStore through httpx.MockTransport, so every query (column
+projection, filters, ordering, single rows, writes) is built by the code
+under test and only the server is fake. Each request sleeps for a
+configurable latency, so route benchmarks run offline while still paying a
+realistic price per round trip, and is counted on the store it reads.
+"""
+import json
+import time
+import asyncio
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import httpx
+from supabase_client import SupabaseClient
+from course_snapshot import SnapshotStore
+from changes_feed import parse_time
+from async_supabase_client import AsyncSupabaseClient, WorkerLoop
+from http_transport import build_http_client, build_async_http_client
+
+FAKE_URL = 'http://supabase.fake'
+FAKE_REPLICA_URL = 'http://replica.supabase.fake'
+FAKE_KEY = 'header.payload.signature'
+
+# Columns of each table as in database_schema.sql and database_migration.sql
+COLUMNS = {
+    'levels': ('id', 'title', 'order_index', 'created_at', 'updated_at'),
+    'sections': ('id', 'level_id', 'title', 'order_index', 'created_at', 'updated_at'),
+    'lessons': ('id', 'section_id', 'title', 'order_index', 'content', 'created_at', 'updated_at'),
+    'course_tombstones': ('id', 'table_name', 'row_id', 'deleted_at'),
+    'course_stats': ('scope', 'scope_id', 'level_id', 'levels', 'sections', 'lessons', 'quiz_questions',
+                     'tasks', 'content_bytes'),
+    'lesson_orders': ('version', 'lesson_ids', 'created_at'),
+    'learner_progress': ('learner_id', 'lesson_order', 'completed', 'revision', 'updated_at'),
+}
+PRIMARY_KEYS = {'lesson_orders': 'version', 'learner_progress': 'learner_id'}
+# Maintained by triggers, read-only through the API
+VIEWS = {'course_stats'}
+CHILD_TABLES = {'levels': ('sections', 'level_id'), 'sections': ('lessons', 'section_id')}
+TIME_COLUMNS = {'created_at', 'updated_at', 'deleted_at'}
+INTEGER_COLUMNS = {'id', 'level_id', 'section_id', 'order_index', 'row_id', 'scope_id', 'revision'}
+# Query parameters that are not column filters
+RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'columns', 'on_conflict'}
+RPCS = {'sync_course_sequences'}
+
+
+def _array_length(value) -> int:
+    return len(value) if isinstance(value, list) else 0
+
+
+# Computed columns: functions taking the table's row type
+COMPUTED_COLUMNS = {
+    'lessons': {
+        'quiz_count': lambda row: _array_length((row.get('content') or {}).get('quiz')),
+        'tasks_count': lambda row: _array_length((row.get('content') or {}).get('tasks')),
+    },
+}
+
+
+class Conflict(Exception):
+    """A row with the same primary key exists (Postgres error 23505)."""
+
+
+class FakeCourseStore:
+    """Thread-safe in-memory tables of the course database."""
+
+    def __init__(self, course: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        course = course or {}
+        self.tables = {
+            table: {row[PRIMARY_KEYS.get(table, 'id')]: dict(row) for row in course.get(table, [])}
+            for table in COLUMNS if table not in VIEWS
+        }
+        self.round_trips = 0
+        self._lock = threading.Lock()
+
+    @property
+    def learners(self) -> Dict[str, Dict[str, Any]]:
+        return self.tables['learner_progress']
+
+    def count_round_trip(self):
+        with self._lock:
+            self.round_trips += 1
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        """Copies of every row of a table, in primary key order."""
+        if table == 'course_stats':
+            return self.course_stats()
+        with self._lock:
+            rows = self.tables[table]
+            return [dict(rows[key]) for key in sorted(rows)]
+
+    def get(self, table: str, key) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.tables[table].get(key)
+            return dict(row) if row else None
+
+    def insert(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a row with the column defaults; raises Conflict on a taken primary key."""
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            rows = self.tables[table]
+            row = dict.fromkeys(COLUMNS[table])
+            row.update((column, now) for column in ('created_at', 'updated_at') if column in row)
+            if table == 'lessons':
+                row['content'] = {}
+            if table in PRIMARY_KEYS:
+                key = data[PRIMARY_KEYS[table]]
+            else:
+                key = data['id'] if 'id' in data else max(rows, default=0) + 1
+                row['id'] = key
+            if key in rows:
+                raise Conflict(f"Key ({PRIMARY_KEYS.get(table, 'id')})=({key}) already exists.")
+            row.update(data)
+            rows[key] = row
+            return dict(row)
+
+    def upsert(self, table: str, row: Dict[str, Any], ignore_duplicates: bool = False) -> Optional[Dict[str, Any]]:
+        """Insert a row or merge it into the stored one; None if ignored as a duplicate."""
+        key = row[PRIMARY_KEYS.get(table, 'id')]
+        with self._lock:
+            stored = self.tables[table].get(key)
+            if stored is not None:
+                if ignore_duplicates:
+                    return None
+                stored.update(row)
+                return dict(stored)
+        return self.insert(table, row)
+
+    def update(self, table: str, key, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.tables[table].get(key)
+            if row is None:
+                return None
+            row.update(data)
+            return dict(row)
+
+    def delete(self, table: str, key) -> Optional[Dict[str, Any]]:
+        """Delete a row and, like ON DELETE CASCADE, its children."""
+        with self._lock:
+            row = self.tables[table].pop(key, None)
+            if row is None:
+                return None
+            if table in ('levels', 'sections', 'lessons'):
+                # Like the record_course_tombstone trigger, also for cascaded rows
+                tombstones = self.tables['course_tombstones']
+                tombstone_id = max(tombstones, default=0) + 1
+                tombstones[tombstone_id] = {'id': tombstone_id, 'table_name': table, 'row_id': key,
+                                            'deleted_at': datetime.utcnow().isoformat()}
+            child_table, parent_column = CHILD_TABLES.get(table, (None, None))
+            children = [child['id'] for child in self.tables[child_table].values()
+                        if child[parent_column] == key] if child_table else []
+        for child_id in children:
+            self.delete(child_table, child_id)
+        return dict(row)
+
+    def course_stats(self) -> List[Dict[str, Any]]:
+        """Rows of the course_stats table, computed like rebuild_course_stats()."""
+        with self._lock:
+            levels = list(self.tables['levels'].values())
+            sections = list(self.tables['sections'].values())
+            lessons = list(self.tables['lessons'].values())
+        counters = ('levels', 'sections', 'lessons', 'quiz_questions', 'tasks', 'content_bytes')
+        course = {'scope': 'course', 'scope_id': 0, 'level_id': None, **dict.fromkeys(counters, 0)}
+        by_level = {level['id']: {'scope': 'level', 'scope_id': level['id'], 'level_id': None,
+                                  **dict.fromkeys(counters, 0)} for level in levels}
+        by_section = {section['id']: {'scope': 'section', 'scope_id': section['id'],
+                                      'level_id': section['level_id'], **dict.fromkeys(counters, 0)}
+                      for section in sections}
+        course['levels'] = len(by_level)
+        for row in by_section.values():
+            for target in (by_level.get(row['level_id']), course):
+                if target is not None:
+                    target['sections'] += 1
+        for lesson in lessons:
+            section = by_section.get(lesson['section_id'])
+            if section is None:
+                continue
+            content = lesson.get('content') or {}
+            added = {'lessons': 1, 'quiz_questions': len(content.get('quiz') or []),
+                     'tasks': len(content.get('tasks') or []),
+                     'content_bytes': len(json.dumps(lesson.get('content'), ensure_ascii=False).encode())}
+            for target in (section, by_level.get(section['level_id']), course):
+                if target is not None:
+                    for counter, value in added.items():
+                        target[counter] += value
+        return [course, *by_level.values(), *by_section.values()]
+
+
+class APIError(Exception):
+    """An error response of PostgREST."""
+
+    def __init__(self, status: int, code: str, message: str, details: Optional[str] = None):
+        super().__init__(message)
+        self.status = status
+        self.body = {'code': code, 'details': details, 'hint': None, 'message': message}
+
+
+def _split(text: str) -> List[str]:
+    """Split a PostgREST list at the commas outside parentheses and quotes."""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part for part in parts if part]
+
+
+class FakePostgrest:
+    """The PostgREST API of a FakeCourseStore, as a handler for httpx.MockTransport.
+
+    Understands what the app's clients send: select lists with computed
+    columns, aliases and JSON paths; eq/neq/lt/lte/gt/gte/in/is filters and
+    or=/and= trees; order, offset and limit; single-object responses;
+    insert, upsert, update and delete with return=representation; and the
+    RPCs in RPCS. Unknown tables and columns get PostgREST's errors, so a
+    query the real server would reject fails here too.
+    """
+
+    def __init__(self, store: FakeCourseStore, latency: float = 0.0):
+        self.store = store
+        self.latency = latency
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.store.count_round_trip()
+        if self.latency:
+            time.sleep(self.latency)
+        return self.respond(request)
+
+    async def handle_async(self, request: httpx.Request) -> httpx.Response:
+        self.store.count_round_trip()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.respond(request)
+
+    def respond(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        try:
+            if path.startswith('/rest/v1/rpc/'):
+                return self._rpc(path[len('/rest/v1/rpc/'):])
+            if not path.startswith('/rest/v1/'):
+                raise APIError(404, 'PGRST000', f"Not found: {path}")
+            table = path[len('/rest/v1/'):]
+            if table not in COLUMNS:
+                raise APIError(404, 'PGRST205', f"Could not find the table 'public.{table}' in the schema cache")
+            return self._table(request, table)
+        except APIError as e:
+            return httpx.Response(e.status, json=e.body)
+
+    def _rpc(self, name: str) -> httpx.Response:
+        if name not in RPCS:
+            raise APIError(404, 'PGRST202', f"Could not find the function public.{name} in the schema cache")
+        return httpx.Response(200, json=None)
+
+    def _table(self, request: httpx.Request, table: str) -> httpx.Response:
+        params = request.url.params
+        prefer = request.headers.get('prefer', '')
+        match = self._filters(table, params)
+        if request.method == 'GET':
+            rows = self._order([row for row in self.store.rows(table) if match(row)], table, params.get('order'))
+            offset = int(params.get('offset', 0))
+            limit = params.get('limit')
+            rows = rows[offset:offset + int(limit) if limit is not None else None]
+        elif table in VIEWS:
+            raise APIError(405, 'PGRST117', f"Unsupported HTTP method {request.method} on {table}")
+        elif request.method == 'POST':
+            body = json.loads(request.content)
+            rows = []
+            for data in body if isinstance(body, list) else [body]:
+                self._check_columns(table, data)
+                try:
+                    if 'resolution=' in prefer:
+                        row = self.store.upsert(table, data, ignore_duplicates='ignore-duplicates' in prefer)
+                    else:
+                        row = self.store.insert(table, data)
+                except Conflict as e:
+                    raise APIError(409, '23505', f'duplicate key value violates unique constraint "{table}_pkey"',
+                                   str(e))
+                if row is not None:
+                    rows.append(row)
+        elif request.method in ('PATCH', 'DELETE'):
+            data = json.loads(request.content or b'{}')
+            self._check_columns(table, data)
+            key_column = PRIMARY_KEYS.get(table, 'id')
+            keys = [row[key_column] for row in self.store.rows(table) if match(row)]
+            if request.method == 'PATCH':
+                rows = [self.store.update(table, key, data) for key in keys]
+            else:
+                rows = [self.store.delete(table, key) for key in keys]
+            rows = [row for row in rows if row is not None]
+        else:
+            raise APIError(405, 'PGRST117', f"Unsupported HTTP method {request.method}")
+
+        status = 201 if request.method == 'POST' else 200
+        if request.method != 'GET' and 'return=representation' not in prefer:
+            return httpx.Response(204 if status == 200 else status)
+        project = self._projection(table, params.get('select', '*'))
+        rows = [project(row) for row in rows]
+        if request.headers.get('accept') == 'application/vnd.pgrst.object+json':
+            if len(rows) != 1:
+                raise APIError(406, 'PGRST116', 'JSON object requested, multiple (or no) rows returned',
+                               f'The result contains {len(rows)} rows')
+            return httpx.Response(status, json=rows[0])
+        return httpx.Response(status, json=rows)
+
+    # ===== QUERY =====
+    def _check_column(self, table: str, column: str):
+        if column not in COLUMNS[table] and column not in COMPUTED_COLUMNS.get(table, {}):
+            raise APIError(400, '42703', f"column {table}.{column} does not exist")
+
+    def _check_columns(self, table: str, row: Dict[str, Any]):
+        for column in row:
+            if column not in COLUMNS[table]:
+                raise APIError(400, 'PGRST204', f"Could not find the '{column}' column of '{table}' in the schema cache")
+
+    def _value(self, table: str, row: Dict[str, Any], column: str):
+        computed = COMPUTED_COLUMNS.get(table, {}).get(column)
+        return computed(row) if computed else row.get(column)
+
+    def _typed_value(self, table: str, row: Dict[str, Any], column: str):
+        """The value of a column as Postgres compares it: timestamps as times."""
+        value = self._value(table, row, column)
+        return parse_time(value) if column in TIME_COLUMNS and value is not None else value
+
+    def _projection(self, table: str, select: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """A function picking the columns of a select list from a row."""
+        if select == '*':
+            return lambda row: {column: row.get(column) for column in COLUMNS[table]}
+        items = []
+        for item in _split(select):
+            alias, _, expression = item.rpartition(':')
+            path = expression.replace('->>', '->').split('->')
+            self._check_column(table, path[0])
+            items.append((alias or path[-1], path))
+
+        def project(row):
+            projected = {}
+            for name, path in items:
+                value = self._value(table, row, path[0])
+                for key in path[1:]:
+                    value = value.get(key) if isinstance(value, dict) else None
+                projected[name] = value
+            return projected
+        return project
+
+    def _literal(self, column: str, text: str):
+        text = text.strip('"')
+        if text == 'null':
+            return None
+        if column in TIME_COLUMNS:
+            return parse_time(text)
+        if column in INTEGER_COLUMNS:
+            return int(text)
+        return text
+
+    def _condition(self, table: str, column: str, operator: str, operand: str) -> Callable[[Dict[str, Any]], bool]:
+        self._check_column(table, column)
+
+        def value(row):
+            return self._typed_value(table, row, column)
+
+        if operator == 'in':
+            values = {self._literal(column, item) for item in _split(operand.strip('()'))}
+            return lambda row: value(row) in values
+        if operator == 'is':
+            return lambda row: value(row) is self._literal(column, operand)
+        compare = {
+            'eq': lambda a, b: a == b, 'neq': lambda a, b: a != b,
+            'lt': lambda a, b: a < b, 'lte': lambda a, b: a <= b,
+            'gt': lambda a, b: a > b, 'gte': lambda a, b: a >= b,
+        }.get(operator)
+        if compare is None:
+            raise APIError(400, 'PGRST100', f'"failed to parse filter ({operator}.{operand})"')
+        literal = self._literal(column, operand)
+        return lambda row: value(row) is not None and compare(value(row), literal)
+
+    def _logic(self, table: str, expression: str) -> Callable[[Dict[str, Any]], bool]:
+        """A predicate for 'and(...)', 'or(...)' or 'column.operator.value'."""
+        for name, combine in (('and', all), ('or', any)):
+            if expression.startswith(name + '('):
+                conditions = [self._logic(table, part) for part in _split(expression[len(name) + 1:-1])]
+                return lambda row: combine(condition(row) for condition in conditions)
+        column, operator, operand = expression.split('.', 2)
+        return self._condition(table, column, operator, operand)
+
+    def _filters(self, table: str, params: httpx.QueryParams) -> Callable[[Dict[str, Any]], bool]:
+        conditions = []
+        for key, value in params.multi_items():
+            if key in ('and', 'or'):
+                conditions.append(self._logic(table, key + value))
+            elif key not in RESERVED_PARAMS:
+                operator, _, operand = value.partition('.')
+                conditions.append(self._condition(table, key, operator, operand))
+        return lambda row: all(condition(row) for condition in conditions)
+
+    def _order(self, rows: List[Dict[str, Any]], table: str, order: Optional[str]) -> List[Dict[str, Any]]:
+        # Sort by the last key first; sorts are stable
+        for item in reversed(_split(order or '')):
+            column, _, direction = item.partition('.')
+            self._check_column(table, column)
+            # Nulls sort last in ascending order, like in Postgres
+            rows.sort(key=lambda row: (self._typed_value(table, row, column) is None,
+                                       self._typed_value(table, row, column)),
+                      reverse=direction.startswith('desc'))
+        return rows
+
+
+class FakeSupabaseClient(SupabaseClient):
+    """SupabaseClient talking to FakePostgrest servers over httpx.MockTransport.
+
+    Args:
+        store: The primary database
+        latency: Seconds each request takes
+        replica: Database of the read replica; it only changes when a test
+            changes it
+    """
+
+    def __init__(self, store: FakeCourseStore, latency: float = 0.0,
+                 replica: Optional[FakeCourseStore] = None):
+        self.store = store
+        self.latency = latency
+        self.replica_store = replica
+        servers = {httpx.URL(FAKE_URL).host: FakePostgrest(store, latency)}
+        if replica is not None:
+            servers[httpx.URL(FAKE_REPLICA_URL).host] = FakePostgrest(replica, latency)
+        transport = httpx.MockTransport(lambda request: servers[request.url.host](request))
+        super().__init__(http_client=build_http_client(transport=transport, backoff=0))
+        self.snapshot = SnapshotStore(None)
+
+    def _ensure_connection(self):
+        # Connect to the fake servers whatever the environment says
+        self.url, self.key, self.service_key = FAKE_URL, FAKE_KEY, None
+        self.read_url = FAKE_REPLICA_URL if self.replica_store is not None else None
+        super()._ensure_connection()
+
+
+class FakeAsyncSupabaseClient(AsyncSupabaseClient):
+    """AsyncSupabaseClient talking to a FakePostgrest server over httpx.MockTransport.
+
+    Requests sleep on the event loop, so concurrent queries overlap their
+    latency like real ones.
+    """
+
+    def __init__(self, store: FakeCourseStore, latency: float = 0.0, worker_loop: Optional[WorkerLoop] = None):
+        self.store = store
+        self.latency = latency
+        transport = httpx.MockTransport(FakePostgrest(store, latency).handle_async)
+        super().__init__(http_client=build_async_http_client(transport=transport, backoff=0),
+                         worker_loop=worker_loop)
+        self.url, self.key, self.service_key = FAKE_URL, FAKE_KEY, None
@@ -0,0 +1,140 @@
+"""
+Scalable course fixtures built from sample_data.sql.
+
+The levels, sections and lessons of the sample course are parsed from the
+SQL file and repeated until the course has the requested number of
+sections, e.g. 10, 100 or 1000.
+
+    python -m benchmarks.fixtures --sections 100 --sql course_100.sql
+"""
+import os
+import re
+import json
+import math
+import argparse
+from datetime import datetime
+
+SAMPLE_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample_data.sql')
+
+SQL_STRING = r"'((?:[^']|'')*)'"
+INSERT_RE = re.compile(r"INSERT INTO (\w+) \([^)]*\) VALUES(.*?);\s*(?=INSERT|--|$)", re.S)
+LEVEL_RE = re.compile(r"\(" + SQL_STRING + r",\s*(\d+)\)")
+SECTION_RE = re.compile(r"\((\d+),\s*" + SQL_STRING + r",\s*(\d+)\)")
+LESSON_RE = re.compile(r"\((\d+),\s*" + SQL_STRING + r",\s*(\d+),\s*" + SQL_STRING + r"\)", re.S)
+
+
+def _unquote(value):
+    return value.replace("''", "'")
+
+
+def load_sample_course(path=SAMPLE_DATA):
+    """Parse sample_data.sql into lists of level, section and lesson rows."""
+    with open(path, encoding='utf-8') as f:
+        sql = f.read()
+
+    levels, sections, lessons = [], [], []
+    for table, values in INSERT_RE.findall(sql):
+        if table == 'levels':
+            for title, order_index in LEVEL_RE.findall(values):
+                levels.append({'title': _unquote(title), 'order_index': int(order_index)})
+        elif table == 'sections':
+            for level_id, title, order_index in SECTION_RE.findall(values):
+                sections.append({'level_id': int(level_id), 'title': _unquote(title),
+                                 'order_index': int(order_index)})
+        elif table == 'lessons':
+            for section_id, title, order_index, content in LESSON_RE.findall(values):
+                lessons.append({'section_id': int(section_id), 'title': _unquote(title),
+                                'order_index': int(order_index), 'content': json.loads(_unquote(content))})
+    return levels, sections, lessons
+
+
+def generate_course(sections, lessons_per_section=5, sections_per_level=10, path=SAMPLE_DATA):
+    """Build a course with the given number of sections from the sample data.
+
+    Titles and lesson content cycle through the sample rows; ids are dense
+    and start at 1 in each table.
+
+    Returns:
+        dict with 'levels', 'sections' and 'lessons' row lists
+    """
+    sample_levels, sample_sections, sample_lessons = load_sample_course(path)
+    now = datetime.utcnow().isoformat()
+    course = {'levels': [], 'sections': [], 'lessons': []}
+
+    level_count = math.ceil(sections / sections_per_level)
+    for level_index in range(level_count):
+        sample = sample_levels[level_index % len(sample_levels)]
+        level_id = level_index + 1
+        course['levels'].append({
+            'id': level_id,
+            'title': sample['title'] if level_index < len(sample_levels) else f"{sample['title']} {level_id}",
+            'order_index': level_id,
+            'created_at': now,
+            'updated_at': now,
+        })
+
+        for section_order in range(1, min(sections_per_level, sections - level_index * sections_per_level) + 1):
+            sample = sample_sections[len(course['sections']) % len(sample_sections)]
+            section_id = len(course['sections']) + 1
+            course['sections'].append({
+                'id': section_id,
+                'level_id': level_id,
+                'title': sample['title'],
+                'order_index': section_order,
+                'created_at': now,
+                'updated_at': now,
+            })
+
+            for lesson_order in range(1, lessons_per_section + 1):
+                sample = sample_lessons[len(course['lessons']) % len(sample_lessons)]
+                course['lessons'].append({
+                    'id': len(course['lessons']) + 1,
+                    'section_id': section_id,
+                    'title': sample['title'],
+                    'order_index': lesson_order,
+                    'content': sample['content'],
+                    'created_at': now,
+                    'updated_at': now,
+                })
+    return course
+
+
+def course_to_sql(course):
+    """Render a generated course as INSERT statements for database_schema.sql."""
+    def quote(value):
+        return "'" + str(value).replace("'", "''") + "'"
+
+    lines = []
+    for level in course['levels']:
+        lines.append(f"INSERT INTO levels (id, title, order_index) VALUES "
+                     f"({level['id']}, {quote(level['title'])}, {level['order_index']});")
+    for section in course['sections']:
+        lines.append(f"INSERT INTO sections (id, level_id, title, order_index) VALUES "
+                     f"({section['id']}, {section['level_id']}, {quote(section['title'])}, {section['order_index']});")
+    for lesson in course['lessons']:
+        content = json.dumps(lesson['content'], ensure_ascii=False)
+        lines.append(f"INSERT INTO lessons (id, section_id, title, order_index, content) VALUES "
+                     f"({lesson['id']}, {lesson['section_id']}, {quote(lesson['title'])}, "
+                     f"{lesson['order_index']}, {quote(content)});")
+    for table in ('levels', 'sections', 'lessons'):
+        lines.append(f"SELECT setval('{table}_id_seq', (SELECT MAX(id) FROM {table}));")
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a scaled course from sample_data.sql')
+    parser.add_argument('--sections', type=int, default=100)
+    parser.add_argument('--lessons-per-section', type=int, default=5)
+    parser.add_argument('--sql', help='write INSERT statements to this file')
+    args = parser.parse_args()
+
+    course = generate_course(args.sections, args.lessons_per_section)
+    print(f"{len(course['levels'])} levels, {len(course['sections'])} sections, "
+          f"{len(course['lessons'])} lessons")
+    if args.sql:
+        with open(args.sql, 'w', encoding='utf-8') as f:
+            f.write(course_to_sql(course))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+Route benchmarks against the in-memory Supabase stand-in.
+
+Drives index, level_page, lesson_page, admin_dashboard and update_lesson
+through the Flask test client and through a concurrent HTTP load generator
+(a threaded werkzeug server on localhost), for courses scaled from
+sample_data.sql. Reports p50/p95/p99 latency, throughput and Supabase round
+trips per request (taken from the Server-Timing header). Time to first
+byte is reported separately from total time, since lesson_page streams.
+
+    python -m benchmarks.run_benchmarks --sections 10 100 1000 --latency-ms 5
+"""
+import re
+import time
+import logging
+import argparse
+import threading
+import http.client
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import make_server
+
+from async_supabase_client import WorkerLoop
+from benchmarks.fixtures import generate_course
+from benchmarks.fake_supabase import FakeCourseStore, FakeSupabaseClient, FakeAsyncSupabaseClient
+
+SERVER_TIMING_DB = re.compile(r'db;dur=[\d.]+;desc="(\d+) calls"')
+
+UPDATE_LESSON_FORM = {
+    'title': 'Введение в DOM',
+    'theory': '<p>Обновленная теория</p>',
+    'quiz_0_question': 'Что означает аббревиатура DOM?',
+    'quiz_0_option_0': 'Document Object Model',
+    'quiz_0_option_1': 'Dynamic Object Management',
+    'quiz_0_option_2': 'Data Object Model',
+    'quiz_0_option_3': 'Document Oriented Markup',
+    'quiz_0_correct': '0',
+    'task_0': 'Измените заголовок страницы.',
+}
+
+# name, method, path, form data, needs admin session
+SCENARIOS = [
+    ('index', 'GET', '/', None, False),
+    ('level_page', 'GET', '/level-1', None, False),
+    ('lesson_page', 'GET', '/level-1/section-1-intro/lesson-1-intro', None, False),
+    ('admin_dashboard', 'GET', '/bod/dashboard', None, True),
+    ('update_lesson', 'POST', '/bod/update_lesson/1', UPDATE_LESSON_FORM, True),
+]
+
+
+def install_fake_backend(course, latency, cache_ttl=None):
+    """Point the routes at fake clients sharing one in-memory store."""
+    import routes
+
+    store = FakeCourseStore(course)
+    client = FakeSupabaseClient(store, latency)
+    if cache_ttl is not None:
+        client.cache.ttl = cache_ttl
+    routes.get_supabase_client = lambda: client
+    # Like get_async_supabase_client, one async client per worker on its own loop
+    async_client = FakeAsyncSupabaseClient(store, latency, WorkerLoop())
+    async_client.worker_loop.run_sync(async_client._ensure_connection())
+    routes.get_async_supabase_client = lambda: async_client
+    return store
+
+
+def inflate_theory(course, size_kb):
+    """Repeat each lesson's theory HTML until it is at least size_kb kilobytes."""
+    for lesson in course['lessons']:
+        theory = lesson['content'].get('theory') or '<p>Теория</p>'
+        repeat = -(-size_kb * 1024 // len(theory.encode('utf-8')))
+        lesson['content'] = dict(lesson['content'], theory=theory * repeat)
+    return course
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def round_trips(server_timing):
+    match = SERVER_TIMING_DB.search(server_timing or '')
+    return int(match.group(1)) if match else 0
+
+
+def summarize(latencies, ttfbs, trips, wall_time):
+    latencies = sorted(latencies)
+    ttfbs = sorted(ttfbs)
+    return {
+        'ttfb_p50': percentile(ttfbs, 0.50) * 1000,
+        'ttfb_p95': percentile(ttfbs, 0.95) * 1000,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'rps': len(latencies) / wall_time if wall_time else 0.0,
+        'round_trips': sum(trips) / len(trips) if trips else 0.0,
+    }
+
+
+def bench_test_client(app, scenario, requests):
+    """Run requests sequentially in-process through the Flask test client."""
+    name, method, path, form, admin = scenario
+    client = app.test_client()
+    if admin:
+        with client.session_transaction() as session:
+            session['admin_logged_in'] = True
+
+    latencies, ttfbs, trips = [], [], []
+    wall_start = time.perf_counter()
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.open(path, method=method, data=form, buffered=False)
+        chunks = iter(response.response)
+        next(chunks, None)
+        ttfbs.append(time.perf_counter() - start)
+        for _ in chunks:
+            pass
+        response.close()
+        latencies.append(time.perf_counter() - start)
+        trips.append(round_trips(response.headers.get('Server-Timing')))
+    return summarize(latencies, ttfbs, trips, time.perf_counter() - wall_start)
+
+
+def login_cookie(host, port):
+    """Log in over HTTP and return the session cookie."""
+    import routes
+
+    conn = http.client.HTTPConnection(host, port)
+    body = urlencode({'login': routes.ADMIN_LOGIN, 'password': routes.ADMIN_PASSWORD})
+    conn.request('POST', '/bod/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.getheader('Set-Cookie', '').split(';', 1)[0]
+
+
+def bench_http(host, port, scenario, requests, concurrency, cookie):
+    """Run requests from `concurrency` keep-alive connections against a live server."""
+    name, method, path, form, admin = scenario
+    headers = {'Cookie': cookie} if admin else {}
+    body = None
+    if form:
+        body = urlencode(form)
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0)
+                  for i in range(concurrency)]
+
+    def worker(count):
+        conn = http.client.HTTPConnection(host, port)
+        latencies, ttfbs, trips = [], [], []
+        for _ in range(count):
+            start = time.perf_counter()
+            conn.request(method, path, body, headers)
+            # The server sends the status line together with the first chunk
+            response = conn.getresponse()
+            ttfbs.append(time.perf_counter() - start)
+            response.read()
+            latencies.append(time.perf_counter() - start)
+            trips.append(round_trips(response.getheader('Server-Timing')))
+        conn.close()
+        return latencies, ttfbs, trips
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, per_worker))
+    wall_time = time.perf_counter() - wall_start
+    latencies = [latency for result in results for latency in result[0]]
+    ttfbs = [ttfb for result in results for ttfb in result[1]]
+    trips = [trip for result in results for trip in result[2]]
+    return summarize(latencies, ttfbs, trips, wall_time)
+
+
+def print_row(sections, mode, name, stats):
+    print(f"{sections:>8} {mode:<12} {name:<16} {stats['ttfb_p50']:8.2f} {stats['ttfb_p95']:8.2f} "
+          f"{stats['p50']:8.2f} {stats['p95']:8.2f} "
+          f"{stats['p99']:8.2f} {stats['rps']:9.1f} {stats['round_trips']:8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark routes against an in-memory Supabase stand-in')
+    parser.add_argument('--sections', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='injected latency per Supabase call')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='HTTP load generator connections')
+    parser.add_argument('--no-cache', action='store_true', help='disable the data-layer read cache')
+    parser.add_argument('--theory-kb', type=int, default=0, help='pad lesson theory to this size to model long lessons')
+    parser.add_argument('--mode', choices=['test-client', 'http', 'both'], default='both')
+    parser.add_argument('--scenario', nargs='+', choices=[s[0] for s in SCENARIOS])
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    from app import app
+
+    scenarios = [s for s in SCENARIOS if not args.scenario or s[0] in args.scenario]
+    print(f"{'sections':>8} {'mode':<12} {'scenario':<16} {'ttfb p50':>8} {'ttfb p95':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'req/s':>9} {'trips':>8}")
+
+    for sections in args.sections:
+        course = generate_course(sections)
+        if args.theory_kb:
+            inflate_theory(course, args.theory_kb)
+        install_fake_backend(course, args.latency_ms / 1000, 0 if args.no_cache else None)
+
+        if args.mode in ('test-client', 'both'):
+            for scenario in scenarios:
+                print_row(sections, 'test-client', scenario[0], bench_test_client(app, scenario, args.requests))
+
+        if args.mode in ('http', 'both'):
+            server = make_server('127.0.0.1', 0, app, threaded=True)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                cookie = login_cookie('127.0.0.1', server.port)
+                for scenario in scenarios:
+                    stats = bench_http('127.0.0.1', server.port, scenario, args.requests, args.concurrency, cookie)
+                    print_row(sections, 'http', scenario[0], stats)
+            finally:
+                server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Cross-worker cache invalidation through Postgres LISTEN/NOTIFY.
+
+Triggers on levels, sections and lessons (database_migration.sql) publish every
+change on the ``course_changes`` channel. Each gunicorn worker runs one
+listener thread that evicts exactly the cache keys of the changed rows, so
+an edit made through one worker is visible in all of them without waiting
+for the cache TTL.
+"""
+import os
+import json
+import select
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'course_changes'
+POLL_TIMEOUT = 5.0  # seconds between liveness checks of the connection
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+# Column linking a row to the parent whose list it appears in
+PARENT_COLUMNS = {'sections': 'level_id', 'lessons': 'section_id'}
+
+
+class CacheInvalidationListener(threading.Thread):
+    """Background thread applying course change notifications to a client cache.
+
+    While the connection is down notifications are lost, so the whole cache
+    is cleared after every reconnect.
+    """
+
+    def __init__(self, client, dsn: str, channel: str = CHANNEL):
+        super().__init__(name='cache-listener', daemon=True)
+        self.client = client
+        self.dsn = dsn
+        self.channel = channel
+        self.listening = threading.Event()
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        delay = RECONNECT_DELAY
+        connected_before = False
+        while not self._stopping.is_set():
+            try:
+                self._listen(clear_cache=connected_before)
+                delay = RECONNECT_DELAY
+            except Exception as e:
+                logger.warning("Cache listener disconnected: %s; reconnecting in %.0fs", e, delay)
+                self._stopping.wait(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+            finally:
+                self.listening.clear()
+            connected_before = True
+
+    def _listen(self, clear_cache: bool):
+        # Imported here so the app does not load the driver at startup
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn)
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {self.channel}')
+            if clear_cache:
+                self.client.cache.clear()
+            self.listening.set()
+            logger.info("Listening for course changes on '%s'", self.channel)
+
+            while not self._stopping.is_set():
+                if select.select([conn], [], [], POLL_TIMEOUT) == ([], [], []):
+                    # Fails fast if the server went away while we were idle
+                    with conn.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    self.apply(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+    def apply(self, payload: str):
+        """Evict the cache keys affected by one notification payload."""
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            logger.error("Ignoring malformed course change notification: %r", payload)
+            return
+
+        table, row, old = change['table'], change['row'], change.get('old')
+        # ON DELETE CASCADE fires the trigger for every child row as well,
+        # so each notification only needs to evict its own row's keys
+        self.client.invalidate(table, row, refresh_snapshot=False)
+        parent = PARENT_COLUMNS.get(table)
+        if old and parent and old.get(parent) != row.get(parent):
+            # The row moved to another parent; evict the old parent's list too
+            self.client.invalidate(table, old, refresh_snapshot=False)
+        logger.debug("Evicted cache for %s on %s %s", change['op'], table, row.get('id'))
+
+
+def start_listener(app):
+    """Start the listener for the current process's client if configured.
+
+    Returns:
+        The started listener, or None if DATABASE_URL is not set or the
+        app config disables it
+    """
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn or not app.config.get('CACHE_INVALIDATION_LISTENER'):
+        return None
+
+    from supabase_client import get_supabase_client
+
+    listener = CacheInvalidationListener(get_supabase_client(), dsn)
+    listener.start()
+    return listener
@@ -0,0 +1,168 @@
+"""
+HTML minification and gzip/brotli response compression.
+
+Minified and compressed bodies are cached by a digest of the original
+body, so a page that renders to identical bytes (e.g. from the course cache)
+is minified and compressed only once per encoding. Streamed HTML is
+compressed chunk by chunk, flushing the compressor after every chunk so
+each one can be decoded as soon as it arrives. Other streams, such as the
+NDJSON export of one line per row, are not flushed: a flush per small chunk
+costs more in block overhead than it saves, so the compressor emits data
+whenever its window fills.
+"""
+import re
+import gzip
+import zlib
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = {'text/html', 'application/json', 'application/x-ndjson'}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 6
+
+# Blocks whose whitespace is significant are left untouched
+PRESERVED_BLOCK = re.compile(r'(<(pre|code|textarea|script|style)\b.*?</\2\s*>)', re.S | re.I)
+WHITESPACE = re.compile(r'\s+')
+
+
+def minify_html(html: str, strip: bool = True) -> str:
+    """Collapse whitespace runs to a single space outside pre/code/textarea/script/style.
+
+    With strip=False the leading and trailing space is kept, for minifying a
+    page piece by piece.
+    """
+    parts = PRESERVED_BLOCK.split(html)
+    # split() yields text, block, tag name, text, block, tag name, ...
+    result = []
+    for index in range(0, len(parts), 3):
+        result.append(WHITESPACE.sub(' ', parts[index]))
+        if index + 1 < len(parts):
+            result.append(parts[index + 1])
+    html = ''.join(result)
+    return html.strip() if strip else html
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def compress_stream(chunks, encoding: str, charset: str = 'utf-8', flush_chunks: bool = True):
+    """Compress an iterable of str/bytes chunks.
+
+    With flush_chunks every chunk is yielded as one flushed block; otherwise
+    only what the compressor emits on its own is yielded.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode(charset)
+        if chunk:
+            block = process(chunk) + flush() if flush_chunks else process(chunk)
+            if block:
+                yield block
+    yield finish()
+
+
+class CompressedBodyCache:
+    """LRU cache of transformed bodies keyed by (digest of original body, variant)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value: bytes):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+def _negotiate_encoding():
+    offered = ['br', 'gzip'] if brotli else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+def init_compression(app):
+    """Register the minify/compress after_request hook on the app."""
+    def _compress_streamed(response):
+        response.vary.add('Accept-Encoding')
+        encoding = _negotiate_encoding()
+        if not encoding:
+            return response
+        chunks = response.response
+        charset = response.mimetype_params.get('charset', 'utf-8')
+        response.response = compress_stream(chunks, encoding, charset,
+                                             flush_chunks=response.mimetype == 'text/html')
+        if hasattr(chunks, 'close'):
+            response.call_on_close(chunks.close)
+        response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    cache = CompressedBodyCache(app.config.get('COMPRESSION_CACHE_ENTRIES', 512))
+    min_size = app.config.get('COMPRESSION_MIN_SIZE', 512)
+    minify = app.config.get('MINIFY_HTML', True)
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code != 200
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        if response.is_streamed:
+            return _compress_streamed(response)
+
+        body = response.get_data()
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+
+        if minify and response.mimetype == 'text/html':
+            minified = cache.get((digest, 'identity'))
+            if minified is None:
+                charset = response.mimetype_params.get('charset', 'utf-8')
+                minified = minify_html(body.decode(charset)).encode(charset)
+                cache.set((digest, 'identity'), minified)
+            body = minified
+
+        response.vary.add('Accept-Encoding')
+        encoding = _negotiate_encoding()
+        if not encoding or len(body) < min_size:
+            response.set_data(body)
+            return response
+
+        compressed = cache.get((digest, encoding))
+        if compressed is None:
+            compressed = compress(body, encoding)
+            cache.set((digest, encoding), compressed)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,110 @@
+"""
+Runtime configuration for the application.
+
+The mode is selected with the APP_ENV environment variable
+(``development`` or ``production``).
+"""
+import os
+import logging
+
+
+class Config:
+    """Settings shared by all runtime modes."""
+    DEBUG = False
+    LOG_LEVEL = logging.INFO
+    LOG_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+    # One JSON object per log line instead of LOG_FORMAT
+    LOG_JSON = True
+    # Per-logger overrides applied on top of LOG_LEVEL
+    LOGGER_LEVELS = {}
+    TEMPLATES_AUTO_RELOAD = False
+    # Warm the course tree and templates before serving traffic
+    WARMUP_ON_START = True
+    # Persist compiled templates across worker restarts and deploys
+    JINJA_BYTECODE_CACHE = True
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+    # Evict cache entries changed through other workers (needs DATABASE_URL)
+    CACHE_INVALIDATION_LISTENER = True
+    # Log a warning for requests making more Supabase round trips than this
+    ROUNDTRIP_WARN_THRESHOLD = int(os.environ.get('ROUNDTRIP_WARN_THRESHOLD', '10'))
+    # Response compression (gzip, and brotli when installed)
+    MINIFY_HTML = True
+    COMPRESSION_MIN_SIZE = 512
+    COMPRESSION_CACHE_ENTRIES = 512
+    # Public pages: browsers revalidate with the ETag, shared caches may
+    # serve a stale copy while they refetch (purged by surrogate key)
+    HTTP_CACHE_CONTROL = 'public, max-age=0, s-maxage=300, stale-while-revalidate=600'
+    # /api/changes holds back changes younger than this, so transactions
+    # that started earlier have committed before a cursor moves past them
+    CHANGES_SETTLE_SECONDS = 5
+    # Multi-region deployments (db_routing.py): admin writes are replayed to
+    # PRIMARY_REGION; FLY_REGION is set by Fly on every machine. With a read
+    # replica (SUPABASE_READ_URL) a session reads from the primary for this
+    # long after its writes
+    PRIMARY_REGION = os.environ.get('PRIMARY_REGION')
+    FLY_REGION = os.environ.get('FLY_REGION')
+    READ_REPLICA = bool(os.environ.get('SUPABASE_READ_URL'))
+    READ_YOUR_WRITES_SECONDS = float(os.environ.get('SUPABASE_REPLICA_LAG', '10'))
+    # Token-bucket admission control (rate_limit.py): requests per second
+    # and burst size, per client IP and for all clients of the group together
+    RATE_LIMIT_ENABLED = True
+    RATE_LIMIT_MAX_CLIENTS = 10000
+    RATE_LIMITS = {
+        'public': {'per_ip': (5, 30), 'global': (100, 200)},
+        'api': {'per_ip': (10, 50), 'global': (200, 400)},
+        'admin': {'per_ip': (2, 20), 'global': (10, 40)},
+        'upload': {'per_ip': (0.2, 5), 'global': (1, 10)},
+        'login': {'per_ip': (5 / 60, 5), 'global': (1, 20)},
+    }
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    LOG_LEVEL = logging.DEBUG
+    LOG_JSON = False
+    TEMPLATES_AUTO_RELOAD = True
+    WARMUP_ON_START = False
+    JINJA_BYTECODE_CACHE = False
+    CACHE_INVALIDATION_LISTENER = False
+    MINIFY_HTML = False
+    RATE_LIMIT_ENABLED = False
+    HTTP_CACHE_CONTROL = 'no-cache'
+
+
+class ProductionConfig(Config):
+    LOG_LEVEL = logging.INFO
+    LOGGER_LEVELS = {
+        'werkzeug': logging.WARNING,
+        'httpx': logging.WARNING,
+        'httpcore': logging.WARNING,
+        'hpack': logging.WARNING,
+        'supabase': logging.WARNING,
+        'postgrest': logging.WARNING,
+        'storage3': logging.WARNING,
+        'realtime': logging.WARNING,
+        'gunicorn.access': logging.WARNING,
+    }
+
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+}
+
+
+def get_config(mode=None):
+    """Return the config class for the given (or APP_ENV) runtime mode."""
+    mode = (mode or os.environ.get('APP_ENV', 'development')).lower()
+    if mode not in CONFIGS:
+        raise ValueError(f"Unknown APP_ENV '{mode}', expected one of: {', '.join(CONFIGS)}")
+    return CONFIGS[mode]
+
+
+def configure_logging(config):
+    """Configure queued root logging and per-logger levels for the given config."""
+    from app_logging import JsonFormatter, install_queue_logging
+
+    formatter = JsonFormatter() if config.LOG_JSON else logging.Formatter(config.LOG_FORMAT)
+    install_queue_logging(config.LOG_LEVEL, formatter)
+    for name, level in config.LOGGER_LEVELS.items():
+        logging.getLogger(name).setLevel(level)
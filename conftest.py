@@ -0,0 +1,47 @@
+import pytest
+from async_supabase_client import WorkerLoop
+from benchmarks.fake_supabase import FakeAsyncSupabaseClient, FakeCourseStore, FakeSupabaseClient
+from benchmarks.fixtures import generate_course
+
+
+@pytest.fixture
+def store():
+    # Two levels of two sections with three lessons: lessons 1-6 and 7-12
+    return FakeCourseStore(generate_course(4, lessons_per_section=3, sections_per_level=2))
+
+
+@pytest.fixture
+def db(store):
+    fake = FakeSupabaseClient(store)
+    fake.cache.ttl = 300
+    return fake
+
+
+@pytest.fixture(scope='session')
+def worker_loop():
+    """Event loop thread of the async views, as get_async_supabase_client starts one per worker."""
+    return WorkerLoop()
+
+
+@pytest.fixture
+def client(db, worker_loop, monkeypatch):
+    """Test client of the app with the routes reading from db."""
+    import routes
+    from app import app
+
+    monkeypatch.setattr(routes, 'get_supabase_client', lambda: db)
+    async_db = FakeAsyncSupabaseClient(db.store, worker_loop=worker_loop)
+    worker_loop.run_sync(async_db._ensure_connection())
+    monkeypatch.setattr(routes, 'get_async_supabase_client', lambda: async_db)
+    test_client = app.test_client()
+    test_client.store = db.store
+    test_client.fake = db
+    return test_client
+
+
+@pytest.fixture
+def admin(client):
+    """The test client, logged in as admin."""
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+    return client
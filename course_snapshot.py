@@ -0,0 +1,248 @@
+"""
+On-disk snapshot of the whole course for cold starts and Supabase outages.
+
+The snapshot is a single file that is memory-mapped when read:
+
+    header   magic, format version, generation, index length (little endian)
+    index    JSON: levels, sections and lesson summaries (quiz_count and
+             tasks_count instead of content); each lesson carries the offset
+             and length of its content blob
+    blobs    lesson content as JSON, one blob per lesson
+
+Only the small index is parsed on load; lesson content is decoded from the
+mapping when a lesson is read. Writers build the file next to the target
+and os.replace() it, so readers always see either the old or the new
+snapshot, and a reader holding the old mapping keeps working.
+
+The index also records the time of the newest change in the changes feed
+when the rows were read (its high-water mark). A worker booting from the
+snapshot compares it with the database's, so changes made while no worker
+was running are not served from a stale file. Workers booting together
+take a file lock, so one of them rebuilds the snapshot and the others load
+it.
+"""
+import os
+import mmap
+import json
+import time
+import struct
+import threading
+import tempfile
+import logging
+import contextlib
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from models import lesson_summary
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; builds are then not serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'DOMSNAP\x00'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sHQI')
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'course.snapshot')
+
+
+def write_snapshot(path: str, levels: List[Dict[str, Any]], sections: List[Dict[str, Any]],
+                   lessons: List[Dict[str, Any]], high_water: Optional[str] = None) -> int:
+    """Atomically write a snapshot of the given rows.
+
+    Args:
+        high_water: Time of the newest change in the changes feed before
+            the rows were read (None if unknown)
+
+    Returns:
+        The generation number stored in the snapshot
+    """
+    blobs = []
+    offset = 0
+    lesson_index = []
+    for lesson in lessons:
+        blob = json.dumps(lesson.get('content') or {}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        row = lesson_summary(lesson)
+        row['_content'] = [offset, len(blob)]
+        lesson_index.append(row)
+        blobs.append(blob)
+        offset += len(blob)
+
+    index = json.dumps({
+        'created_at': datetime.utcnow().isoformat(),
+        'high_water': high_water,
+        'levels': levels,
+        'sections': sections,
+        'lessons': lesson_index,
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    generation = time.time_ns()
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.course-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, generation, len(index)))
+            f.write(index)
+            for blob in blobs:
+                f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return generation
+
+
+class CourseSnapshot:
+    """Read-only view of a snapshot file with the read methods of SupabaseClient."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"{path} is too short for a course snapshot")
+        magic, version, self.generation, index_length = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a course snapshot")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has snapshot format {version}, expected {FORMAT_VERSION}")
+        index = json.loads(self._mmap[HEADER.size:HEADER.size + index_length])
+        self._blobs_offset = HEADER.size + index_length
+        self.created_at = index['created_at']
+        self.high_water = index.get('high_water')
+        blobs_end = max((sum(lesson['_content']) for lesson in index['lessons']), default=0)
+        if len(self._mmap) < self._blobs_offset + blobs_end:
+            raise ValueError(f"{path} is truncated")
+
+        self.levels = sorted(index['levels'], key=lambda row: row['order_index'])
+        self._sections = {}
+        for section in sorted(index['sections'], key=lambda row: row['order_index']):
+            self._sections.setdefault(section['level_id'], []).append(section)
+        self._lessons = {}
+        self._lessons_by_id = {}
+        for lesson in sorted(index['lessons'], key=lambda row: row['order_index']):
+            self._lessons.setdefault(lesson['section_id'], []).append(lesson)
+            self._lessons_by_id[lesson['id']] = lesson
+
+    def close(self):
+        self._mmap.close()
+
+    def _with_content(self, lesson: Dict[str, Any]) -> Dict[str, Any]:
+        offset, length = lesson['_content']
+        start = self._blobs_offset + offset
+        row = {key: value for key, value in lesson.items()
+               if key not in ('_content', 'quiz_count', 'tasks_count')}
+        row['content'] = json.loads(self._mmap[start:start + length])
+        return row
+
+    def get_all_levels(self) -> List[Dict[str, Any]]:
+        return [dict(level) for level in self.levels]
+
+    def get_sections_by_level(self, level_id: int) -> List[Dict[str, Any]]:
+        return [dict(section) for section in self._sections.get(level_id, [])]
+
+    def get_lessons_by_section(self, section_id: int) -> List[Dict[str, Any]]:
+        return [{key: value for key, value in lesson.items() if key != '_content'}
+                for lesson in self._lessons.get(section_id, [])]
+
+    def get_lesson_by_id(self, lesson_id: int) -> Optional[Dict[str, Any]]:
+        lesson = self._lessons_by_id.get(lesson_id)
+        return self._with_content(lesson) if lesson else None
+
+    def get_lesson_quizzes(self, lesson_ids) -> Dict[int, Optional[List[Dict[str, Any]]]]:
+        return {lesson_id: self._with_content(self._lessons_by_id[lesson_id])['content'].get('quiz')
+                for lesson_id in lesson_ids if lesson_id in self._lessons_by_id}
+
+
+class SnapshotStore:
+    """Loads the current snapshot on demand and rewrites it in the background.
+
+    A path of None disables the store: reads return None and writes are
+    ignored.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._pending = threading.Event()
+        self._writer = None
+        self._fetch_rows = None
+
+    def get(self) -> Optional[CourseSnapshot]:
+        """Return the newest snapshot on disk, or None if there is no usable one."""
+        if not self.path:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            current = self._snapshot
+            if current is None or (current.stat.st_ino, current.stat.st_mtime_ns) != (stat.st_ino, stat.st_mtime_ns):
+                try:
+                    self._snapshot = CourseSnapshot(self.path)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error("Cannot read course snapshot %s: %s", self.path, e)
+                    return current
+                # The previous mapping is unmapped when its last reader drops it
+                logger.info("Loaded course snapshot generation %s", self._snapshot.generation)
+            return self._snapshot
+
+    @contextlib.contextmanager
+    def build_lock(self):
+        """Hold an exclusive lock shared by the workers of the machine while building the snapshot."""
+        if not self.path or fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def schedule_write(self, fetch_rows: Callable[[], Dict[str, List[Dict[str, Any]]]]):
+        """Rewrite the snapshot from fetch_rows() on a background thread.
+
+        Requests made while a rewrite is running are coalesced into one
+        more rewrite.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            self._fetch_rows = fetch_rows
+            # Started lazily so a gunicorn worker owns its own writer thread
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name='course-snapshot', daemon=True)
+                self._writer.start()
+        self._pending.set()
+
+    def write_now(self, fetch_rows: Callable[[], Dict[str, List[Dict[str, Any]]]]) -> Optional[int]:
+        """Rewrite the snapshot synchronously; returns the new generation or None on failure."""
+        if not self.path:
+            return None
+        try:
+            rows = fetch_rows()
+            generation = write_snapshot(self.path, rows['levels'], rows['sections'], rows['lessons'],
+                                        rows.get('high_water'))
+            logger.info("Wrote course snapshot generation %s (%s levels, %s sections, %s lessons)",
+                        generation, len(rows['levels']), len(rows['sections']), len(rows['lessons']))
+            return generation
+        except Exception as e:
+            # Keep the previous snapshot rather than replacing it with a partial course
+            logger.error("Failed to write course snapshot: %s", e)
+            return None
+
+    def _write_loop(self):
+        while True:
+            self._pending.wait()
+            self._pending.clear()
+            self.write_now(self._fetch_rows)
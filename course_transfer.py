@@ -0,0 +1,144 @@
+"""
+Bulk export and import of the whole course as NDJSON.
+
+The first line is a header naming the format; every following line holds
+one row: {"table": "lessons", "row": {...}}. Levels come first, then
+sections, then lessons, so an import never inserts a child before its
+parent. Rows keep their ids, so links and order_index survive a round trip
+between Supabase projects.
+
+    python course_transfer.py export -o course.ndjson
+    python course_transfer.py import course.ndjson
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+from typing import Any, Dict, Iterable, Iterator, List, Union
+
+logger = logging.getLogger(__name__)
+
+FORMAT = 'dom-learn-course'
+FORMAT_VERSION = 1
+TABLES = ('levels', 'sections', 'lessons')
+
+# Rows per upsert request: large enough to amortise the round trip, small
+# enough to stay well below PostgREST's request body limit with lesson content
+IMPORT_BATCH_SIZE = 500
+
+
+def _line(data: Dict[str, Any]) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def export_course(client) -> Iterator[str]:
+    """Yield the course as NDJSON lines, reading one page of rows at a time."""
+    yield _line({'format': FORMAT, 'version': FORMAT_VERSION})
+    for table in TABLES:
+        for row in client.iter_table(table):
+            yield _line({'table': table, 'row': row})
+
+
+def import_course(client, lines: Iterable[Union[str, bytes]],
+                  batch_size: int = IMPORT_BATCH_SIZE) -> Dict[str, Any]:
+    """Upsert rows from an NDJSON export in batches of batch_size.
+
+    Rows with an id that already exists are replaced; other rows are left
+    alone. Raises ValueError on a malformed file; batches written before the
+    error stay in the database.
+
+    Returns:
+        dict with the row count per table, elapsed seconds and rows per second
+    """
+    start = time.perf_counter()
+    counts = dict.fromkeys(TABLES, 0)
+    table_index = 0
+    batch: List[Dict[str, Any]] = []
+
+    def flush():
+        if batch:
+            counts[TABLES[table_index]] += client.upsert_rows(TABLES[table_index], batch)
+            batch.clear()
+
+    header = None
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            raise ValueError(f"Line {number} is not valid JSON")
+        if header is None:
+            if (not isinstance(data, dict) or data.get('format') != FORMAT
+                    or data.get('version') != FORMAT_VERSION):
+                raise ValueError(f"Line {number}: not a {FORMAT} export version {FORMAT_VERSION}")
+            header = data
+            continue
+
+        table = data.get('table') if isinstance(data, dict) else None
+        if table not in TABLES or not isinstance(data.get('row'), dict):
+            raise ValueError(f"Line {number} is not a course row")
+        if TABLES.index(table) < table_index:
+            raise ValueError(f"Line {number}: {table} rows must come before {TABLES[table_index]}")
+        if TABLES.index(table) > table_index:
+            flush()
+            table_index = TABLES.index(table)
+        batch.append(data['row'])
+        if len(batch) >= batch_size:
+            flush()
+    if header is None:
+        raise ValueError("The export is empty")
+    flush()
+
+    client.sync_id_sequences()
+    client.cache.clear()
+    client.refresh_snapshot()
+
+    seconds = time.perf_counter() - start
+    total = sum(counts.values())
+    stats = {**counts, 'seconds': round(seconds, 3),
+             'rows_per_second': round(total / seconds) if seconds else total}
+    logger.info("Imported %s levels, %s sections and %s lessons in %.1fs (%s rows/s)",
+                counts['levels'], counts['sections'], counts['lessons'], seconds, stats['rows_per_second'])
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export or import the course as NDJSON')
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help='write the course to a file or stdout')
+    export_parser.add_argument('-o', '--output', help='output file (default: stdout)')
+    import_parser = commands.add_parser('import', help='upsert the course from an export')
+    import_parser.add_argument('file', help="export file, or '-' for stdin")
+    import_parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from supabase_client import get_supabase_client
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    load_dotenv()
+    client = get_supabase_client()
+
+    if args.command == 'export':
+        start = time.perf_counter()
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        try:
+            rows = -1
+            for rows, line in enumerate(export_course(client)):
+                out.write(line)
+        finally:
+            if args.output:
+                out.close()
+        seconds = time.perf_counter() - start
+        logger.info("Exported %s rows in %.1fs (%.0f rows/s)", rows, seconds, rows / seconds if seconds else rows)
+    else:
+        source = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8')
+        with source:
+            stats = import_course(client, source, batch_size=args.batch_size)
+        print(json.dumps(stats))
+
+
+if __name__ == '__main__':
+    main()
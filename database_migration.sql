@@ -0,0 +1,279 @@
+-- JavaScript DOM Course Database Migration
+-- Объекты, которые приложение использует поверх таблиц из database_schema.sql:
+-- индексы ленты изменений, вычисляемые колонки, оповещения об изменениях,
+-- надгробия, счётчики course_stats и прогресс учеников.
+--
+-- Миграцию можно применять к рабочей базе и повторять: она ничего не удаляет,
+-- создаёт только недостающие таблицы и индексы и заменяет функции и триггеры
+-- (CREATE OR REPLACE TRIGGER требует PostgreSQL 14+). Всё выполняется в одной
+-- транзакции, поэтому счётчики, пересчитанные в конце, не разойдутся с
+-- записями, сделанными во время миграции.
+
+BEGIN;
+
+-- Лента изменений (/api/changes) читает строки по (updated_at, id)
+CREATE INDEX IF NOT EXISTS idx_levels_updated ON levels(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_sections_updated ON sections(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_lessons_updated ON lessons(updated_at, id);
+
+
+-- Вычисляемые колонки для списков уроков: PostgREST отдаёт их как обычные
+-- колонки (select=id,title,quiz_count,tasks_count), поэтому списки не
+-- загружают содержимое уроков целиком
+CREATE OR REPLACE FUNCTION quiz_count(lessons)
+RETURNS INTEGER AS $$
+    SELECT CASE WHEN jsonb_typeof($1.content->'quiz') = 'array'
+                THEN jsonb_array_length($1.content->'quiz') ELSE 0 END;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION tasks_count(lessons)
+RETURNS INTEGER AS $$
+    SELECT CASE WHEN jsonb_typeof($1.content->'tasks') = 'array'
+                THEN jsonb_array_length($1.content->'tasks') ELSE 0 END;
+$$ LANGUAGE sql STABLE;
+
+-- Оповещаем воркеры приложения об изменениях, чтобы они сбросили свои кэши
+-- (канал course_changes, см. cache_listener.py). Содержимое урока в оповещение
+-- не входит: размер payload ограничен 8000 байт.
+CREATE OR REPLACE FUNCTION notify_course_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    payload JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        payload := jsonb_build_object('table', TG_TABLE_NAME, 'op', TG_OP, 'row', to_jsonb(OLD) - 'content');
+    ELSE
+        payload := jsonb_build_object('table', TG_TABLE_NAME, 'op', TG_OP, 'row', to_jsonb(NEW) - 'content');
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        payload := payload || jsonb_build_object('old', to_jsonb(OLD) - 'content');
+    END IF;
+    PERFORM pg_notify('course_changes', payload::text);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE TRIGGER notify_levels_change AFTER INSERT OR UPDATE OR DELETE ON levels
+    FOR EACH ROW EXECUTE FUNCTION notify_course_change();
+
+CREATE OR REPLACE TRIGGER notify_sections_change AFTER INSERT OR UPDATE OR DELETE ON sections
+    FOR EACH ROW EXECUTE FUNCTION notify_course_change();
+
+CREATE OR REPLACE TRIGGER notify_lessons_change AFTER INSERT OR UPDATE OR DELETE ON lessons
+    FOR EACH ROW EXECUTE FUNCTION notify_course_change();
+
+-- Импорт курса (course_transfer.py) вставляет строки с явными id, после чего
+-- последовательности нужно передвинуть за максимальный id
+CREATE OR REPLACE FUNCTION sync_course_sequences()
+RETURNS VOID AS $$
+BEGIN
+    PERFORM setval(pg_get_serial_sequence('levels', 'id'), COALESCE((SELECT MAX(id) FROM levels), 0) + 1, false);
+    PERFORM setval(pg_get_serial_sequence('sections', 'id'), COALESCE((SELECT MAX(id) FROM sections), 0) + 1, false);
+    PERFORM setval(pg_get_serial_sequence('lessons', 'id'), COALESCE((SELECT MAX(id) FROM lessons), 0) + 1, false);
+END;
+$$ language 'plpgsql';
+
+-- Надгробия удалённых строк для ленты изменений (changes_feed.py). Триггер
+-- срабатывает и для строк, удалённых каскадно вместе с родителем, поэтому
+-- клиент узнаёт о каждом удалённом разделе и уроке.
+CREATE TABLE IF NOT EXISTS course_tombstones (
+    id BIGSERIAL PRIMARY KEY,
+    table_name VARCHAR(16) NOT NULL,
+    row_id INTEGER NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_course_tombstones_deleted ON course_tombstones(deleted_at, id);
+
+CREATE OR REPLACE FUNCTION record_course_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO course_tombstones (table_name, row_id) VALUES (TG_TABLE_NAME, OLD.id);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE TRIGGER levels_tombstone AFTER DELETE ON levels
+    FOR EACH ROW EXECUTE FUNCTION record_course_tombstone();
+
+CREATE OR REPLACE TRIGGER sections_tombstone AFTER DELETE ON sections
+    FOR EACH ROW EXECUTE FUNCTION record_course_tombstone();
+
+CREATE OR REPLACE TRIGGER lessons_tombstone AFTER DELETE ON lessons
+    FOR EACH ROW EXECUTE FUNCTION record_course_tombstone();
+
+-- Счётчики для админки: одна строка на весь курс (scope = 'course', scope_id = 0),
+-- по строке на уровень и на раздел. Их поддерживают триггеры ниже, поэтому
+-- статистика читается одним запросом без обхода уроков. Каждая строка хранит
+-- итоги своего поддерева; у строки раздела level_id указывает на уровень.
+CREATE TABLE IF NOT EXISTS course_stats (
+    scope VARCHAR(16) NOT NULL,
+    scope_id INTEGER NOT NULL,
+    level_id INTEGER,
+    levels INTEGER NOT NULL DEFAULT 0,
+    sections INTEGER NOT NULL DEFAULT 0,
+    lessons INTEGER NOT NULL DEFAULT 0,
+    quiz_questions INTEGER NOT NULL DEFAULT 0,
+    tasks INTEGER NOT NULL DEFAULT 0,
+    content_bytes BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, scope_id)
+);
+
+-- Пересчёт всех счётчиков с нуля: для существующей базы и для проверки
+CREATE OR REPLACE FUNCTION rebuild_course_stats()
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM course_stats;
+    INSERT INTO course_stats (scope, scope_id, level_id, lessons, quiz_questions, tasks, content_bytes)
+    SELECT 'section', s.id, s.level_id, COUNT(l.id),
+           COALESCE(SUM(quiz_count(l)), 0), COALESCE(SUM(tasks_count(l)), 0),
+           COALESCE(SUM(octet_length(l.content::text)), 0)
+    FROM sections s LEFT JOIN lessons l ON l.section_id = s.id
+    GROUP BY s.id, s.level_id;
+    INSERT INTO course_stats (scope, scope_id, sections, lessons, quiz_questions, tasks, content_bytes)
+    SELECT 'level', lv.id, COUNT(cs.scope_id), COALESCE(SUM(cs.lessons), 0), COALESCE(SUM(cs.quiz_questions), 0),
+           COALESCE(SUM(cs.tasks), 0), COALESCE(SUM(cs.content_bytes), 0)
+    FROM levels lv LEFT JOIN course_stats cs ON cs.scope = 'section' AND cs.level_id = lv.id
+    GROUP BY lv.id;
+    INSERT INTO course_stats (scope, scope_id, levels, sections, lessons, quiz_questions, tasks, content_bytes)
+    SELECT 'course', 0, COUNT(*), COALESCE(SUM(sections), 0), COALESCE(SUM(lessons), 0),
+           COALESCE(SUM(quiz_questions), 0), COALESCE(SUM(tasks), 0), COALESCE(SUM(content_bytes), 0)
+    FROM course_stats WHERE scope = 'level';
+END;
+$$ language 'plpgsql';
+
+-- Добавляет (direction = 1) или вычитает (direction = -1) урок из счётчиков раздела,
+-- его уровня и курса. Если строки раздела уже нет, раздел удаляется вместе
+-- с уроком и его итоги уже вычтены.
+CREATE OR REPLACE FUNCTION course_stats_add_lesson(lesson lessons, direction INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    parent_level INTEGER;
+BEGIN
+    UPDATE course_stats
+    SET lessons = lessons + direction,
+        quiz_questions = quiz_questions + direction * quiz_count(lesson),
+        tasks = tasks + direction * tasks_count(lesson),
+        content_bytes = content_bytes + direction * COALESCE(octet_length(lesson.content::text), 0)
+    WHERE scope = 'section' AND scope_id = lesson.section_id
+    RETURNING level_id INTO parent_level;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+    UPDATE course_stats
+    SET lessons = lessons + direction,
+        quiz_questions = quiz_questions + direction * quiz_count(lesson),
+        tasks = tasks + direction * tasks_count(lesson),
+        content_bytes = content_bytes + direction * COALESCE(octet_length(lesson.content::text), 0)
+    WHERE (scope = 'level' AND scope_id = parent_level) OR scope = 'course';
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION update_lesson_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM course_stats_add_lesson(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM course_stats_add_lesson(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION update_section_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    removed course_stats;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO course_stats (scope, scope_id, level_id) VALUES ('section', NEW.id, NEW.level_id);
+        UPDATE course_stats SET sections = sections + 1
+        WHERE (scope = 'level' AND scope_id = NEW.level_id) OR scope = 'course';
+    ELSIF TG_OP = 'DELETE' THEN
+        DELETE FROM course_stats WHERE scope = 'section' AND scope_id = OLD.id RETURNING * INTO removed;
+        IF FOUND THEN
+            UPDATE course_stats
+            SET sections = sections - 1, lessons = lessons - removed.lessons,
+                quiz_questions = quiz_questions - removed.quiz_questions, tasks = tasks - removed.tasks,
+                content_bytes = content_bytes - removed.content_bytes
+            WHERE (scope = 'level' AND scope_id = removed.level_id) OR scope = 'course';
+        END IF;
+    ELSIF NEW.level_id IS DISTINCT FROM OLD.level_id THEN
+        -- Раздел перенесён в другой уровень: переносим его итоги
+        UPDATE course_stats SET level_id = NEW.level_id
+        WHERE scope = 'section' AND scope_id = NEW.id
+        RETURNING * INTO removed;
+        UPDATE course_stats
+        SET sections = sections - 1, lessons = lessons - removed.lessons,
+            quiz_questions = quiz_questions - removed.quiz_questions, tasks = tasks - removed.tasks,
+            content_bytes = content_bytes - removed.content_bytes
+        WHERE scope = 'level' AND scope_id = OLD.level_id;
+        UPDATE course_stats
+        SET sections = sections + 1, lessons = lessons + removed.lessons,
+            quiz_questions = quiz_questions + removed.quiz_questions, tasks = tasks + removed.tasks,
+            content_bytes = content_bytes + removed.content_bytes
+        WHERE scope = 'level' AND scope_id = NEW.level_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION update_level_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    removed course_stats;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO course_stats (scope, scope_id) VALUES ('level', NEW.id);
+        UPDATE course_stats SET levels = levels + 1 WHERE scope = 'course';
+    ELSE
+        DELETE FROM course_stats WHERE scope = 'level' AND scope_id = OLD.id RETURNING * INTO removed;
+        IF FOUND THEN
+            UPDATE course_stats
+            SET levels = levels - 1, sections = sections - removed.sections, lessons = lessons - removed.lessons,
+                quiz_questions = quiz_questions - removed.quiz_questions, tasks = tasks - removed.tasks,
+                content_bytes = content_bytes - removed.content_bytes
+            WHERE scope = 'course';
+        END IF;
+        -- Разделы уровня удаляются каскадно; их итоги уже вычтены вместе с уровнем
+        DELETE FROM course_stats WHERE scope = 'section' AND level_id = OLD.id;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE TRIGGER levels_stats AFTER INSERT OR DELETE ON levels
+    FOR EACH ROW EXECUTE FUNCTION update_level_stats();
+
+CREATE OR REPLACE TRIGGER sections_stats AFTER INSERT OR UPDATE OF level_id OR DELETE ON sections
+    FOR EACH ROW EXECUTE FUNCTION update_section_stats();
+
+CREATE OR REPLACE TRIGGER lessons_stats AFTER INSERT OR UPDATE OF section_id, content OR DELETE ON lessons
+    FOR EACH ROW EXECUTE FUNCTION update_lesson_stats();
+
+-- Заполняем счётчики по уже существующим урокам
+SELECT rebuild_course_stats();
+
+-- Прогресс учеников (progress.py): одна битовая карта пройденных уроков на
+-- ученика вместо строки на каждый урок. Бит n (бит n % 8 байта n / 8, как
+-- считает get_bit) соответствует уроку с порядковым номером n в порядке курса.
+-- Каждый порядок уроков хранится один раз в lesson_orders под хешем списка id;
+-- карта, записанная в старом порядке, после перестановки или удаления уроков
+-- пересчитывается по id. revision нужен для сравнения-с-обменом при записи.
+CREATE TABLE IF NOT EXISTS lesson_orders (
+    version VARCHAR(32) PRIMARY KEY,
+    lesson_ids INTEGER[] NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS learner_progress (
+    learner_id UUID PRIMARY KEY,
+    lesson_order VARCHAR(32) NOT NULL REFERENCES lesson_orders(version),
+    completed BYTEA NOT NULL DEFAULT '\x',
+    revision INTEGER NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMIT;
@@ -2,6 +2,10 @@
 -- Создание структуры базы данных для курса JavaScript DOM
 
 -- Удаляем существующие таблицы для пересоздания (если нужно)
+DROP TABLE IF EXISTS learner_progress;
+DROP TABLE IF EXISTS lesson_orders;
+DROP TABLE IF EXISTS course_stats;
+DROP TABLE IF EXISTS course_tombstones;
 DROP TABLE IF EXISTS lessons CASCADE;
 DROP TABLE IF EXISTS sections CASCADE;
 DROP TABLE IF EXISTS levels CASCADE;
@@ -43,7 +47,6 @@ CREATE INDEX idx_levels_order ON levels(order_index);
 CREATE INDEX idx_sections_level_order ON sections(level_id, order_index);
 CREATE INDEX idx_lessons_section_order ON lessons(section_id, order_index);
 CREATE INDEX idx_lessons_content ON lessons USING GIN(content);
-
 -- Создаем функцию для автоматического обновления updated_at
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -61,4 +64,7 @@ CREATE TRIGGER update_sections_updated_at BEFORE UPDATE ON sections
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
 CREATE TRIGGER update_lessons_updated_at BEFORE UPDATE ON lessons
-    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
\ No newline at end of file
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Остальные объекты (индексы ленты изменений, триггеры, course_stats,
+-- прогресс учеников) создаёт database_migration.sql: выполните его после этого файла
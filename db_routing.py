@@ -0,0 +1,65 @@
+"""
+Read/write routing for multi-region deployments on Fly.io.
+
+Every region reads from a nearby Supabase read replica (SUPABASE_READ_URL)
+and writes to the primary (SUPABASE_URL). Admin write requests arriving in
+another region than PRIMARY_REGION are answered with a ``fly-replay``
+header, and the Fly proxy replays them in the primary region, close to the
+database.
+
+Replicas lag behind the primary, so with a replica (READ_REPLICA) after a
+write:
+
+- the session that made it reads cache misses from the primary for
+  READ_YOUR_WRITES_SECONDS (a timestamp in the session cookie); cached
+  entries are still served, since the write evicted those it changed;
+- every worker told about the change (SupabaseClient.invalidate, also via
+  the cache listener) refills its cache from the primary for the same time,
+  so a lagging replica cannot put the old rows back into the cache.
+"""
+import time
+from flask import g, request, session, has_request_context
+
+REPLAY_HEADER = 'fly-replay'
+SESSION_KEY = 'read_primary_until'
+# Admin POSTs that do not write to the database
+READ_ONLY_PATHS = ('/bod/login',)
+READ_ONLY_PREFIXES = ('/bod/exam/',)
+
+
+def is_write_request(method: str, path: str) -> bool:
+    """Whether a request changes the course (or storage) and must run near the primary."""
+    return (method not in ('GET', 'HEAD', 'OPTIONS') and path.startswith('/bod')
+            and path not in READ_ONLY_PATHS and not path.startswith(READ_ONLY_PREFIXES))
+
+
+def primary_reads_pinned() -> bool:
+    """Whether reads of the current request must see the primary's latest writes."""
+    return has_request_context() and g.get('read_primary', False)
+
+
+def init_db_routing(app):
+    """Replay writes to the primary region and pin reads after a session's writes.
+
+    Replay needs PRIMARY_REGION and FLY_REGION (set by Fly); without them,
+    e.g. locally, every request is handled where it arrives. Reads are only
+    pinned with READ_REPLICA: without a replica they already see the primary.
+    """
+    @app.before_request
+    def route_request():
+        primary, region = app.config.get('PRIMARY_REGION'), app.config.get('FLY_REGION')
+        if primary and region and region != primary and is_write_request(request.method, request.path):
+            return app.response_class(status=409, headers={REPLAY_HEADER: f'region={primary}'})
+        # Visitors without a session cookie (everyone but admins) skip
+        # decoding the session
+        if (app.config.get('READ_REPLICA') and app.config['SESSION_COOKIE_NAME'] in request.cookies
+                and session.get(SESSION_KEY, 0) > time.time()):
+            g.read_primary = True
+        return None
+
+    @app.after_request
+    def remember_write(response):
+        if (app.config.get('READ_REPLICA') and is_write_request(request.method, request.path)
+                and response.status_code < 400):
+            session[SESSION_KEY] = time.time() + app.config['READ_YOUR_WRITES_SECONDS']
+        return response
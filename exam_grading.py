@@ -0,0 +1,175 @@
+"""
+Exam mode: a level-wide exam drawn from the lessons' quizzes, graded for a
+whole class at once.
+
+The answer key and all submissions are packed into NumPy arrays (one row per
+student, one column per question, -1 for unanswered) and scored in a single
+vectorized pass, which also yields per-question statistics:
+
+    difficulty       share of students answering correctly (the p-value);
+                     low values are hard questions
+    discrimination   corrected item-total (point-biserial) correlation:
+                     how well a question separates strong from weak
+                     students; near zero or negative flags a bad question
+    option_counts    how often each option was picked, for spotting
+                     distractors nobody chooses
+
+NumPy is imported with this module, so the app imports it only in the exam
+views.
+"""
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+UNANSWERED = -1
+DEFAULT_EXAM_SIZE = 20
+
+
+@dataclass(frozen=True, slots=True)
+class ExamQuestion:
+    """One quiz question of a lesson, as drawn into an exam."""
+    lesson_id: int
+    number: int
+    question: str
+    options: Tuple[str, ...]
+    correct_answer: int
+
+
+def draw_exam(quizzes: Iterable[Tuple[int, Optional[List[Dict[str, Any]]]]], size: int = DEFAULT_EXAM_SIZE,
+              seed: int = 0) -> Tuple[ExamQuestion, ...]:
+    """Draw up to size questions from (lesson id, quiz) pairs in course order.
+
+    The same quizzes and seed always give the same exam, so it does not
+    need to be stored between handing it out and grading it.
+    """
+    pool = [
+        ExamQuestion(lesson_id, number, item.get('question', ''), tuple(item.get('options', ())),
+                     int(item.get('correct_answer', 0)))
+        for lesson_id, quiz in quizzes
+        for number, item in enumerate(quiz or [])
+    ]
+    return tuple(random.Random(seed).sample(pool, min(size, len(pool))))
+
+
+def pack_answer_key(questions: Sequence[ExamQuestion]) -> np.ndarray:
+    return np.fromiter((question.correct_answer for question in questions), dtype=np.int8, count=len(questions))
+
+
+def pack_submissions(submissions: Sequence[Dict[str, Any]], question_count: int,
+                     option_count: int = 4) -> Tuple[List[Any], np.ndarray]:
+    """Pack [{'student': ..., 'answers': [int or None, ...]}] into an answer matrix.
+
+    Returns:
+        the student ids and an int8 array of shape (students, questions)
+
+    Raises:
+        ValueError: if a submission does not have one answer per question, or
+            an answer is neither null nor an option number below option_count
+    """
+    students, rows = [], []
+    for row, submission in enumerate(submissions):
+        given = submission.get('answers') if isinstance(submission, dict) else None
+        if not isinstance(given, list) or len(given) != question_count:
+            raise ValueError(f"Submission {row + 1} must have {question_count} answers")
+        rows.append(given)
+        students.append(submission.get('student', row + 1))
+
+    # Validate the whole class at once. The object array keeps every answer
+    # as given: packing straight to ints would take "1", 1.9 or True
+    answers = np.empty((len(rows), question_count), dtype=object)
+    if rows:
+        answers[...] = rows
+    unanswered = np.equal(answers, None)
+    answers[unanswered] = UNANSWERED
+    wrong_type = np.frompyfunc(type, 1, 1)(answers) != int
+    answers[wrong_type] = UNANSWERED
+    out_of_range = ~unanswered & ((answers < 0) | (answers >= option_count))
+    invalid = wrong_type | out_of_range.astype(bool)
+    if invalid.any():
+        row = int(np.flatnonzero(invalid.any(axis=1))[0])
+        raise ValueError(f"Answers of submission {row + 1} must be null "
+                         f"or between 0 and {option_count - 1}")
+    return students, answers.astype(np.int8)
+
+
+@dataclass(frozen=True, slots=True)
+class GradeReport:
+    """Scores of every student and statistics of every question."""
+    students: List[Any]
+    correct: np.ndarray          # (students, questions) bool
+    scores: np.ndarray           # (students,) correct answers
+    difficulty: np.ndarray       # (questions,) share correct
+    discrimination: np.ndarray   # (questions,) NaN where undefined
+    option_counts: np.ndarray    # (questions, options + 1); column 0 counts unanswered
+
+    def to_dict(self, questions: Optional[Sequence[ExamQuestion]] = None) -> Dict[str, Any]:
+        question_count = self.correct.shape[1]
+        mean_percent = 0.0
+        if question_count and len(self.students):
+            mean_percent = round(100 * float(self.scores.mean()) / question_count, 1)
+        return {
+            'students': [
+                {'student': student, 'score': int(score),
+                 'percent': round(100 * float(score) / question_count, 1) if question_count else 0.0}
+                for student, score in zip(self.students, self.scores)
+            ],
+            'questions': [self._question_stats(i, questions[i] if questions else None)
+                          for i in range(question_count)],
+            'mean_percent': mean_percent,
+        }
+
+    def _question_stats(self, i: int, question: Optional[ExamQuestion]) -> Dict[str, Any]:
+        stats = {'lesson_id': question.lesson_id, 'number': question.number} if question else {}
+        discrimination = self.discrimination[i]
+        stats.update({
+            'difficulty': round(float(self.difficulty[i]), 3),
+            'discrimination': None if np.isnan(discrimination) else round(float(discrimination), 3),
+            'unanswered': int(self.option_counts[i, 0]),
+            'option_counts': self.option_counts[i, 1:].tolist(),
+        })
+        return stats
+
+
+def grade(key: np.ndarray, answers: np.ndarray, students: Optional[List[Any]] = None,
+          option_count: int = 4) -> GradeReport:
+    """Score an answer matrix against the key in one vectorized pass.
+
+    Raises:
+        ValueError: if an answer is neither UNANSWERED nor an option number
+    """
+    if answers.size and (answers.min() < UNANSWERED or answers.max() >= option_count):
+        raise ValueError(f"Answers must be {UNANSWERED} or between 0 and {option_count - 1}")
+    student_count, question_count = answers.shape
+
+    correct = answers == key
+    x = correct.astype(np.float64)
+    scores = correct.sum(axis=1)
+    difficulty = x.mean(axis=0) if student_count else np.zeros(question_count)
+
+    # Correlate each question with the score on the other questions, so a
+    # question does not correlate with itself
+    rest = scores[:, None] - x
+    x_centered = x - difficulty
+    rest_centered = rest - rest.mean(axis=0) if student_count else rest
+    covariance = (x_centered * rest_centered).sum(axis=0)
+    spread = np.sqrt((x_centered ** 2).sum(axis=0) * (rest_centered ** 2).sum(axis=0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        discrimination = np.where(spread > 0, covariance / spread, np.nan)
+
+    # Shift answers by one so unanswered lands in column 0, then count every
+    # (question, option) pair with a single bincount
+    columns = option_count + 1
+    flat = (answers.astype(np.int64) + 1) + np.arange(question_count) * columns
+    option_counts = np.bincount(flat.ravel(), minlength=question_count * columns).reshape(question_count, columns)
+
+    return GradeReport(students if students is not None else list(range(1, student_count + 1)),
+                       correct, scores, difficulty, discrimination, option_counts)
+
+
+def grade_exam(questions: Sequence[ExamQuestion], submissions: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Grade JSON submissions of an exam; returns the report as a dict."""
+    option_count = max((len(question.options) for question in questions), default=0) or 4
+    students, answers = pack_submissions(submissions, len(questions), option_count)
+    report = grade(pack_answer_key(questions), answers, students, option_count)
+    return report.to_dict(questions)
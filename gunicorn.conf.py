@@ -0,0 +1,51 @@
+"""
+Gunicorn configuration for production.
+
+Run with: gunicorn -c gunicorn.conf.py main:app
+"""
+import os
+
+# The app reads its runtime mode at import time, so set it before preloading
+os.environ.setdefault('APP_ENV', 'production')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', '4'))
+timeout = 30
+keepalive = 5
+
+# Import the app once in the master so workers share its memory copy-on-write
+preload_app = True
+
+accesslog = None
+errorlog = '-'
+loglevel = 'info'
+
+
+def when_ready(server):
+    """Compile templates in the master before any worker is forked.
+
+    In production they are loaded from the persistent bytecode cache when
+    the template sources are unchanged.
+    """
+    from app import app
+    from warmup import warmup_templates
+
+    if app.config.get('WARMUP_ON_START'):
+        warmup_templates(app)
+
+
+def post_worker_init(worker):
+    """Load the course tree in each worker before it accepts connections.
+
+    This runs after fork, so every worker opens its own HTTP connections and
+    its own LISTEN connection for cache invalidation.
+    """
+    from app import app
+    from cache_listener import start_listener
+    from warmup import warmup_course
+
+    start_listener(app)
+    if app.config.get('WARMUP_ON_START'):
+        warmup_course(app)
@@ -0,0 +1,165 @@
+"""
+HTTP conditional caching for the public pages.
+
+Each page gets a weak ETag hashed from the ids and updated_at values of the
+rows it shows (plus a hash of the template sources, so a deploy changes it)
+and a Last-Modified from the newest updated_at. A matching If-None-Match is
+answered with 304 before anything is rendered. Responses carry
+Cache-Control with stale-while-revalidate and a Surrogate-Key header naming
+the rows they depend on; admin mutations call purge() with the keys a CDN
+should drop.
+
+Surrogate keys:
+
+    course      every public page
+    index       the main page
+    level-<id>  the level page and the lesson pages of the level
+    section-<id>, lesson-<id>
+                lesson pages
+"""
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Sequence, Tuple
+from flask import current_app, g, request
+
+logger = logging.getLogger(__name__)
+
+PURGE_HEADER = 'X-Surrogate-Purge'
+
+
+@dataclass(frozen=True, slots=True)
+class PageValidator:
+    """ETag, Last-Modified and surrogate keys of one page."""
+    etag: str
+    last_modified: Optional[datetime]
+    surrogate_keys: Tuple[str, ...]
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _iter_nodes(nodes):
+    for node in nodes:
+        yield node
+        yield from _iter_nodes(getattr(node, 'sections', ()))
+        yield from _iter_nodes(getattr(node, 'lessons', ()))
+
+
+def page_validator(nodes: Iterable, surrogate_keys: Sequence[str]) -> PageValidator:
+    """Build the validator of a page showing the given models and their children."""
+    digest = hashlib.blake2b(current_app.config.get('TEMPLATE_VERSION', '').encode(), digest_size=12)
+    newest = None
+    for node in _iter_nodes(nodes):
+        digest.update(f'{type(node).__name__}:{node.id}:{node.updated_at}\n'.encode())
+        if node.updated_at and (newest is None or node.updated_at > newest):
+            newest = node.updated_at
+    return PageValidator(digest.hexdigest(), _parse_timestamp(newest), ('course',) + tuple(surrogate_keys))
+
+
+_index_validator = (None, None)
+
+
+def index_validator(tree) -> PageValidator:
+    """Validator of the main page; computed once per cached course tree."""
+    global _index_validator
+    cached_tree, validator = _index_validator
+    if cached_tree is not tree:
+        validator = page_validator(tree, ('index',))
+        # Keeping the tree referenced makes the identity check safe
+        _index_validator = (tree, validator)
+    return validator
+
+
+def _apply_headers(response, validator: PageValidator):
+    response.set_etag(validator.etag, weak=True)
+    if validator.last_modified:
+        response.last_modified = validator.last_modified
+    response.headers['Cache-Control'] = current_app.config['HTTP_CACHE_CONTROL']
+    response.headers['Surrogate-Key'] = ' '.join(validator.surrogate_keys)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def not_modified(validator: PageValidator):
+    """Return a 304 response if the request's validators match, else None.
+
+    If-Modified-Since is only consulted without If-None-Match: deleting a row
+    does not move Last-Modified, but it does change the ETag.
+    """
+    if request.if_none_match:
+        matches = request.if_none_match.contains_weak(validator.etag)
+    else:
+        since = request.if_modified_since
+        matches = bool(since and validator.last_modified
+                       and validator.last_modified.replace(microsecond=0) <= since)
+    if not matches:
+        return None
+    return _apply_headers(current_app.response_class(status=304), validator)
+
+
+def cacheable(response, validator: PageValidator):
+    """Add ETag, Last-Modified, Cache-Control and Surrogate-Key to a page response."""
+    return _apply_headers(response, validator)
+
+
+def surrogate_keys_for_change(tree, table: str, row_id: Optional[int] = None,
+                              parent_id: Optional[int] = None) -> List[str]:
+    """Keys of the pages showing a created, changed or deleted row.
+
+    Call before deleting, so the row can still be found in the tree. For a
+    new row pass its parent id instead of row_id.
+    """
+    keys = ['index']
+    if table == 'levels':
+        return keys + ([f'level-{row_id}'] if row_id else [])
+    for level in tree:
+        if table == 'sections':
+            if level.id == parent_id or any(section.id == row_id for section in level.sections):
+                return keys + [f'level-{level.id}'] + ([f'section-{row_id}'] if row_id else [])
+            continue
+        for section in level.sections:
+            if section.id == parent_id or any(lesson.id == row_id for lesson in section.lessons):
+                return keys + [f'level-{level.id}', f'section-{section.id}'] + \
+                    ([f'lesson-{row_id}'] if row_id else [])
+    # The row is not in the tree; fall back to every page
+    return ['course']
+
+
+def purge(keys: Iterable[str]):
+    """Report surrogate keys to purge: logged and sent in the X-Surrogate-Purge header."""
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return
+    pending = g.setdefault('surrogate_purge', [])
+    pending.extend(key for key in keys if key not in pending)
+    logger.info("Purge surrogate keys %s", ' '.join(keys), extra={'fields': {'event': 'purge', 'keys': keys}})
+
+
+def template_version(app) -> str:
+    """Hash of all template sources; changes whenever a deploy changes a template."""
+    digest = hashlib.blake2b(digest_size=8)
+    for name in sorted(app.jinja_loader.list_templates()):
+        source, _, _ = app.jinja_loader.get_source(app.jinja_env, name)
+        digest.update(name.encode() + b'\0' + source.encode())
+    return digest.hexdigest()
+
+
+def init_http_cache(app):
+    """Compute TEMPLATE_VERSION and emit pending purge keys on responses."""
+    app.config.setdefault('TEMPLATE_VERSION', template_version(app))
+
+    @app.after_request
+    def send_purge_keys(response):
+        keys = g.get('surrogate_purge')
+        if keys:
+            response.headers[PURGE_HEADER] = ' '.join(keys)
+        return response
@@ -0,0 +1,147 @@
+"""
+Shared HTTP transport for the Supabase client.
+
+One httpx.Client is shared by every thread of a worker, and one
+httpx.AsyncClient by its async views. Their connection pools are sized to
+the number of worker threads and keep connections alive (HTTP/2 where the
+server supports it); idempotent reads are retried with jittered exponential
+backoff on connection errors and 502/504 responses.
+"""
+import os
+import time
+import asyncio
+import random
+import logging
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Pool size follows the gunicorn thread count so no thread waits for a connection
+POOL_SIZE = int(os.environ.get('SUPABASE_POOL_SIZE', os.environ.get('WEB_THREADS', '4')))
+HTTP2 = os.environ.get('SUPABASE_HTTP2', '1') == '1'
+KEEPALIVE_EXPIRY = float(os.environ.get('SUPABASE_KEEPALIVE_EXPIRY', '30'))
+CONNECT_TIMEOUT = float(os.environ.get('SUPABASE_CONNECT_TIMEOUT', '3'))
+READ_TIMEOUT = float(os.environ.get('SUPABASE_READ_TIMEOUT', '10'))
+RETRIES = int(os.environ.get('SUPABASE_RETRIES', '3'))
+RETRY_BACKOFF = float(os.environ.get('SUPABASE_RETRY_BACKOFF', '0.1'))
+RETRY_MAX_BACKOFF = 2.0
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+# postgrest-py already retries GET/HEAD on 503 and 520 at the query level,
+# so only the gateway errors it leaves alone are retried here
+RETRY_STATUSES = {502, 504}
+
+
+class RetryTransport(httpx.BaseTransport):
+    """Wrap a transport and retry idempotent requests that fail transiently."""
+
+    def __init__(self, transport: httpx.BaseTransport, retries: int = RETRIES,
+                 backoff: float = RETRY_BACKOFF, max_backoff: float = RETRY_MAX_BACKOFF):
+        self._transport = transport
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method not in IDEMPOTENT_METHODS:
+            return self._transport.handle_request(request)
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = self._transport.handle_request(request)
+            except httpx.TransportError as e:
+                if last_attempt:
+                    raise
+                logger.warning("%s %s failed (%r), retrying", request.method, request.url.path, e)
+            else:
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    return response
+                response.close()
+                logger.warning("%s %s returned %s, retrying", request.method, request.url.path, response.status_code)
+            time.sleep(self._delay(attempt))
+
+    def _delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncRetryTransport(RetryTransport, httpx.AsyncBaseTransport):
+    """RetryTransport for httpx.AsyncClient."""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method not in IDEMPOTENT_METHODS:
+            return await self._transport.handle_async_request(request)
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                if last_attempt:
+                    raise
+                logger.warning("%s %s failed (%r), retrying", request.method, request.url.path, e)
+            else:
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    return response
+                await response.aclose()
+                logger.warning("%s %s returned %s, retrying", request.method, request.url.path, response.status_code)
+            await asyncio.sleep(self._delay(attempt))
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def build_http_client(transport: httpx.BaseTransport = None, pool_size: int = POOL_SIZE,
+                      http2: bool = HTTP2, retries: int = RETRIES,
+                      backoff: float = RETRY_BACKOFF) -> httpx.Client:
+    """Create the pooled, retrying httpx client shared by the Supabase client.
+
+    Args:
+        transport: Inner transport to wrap; defaults to a pooled HTTPTransport
+        pool_size: Maximum number of (keep-alive) connections
+        http2: Negotiate HTTP/2 with the server
+        retries: Retries for idempotent requests
+        backoff: Base delay in seconds for the exponential backoff
+    """
+    if transport is None:
+        transport = httpx.HTTPTransport(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+    return httpx.Client(
+        transport=RetryTransport(transport, retries=retries, backoff=backoff),
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        follow_redirects=True,
+    )
+
+
+def build_async_http_client(transport: httpx.AsyncBaseTransport = None, pool_size: int = POOL_SIZE,
+                            http2: bool = HTTP2, retries: int = RETRIES,
+                            backoff: float = RETRY_BACKOFF) -> httpx.AsyncClient:
+    """Create the pooled, retrying httpx.AsyncClient of the async Supabase client.
+
+    Takes the arguments of build_http_client; the client must only be used
+    on the event loop it first connects on.
+    """
+    if transport is None:
+        transport = httpx.AsyncHTTPTransport(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+    return httpx.AsyncClient(
+        transport=AsyncRetryTransport(transport, retries=retries, backoff=backoff),
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        follow_redirects=True,
+    )
@@ -1,51 +1,175 @@
 """
-Simple data models for the application.
+Course data models.
+
+Level, Section and Lesson are frozen, slotted dataclasses built from
+PostgREST rows. The cached course tree is made of these immutable nodes and
+shared by every request, so nothing needs to copy it. Lessons in lists do
+not hold their content: Lesson.content loads it on access through the
+client's cache, so keeping the tree in memory does not keep every lesson
+body alive.
 """
+import asyncio
+import functools
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-def create_sample_lesson_content():
-    """Create sample lesson content for testing"""
-    return {
-        "theory": """
-        <h2>Введение в JavaScript DOM</h2>
-        <p>Document Object Model (DOM) - это программный интерфейс для HTML и XML документов.</p>
-        
-        <h3>Основные концепции</h3>
-        <p>DOM представляет документ как дерево объектов.</p>
-        
-        <pre><code class="language-javascript">
-// Получение элемента по ID
-const element = document.getElementById('myElement');
+ContentLoader = Callable[[int], Optional[Dict[str, Any]]]
+
+
+@dataclass(frozen=True, slots=True)
+class Lesson:
+    id: int
+    section_id: int
+    title: str
+    order_index: int
+    quiz_count: int = 0
+    tasks_count: int = 0
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    loaded_content: Optional[Dict[str, Any]] = field(default=None, repr=False, compare=False)
+    loader: Optional[ContentLoader] = field(default=None, repr=False, compare=False)
+
+    @property
+    def content(self) -> Optional[Dict[str, Any]]:
+        """The lesson body: loaded with the lesson, or fetched on each access via the loader."""
+        if self.loaded_content is not None:
+            return self.loaded_content
+        if self.loader is None:
+            return None
+        return self.loader(self.id)
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any], loader: Optional[ContentLoader] = None) -> "Lesson":
+        content = row.get('content')
+        if 'content' in row:
+            # Selected with the row: never go back to the loader for it
+            content, loader = content or {}, None
+        return cls(
+            id=row['id'],
+            section_id=row['section_id'],
+            title=row['title'],
+            order_index=row['order_index'],
+            quiz_count=row.get('quiz_count', len((content or {}).get('quiz') or [])),
+            tasks_count=row.get('tasks_count', len((content or {}).get('tasks') or [])),
+            created_at=row.get('created_at'),
+            updated_at=row.get('updated_at'),
+            loaded_content=content,
+            loader=loader,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Section:
+    id: int
+    level_id: int
+    title: str
+    order_index: int
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    lessons: Tuple[Lesson, ...] = ()
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any], loader: Optional[ContentLoader] = None) -> "Section":
+        return cls(row['id'], row['level_id'], row['title'], row['order_index'],
+                   row.get('created_at'), row.get('updated_at'))
+
+
+@dataclass(frozen=True, slots=True)
+class Level:
+    id: int
+    title: str
+    order_index: int
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    sections: Tuple[Section, ...] = ()
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any], loader: Optional[ContentLoader] = None) -> "Level":
+        return cls(row['id'], row['title'], row['order_index'],
+                   row.get('created_at'), row.get('updated_at'))
+
+
+@dataclass(frozen=True, slots=True)
+class Stats:
+    """Aggregate counters of a section, a level or the whole course."""
+    levels: int = 0
+    sections: int = 0
+    lessons: int = 0
+    quiz_questions: int = 0
+    tasks: int = 0
+    content_bytes: int = 0
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "Stats":
+        return cls(row.get('levels', 0), row.get('sections', 0), row.get('lessons', 0),
+                   row.get('quiz_questions', 0), row.get('tasks', 0), row.get('content_bytes', 0))
+
+
+@dataclass(frozen=True, slots=True)
+class CourseStats:
+    """The trigger-maintained course_stats table (see database_migration.sql)."""
+    course: Stats = Stats()
+    levels: Dict[int, Stats] = field(default_factory=dict)
+    sections: Dict[int, Stats] = field(default_factory=dict)
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]]) -> "CourseStats":
+        course, levels, sections = Stats(), {}, {}
+        for row in rows:
+            if row['scope'] == 'course':
+                course = Stats.from_row(row)
+            elif row['scope'] == 'level':
+                levels[row['scope_id']] = Stats.from_row(row)
+            elif row['scope'] == 'section':
+                sections[row['scope_id']] = Stats.from_row(row)
+        return cls(course, levels, sections)
+
+
+def to_models(value, model, loader: Optional[ContentLoader] = None):
+    """Convert a list of rows to a tuple of models and a single row to a model.
+
+    Anything else (None, bools from deletes) is returned unchanged.
+    """
+    if isinstance(value, list):
+        return tuple(model.from_row(row, loader) for row in value)
+    if isinstance(value, dict):
+        return model.from_row(value, loader)
+    return value
+
+
+def as_models(model):
+    """Decorate a data-layer method so it returns models instead of PostgREST rows.
+
+    Lessons built by a sync client load their content through the client's
+    get_lesson_content; the async client has no sync loader, so its lessons
+    only carry content when it was selected.
+    """
+    def decorator(method):
+        if asyncio.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(self, *args, **kwargs):
+                return to_models(await method(self, *args, **kwargs), model)
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            return to_models(method(self, *args, **kwargs), model, getattr(self, 'get_lesson_content', None))
+        return wrapper
+    return decorator
+
+
+def lesson_summary(lesson):
+    """Return a lesson row as listed by SupabaseClient.get_lessons_by_section.
+
+    The content is replaced by the quiz_count and tasks_count computed
+    columns (see database_migration.sql).
+    """
+    content = lesson.get('content') or {}
+    summary = {key: value for key, value in lesson.items() if key != 'content'}
+    summary['quiz_count'] = len(content.get('quiz') or [])
+    summary['tasks_count'] = len(content.get('tasks') or [])
+    return summary
 
-// Изменение содержимого
-element.textContent = 'Новый текст';
-        </code></pre>
-        """,
-        "quiz": [
-            {
-                "question": "Что означает аббревиатура DOM?",
-                "options": [
-                    "Document Object Model",
-                    "Dynamic Object Management", 
-                    "Data Object Model",
-                    "Document Oriented Markup"
-                ],
-                "correct_answer": 0
-            },
-            {
-                "question": "Какой метод используется для получения элемента по ID?",
-                "options": [
-                    "document.getElement()",
-                    "document.getElementById()",
-                    "document.findById()",
-                    "document.selectById()"
-                ],
-                "correct_answer": 1
-            }
-        ],
-        "tasks": [
-            "Создайте HTML страницу с элементом h1 и кнопкой. При нажатии на кнопку текст заголовка должен изменяться."
-        ]
-    }
 
 def create_sample_lesson_content():
     """Create sample lesson content for testing"""
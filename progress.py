@@ -0,0 +1,234 @@
+"""
+Lesson completion of learners, kept as one bitmap per learner.
+
+Lessons get dense ordinals in course order (levels, sections and lessons by
+order_index) from the course tree; bit n of a learner's bitmap is set once
+the lesson with ordinal n is completed. The lessons of a level have
+consecutive ordinals, so the share of a level done is a popcount under the
+level's mask and the next unfinished lesson is the lowest clear bit in it.
+In memory a bitmap is a Python int; learner_progress stores it as a bytea
+in which bit n is bit n % 8 of byte n // 8, as get_bit() numbers them.
+
+Adding, moving or deleting lessons changes the ordinals. Every ordering is
+stored once in lesson_orders under a hash of its lesson ids and each bitmap
+records the ordering it was written in, so a bitmap of an older ordering is
+remapped by lesson id when it is read (completions of deleted lessons drop
+out) and saved in the current ordering with the learner's next completion.
+
+Learners are anonymous: a random id in the ``learner`` cookie, which is only
+sent to /api/progress, so public pages stay shared and cacheable. The
+cookie also carries the revision of the learner's last write; a worker
+whose cached bitmap is older reads it again.
+"""
+import hashlib
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+COOKIE_NAME = 'learner'
+COOKIE_PATH = '/api/progress'
+COOKIE_MAX_AGE = 365 * 24 * 60 * 60
+# Bitmaps kept per worker; the least recently used learner is dropped first
+DEFAULT_MAX_LEARNERS = 10000
+# Writes racing with another worker for the same learner are retried
+SAVE_ATTEMPTS = 3
+
+
+def ordering_version(lesson_ids: Sequence[int]) -> str:
+    """Hash naming an ordering of lessons in lesson_orders."""
+    return hashlib.blake2b(','.join(map(str, lesson_ids)).encode(), digest_size=8).hexdigest()
+
+
+@dataclass(frozen=True, slots=True)
+class LessonIndex:
+    """Dense ordinals of the lessons of a course tree."""
+    version: str
+    lesson_ids: Tuple[int, ...]
+    ordinals: Dict[int, int]
+    levels: Dict[int, Tuple[int, int]]  # level id -> (first ordinal, ordinal after the last)
+
+    @classmethod
+    def from_tree(cls, tree) -> "LessonIndex":
+        lesson_ids: List[int] = []
+        levels = {}
+        for level in tree:
+            start = len(lesson_ids)
+            lesson_ids.extend(lesson.id for section in level.sections for lesson in section.lessons)
+            levels[level.id] = (start, len(lesson_ids))
+        return cls(ordering_version(lesson_ids), tuple(lesson_ids),
+                   {lesson_id: ordinal for ordinal, lesson_id in enumerate(lesson_ids)}, levels)
+
+    def level_mask(self, level_id: int) -> int:
+        start, end = self.levels[level_id]
+        return ((1 << (end - start)) - 1) << start
+
+
+_tree_index = (None, None)
+
+
+def lesson_index(tree) -> LessonIndex:
+    """Index of the course tree; built once per cached tree."""
+    global _tree_index
+    cached_tree, index = _tree_index
+    if cached_tree is not tree:
+        index = LessonIndex.from_tree(tree)
+        # Keeping the tree referenced makes the identity check safe
+        _tree_index = (tree, index)
+    return index
+
+
+def encode_bitmap(bits: int) -> str:
+    """A bitmap as a bytea literal for PostgREST."""
+    return '\\x' + bits.to_bytes((bits.bit_length() + 7) // 8, 'little').hex()
+
+
+def decode_bitmap(value: Optional[str]) -> int:
+    """A bitmap from a bytea as PostgREST returns it (hex format)."""
+    if not value:
+        return 0
+    return int.from_bytes(bytes.fromhex(value[2:] if value.startswith('\\x') else value), 'little')
+
+
+def iter_ordinals(bits: int):
+    """Ordinals of the set bits, lowest first."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def remap(bits: int, old_ids: Sequence[int], index: LessonIndex) -> int:
+    """Move a bitmap of an older ordering to the ordinals of index."""
+    remapped = 0
+    for ordinal in iter_ordinals(bits):
+        target = index.ordinals.get(old_ids[ordinal]) if ordinal < len(old_ids) else None
+        if target is not None:
+            remapped |= 1 << target
+    return remapped
+
+
+def level_progress(bits: int, index: LessonIndex, level_id: int) -> Dict[str, Any]:
+    """Lessons done, their share and the first unfinished lesson of a level."""
+    start, end = index.levels[level_id]
+    mask = index.level_mask(level_id)
+    done = (bits & mask).bit_count()
+    todo = ~bits & mask
+    return {
+        'done': done,
+        'total': end - start,
+        'percent': round(100 * done / (end - start)) if end > start else 0,
+        'next_lesson_id': index.lesson_ids[(todo & -todo).bit_length() - 1] if todo else None,
+    }
+
+
+def progress_summary(bits: int, index: LessonIndex) -> Dict[str, Any]:
+    """Completed lesson ids and the progress of every level, for /api/progress."""
+    return {
+        'completed': [index.lesson_ids[ordinal] for ordinal in iter_ordinals(bits)],
+        'levels': {level_id: level_progress(bits, index, level_id) for level_id in index.levels},
+    }
+
+
+def parse_cookie(value: Optional[str]) -> Tuple[Optional[str], int]:
+    """Learner id and last written revision from the cookie; (None, 0) if there is none."""
+    try:
+        learner_id, revision = (value or '').split('.')
+        return str(uuid.UUID(learner_id)), int(revision)
+    except ValueError:
+        return None, 0
+
+
+def cookie_value(learner_id: str, revision: int) -> str:
+    return f'{learner_id}.{revision}'
+
+
+def new_learner_id() -> str:
+    return str(uuid.uuid4())
+
+
+@dataclass(frozen=True, slots=True)
+class LearnerProgress:
+    """A learner's bitmap in the ordering named by version, as of a revision."""
+    version: str
+    revision: int
+    bits: int
+
+
+class ProgressStore:
+    """Per-worker LRU cache of learner bitmaps in front of learner_progress.
+
+    Saves are compare-and-swap on the row's revision, so two workers
+    completing lessons of one learner at the same time both keep their bit.
+    Reads and saves raise if the database fails.
+    """
+
+    def __init__(self, client, max_learners: int = DEFAULT_MAX_LEARNERS):
+        self.client = client
+        self.max_learners = max_learners
+        self._learners: OrderedDict = OrderedDict()
+        self._saved_versions = set()
+        self._lock = threading.Lock()
+
+    def _cached(self, learner_id: str) -> Optional[LearnerProgress]:
+        with self._lock:
+            entry = self._learners.get(learner_id)
+            if entry is not None:
+                self._learners.move_to_end(learner_id)
+            return entry
+
+    def _remember(self, learner_id: str, entry: LearnerProgress):
+        with self._lock:
+            cached = self._learners.get(learner_id)
+            # A concurrent request of the learner may have cached a newer revision
+            if cached is not None and cached.revision > entry.revision:
+                return
+            self._learners[learner_id] = entry
+            self._learners.move_to_end(learner_id)
+            if len(self._learners) > self.max_learners:
+                self._learners.popitem(last=False)
+
+    def load(self, learner_id: str, index: LessonIndex, min_revision: int = 0) -> LearnerProgress:
+        """Bitmap of a learner in the ordering of index.
+
+        The cached bitmap is used unless it is older than min_revision, the
+        revision the learner's cookie says was written last.
+        """
+        entry = self._cached(learner_id)
+        if entry is None or entry.revision < min_revision:
+            row = self.client.get_learner_progress(learner_id)
+            if row is None:
+                entry = LearnerProgress(index.version, 0, 0)
+            else:
+                entry = LearnerProgress(row['lesson_order'], row['revision'], decode_bitmap(row['completed']))
+        if entry.version != index.version:
+            old_ids = self.client.get_lesson_order(entry.version)
+            if old_ids is None:
+                logger.warning("Lesson order %s of learner %s is missing; progress dropped", entry.version, learner_id)
+            entry = LearnerProgress(index.version, entry.revision, remap(entry.bits, old_ids or (), index))
+        self._remember(learner_id, entry)
+        return entry
+
+    def complete(self, learner_id: str, lesson_id: int, index: LessonIndex,
+                 min_revision: int = 0) -> LearnerProgress:
+        """Mark a lesson of index completed; raises KeyError if it is not in index."""
+        bit = 1 << index.ordinals[lesson_id]
+        entry = self.load(learner_id, index, min_revision)
+        for _ in range(SAVE_ATTEMPTS):
+            if entry.bits & bit:
+                return entry
+            if index.version not in self._saved_versions:
+                self.client.save_lesson_order(index.version, index.lesson_ids)
+                self._saved_versions.add(index.version)
+            saved = LearnerProgress(index.version, entry.revision + 1, entry.bits | bit)
+            if self.client.save_learner_progress(learner_id, saved.version, encode_bitmap(saved.bits),
+                                                 saved.revision):
+                self._remember(learner_id, saved)
+                return saved
+            # Another worker saved first; add the bit to its bitmap
+            entry = self.load(learner_id, index, entry.revision + 1)
+        raise RuntimeError(f"Progress of learner {learner_id} keeps changing, gave up saving")
@@ -0,0 +1,139 @@
+"""
+In-memory token-bucket admission control.
+
+Every request belongs to a route group (public pages, API, admin panel,
+uploads, login). Each group has a bucket per client IP and one global
+bucket, so a single crawler is throttled on its own while a crowd of
+students is still capped as a whole before it exhausts the Supabase quota.
+Requests over the limit get a plain 429 with Retry-After from a
+before_request hook, before the view touches the database.
+
+Buckets live in the worker process: with N gunicorn workers the effective
+limits are up to N times the configured ones.
+"""
+import math
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from flask import request
+
+# Static files are served without admission control
+STATIC_PREFIX = '/static/'
+
+
+def route_group(method: str, path: str) -> Optional[str]:
+    """Return the rate-limit group of a request, or None if it is not limited."""
+    if path.startswith(STATIC_PREFIX):
+        return None
+    if path == '/bod/login' and method == 'POST':
+        return 'login'
+    if path == '/bod/upload_image':
+        return 'upload'
+    if path.startswith('/bod'):
+        return 'admin'
+    if path.startswith('/api/'):
+        return 'api'
+    return 'public'
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to burst; each request takes one."""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated_at')
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+
+    def wait(self, now: float) -> float:
+        """Refill; returns 0 if a token is available, else seconds until one is.
+
+        Not thread-safe: RateLimiter serialises access.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> float:
+        """Take a token; returns 0 on success, else seconds until one is available."""
+        wait = self.wait(now)
+        if not wait:
+            self.tokens -= 1
+        return wait
+
+
+class RateLimiter:
+    """Per-client and global token buckets for each route group.
+
+    Args:
+        limits: group -> {'per_ip': (rate, burst), 'global': (rate, burst)};
+            rates are requests per second, either entry may be omitted
+        max_clients: per-IP buckets kept per group; the least recently seen
+            client is forgotten first (and starts again with a full bucket)
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, Tuple[float, float]]], max_clients: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.limits = limits
+        self.max_clients = max_clients
+        self.clock = clock
+        now = clock()
+        self._global = {group: TokenBucket(*limit['global'], now)
+                        for group, limit in limits.items() if limit.get('global')}
+        self._clients: Dict[str, OrderedDict] = {group: OrderedDict() for group in limits}
+        self._lock = threading.Lock()
+
+    def check(self, group: str, client: str) -> float:
+        """Admit one request; returns 0, or the seconds the client should wait."""
+        limit = self.limits.get(group)
+        if limit is None:
+            return 0.0
+        with self._lock:
+            now = self.clock()
+            buckets = []
+            if limit.get('per_ip'):
+                clients = self._clients[group]
+                bucket = clients.get(client)
+                if bucket is None:
+                    bucket = clients[client] = TokenBucket(*limit['per_ip'], now)
+                    if len(clients) > self.max_clients:
+                        clients.popitem(last=False)
+                else:
+                    clients.move_to_end(client)
+                buckets.append(bucket)
+            if group in self._global:
+                buckets.append(self._global[group])
+            # A request turned away by one bucket costs nothing from the other
+            for bucket in buckets:
+                wait = bucket.wait(now)
+                if wait:
+                    return wait
+            for bucket in buckets:
+                bucket.take(now)
+            return 0.0
+
+def init_rate_limit(app):
+    """Register the admission check on the app if RATE_LIMIT_ENABLED is set.
+
+    The client address is request.remote_addr, which ProxyFix sets from the
+    X-Forwarded-For header added by the trusted proxy.
+    """
+    if not app.config.get('RATE_LIMIT_ENABLED'):
+        return None
+    limiter = RateLimiter(app.config['RATE_LIMITS'], app.config.get('RATE_LIMIT_MAX_CLIENTS', 10000))
+
+    @app.before_request
+    def admit_request():
+        group = route_group(request.method, request.path)
+        if group is None:
+            return None
+        wait = limiter.check(group, request.remote_addr or '')
+        if not wait:
+            return None
+        return app.response_class('Too Many Requests\n', status=429, mimetype='text/plain',
+                                  headers={'Retry-After': str(max(1, math.ceil(wait)))})
+
+    return limiter
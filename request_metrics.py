@@ -0,0 +1,178 @@
+"""
+Per-request accounting of data-layer round trips and template render time.
+
+Every SupabaseClient method is wrapped with ``db_call``; inside a request the
+call count and wall time are collected on ``flask.g`` and reported in a
+``Server-Timing`` response header and one structured log line per request.
+
+Streamed responses render after the after_request hooks: their header
+reports the time up to then, and the log line is written when the stream
+ends, with the full render time.
+"""
+import time
+import asyncio
+import logging
+import functools
+from collections import Counter
+from flask import g, request, current_app, has_request_context, before_render_template, template_rendered
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetrics:
+    """Counters collected while handling a single request."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.db_calls = Counter()
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.snapshot_reads = 0
+        self.collapsed_reads = 0
+        self.template_time = 0.0
+        self._template_started_at = None
+
+    @property
+    def db_call_count(self) -> int:
+        return sum(self.db_calls.values())
+
+    def render_time(self) -> float:
+        """Template time so far, including a template still rendering (streamed)."""
+        if self._template_started_at is None:
+            return self.template_time
+        return self.template_time + time.perf_counter() - self._template_started_at
+
+    def server_timing(self, total: float) -> str:
+        entries = [
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_call_count} calls"',
+            f'cache;desc="{self.cache_hits} hits"',
+            f'tpl;dur={self.render_time() * 1000:.1f}',
+            f'app;dur={total * 1000:.1f}',
+        ]
+        if self.snapshot_reads:
+            entries.insert(2, f'snapshot;desc="{self.snapshot_reads} reads"')
+        if self.collapsed_reads:
+            entries.insert(2, f'coalesced;desc="{self.collapsed_reads} reads"')
+        return ', '.join(entries)
+
+
+def current_metrics():
+    """Return the metrics of the current request, or None outside a request."""
+    if not has_request_context():
+        return None
+    return g.get('_request_metrics')
+
+
+def record_cache_hit():
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.cache_hits += 1
+
+
+def record_snapshot_read():
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.snapshot_reads += 1
+
+
+def record_collapsed_read():
+    """Count a read that waited for an identical in-flight read instead of querying."""
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.collapsed_reads += 1
+
+
+def _record_db_call(name: str, elapsed: float):
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.db_calls[name] += 1
+        metrics.db_time += elapsed
+
+
+def db_call(method):
+    """Record the call count and wall time of a data-layer method (sync or async)."""
+    if asyncio.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                _record_db_call(method.__name__, time.perf_counter() - start)
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _record_db_call(method.__name__, time.perf_counter() - start)
+    return wrapper
+
+
+def _start_request():
+    g._request_metrics = RequestMetrics()
+
+
+def _before_render(sender, template, context, **extra):
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics._template_started_at = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    metrics = current_metrics()
+    if metrics is not None and metrics._template_started_at is not None:
+        metrics.template_time += time.perf_counter() - metrics._template_started_at
+        metrics._template_started_at = None
+
+
+def _finish_request(response):
+    metrics = current_metrics()
+    if metrics is None or request.endpoint == 'static':
+        return response
+
+    response.headers['Server-Timing'] = metrics.server_timing(time.perf_counter() - metrics.started_at)
+    # The log line runs outside the request context for streams, so take
+    # what it needs now
+    log = functools.partial(_log_request, metrics, request.method, request.path, request.endpoint,
+                            response.status_code, current_app.config.get('ROUNDTRIP_WARN_THRESHOLD'))
+    if response.is_streamed:
+        response.call_on_close(log)
+    else:
+        log()
+    return response
+
+
+def _log_request(metrics, method, path, endpoint, status, threshold):
+    total = time.perf_counter() - metrics.started_at
+    duration_ms = round(total * 1000, 1)
+    logger.info("%s %s %s in %.1f ms", method, path, status, duration_ms,
+                extra={'fields': {
+                    'event': 'request',
+                    'method': method,
+                    'path': path,
+                    'endpoint': endpoint,
+                    'status': status,
+                    'duration_ms': duration_ms,
+                    'db_calls': metrics.db_call_count,
+                    'db_ms': round(metrics.db_time * 1000, 1),
+                    'cache_hits': metrics.cache_hits,
+                    'snapshot_reads': metrics.snapshot_reads,
+                    'collapsed_reads': metrics.collapsed_reads,
+                    'template_ms': round(metrics.render_time() * 1000, 1),
+                }})
+
+    # Reads answered from the snapshot made no round trip
+    if threshold and metrics.db_call_count - metrics.snapshot_reads > threshold:
+        logger.warning("%s %s made %s Supabase round trips (threshold %s): %s",
+                       method, path, metrics.db_call_count, threshold, dict(metrics.db_calls))
+
+
+def init_request_metrics(app):
+    """Register the request hooks and template signals on the app."""
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
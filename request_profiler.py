@@ -0,0 +1,235 @@
+"""
+On-demand profiling of single requests.
+
+An admin adds a signed token as the ``_profile`` query parameter (or the
+``X-Profile-Token`` header) to any URL. That one request then runs under a
+sampling profiler and tracemalloc, and the result is saved as JSON to the
+instance folder, viewable under /bod/profiles. Requests without the token
+pay only for a dictionary lookup. A streamed response is profiled until the
+stream ends, so the profile covers its rendering.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+import tracemalloc
+import logging
+from collections import Counter
+from datetime import datetime
+from flask import g, request
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'X-Profile-Token'
+SAMPLE_INTERVAL = 0.002  # seconds between stack samples
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATIONS = 25
+TOKEN_MAX_AGE = 24 * 60 * 60
+
+# tracemalloc is process-wide, so only one request is profiled at a time
+_profile_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    """Sample the stack of one thread at a fixed interval from a helper thread.
+
+    Stacks are aggregated in folded format ("root;child;leaf" -> samples),
+    the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._fold(frame)] += 1
+
+    @staticmethod
+    def _fold(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            path = '/'.join(code.co_filename.split(os.sep)[-2:])
+            names.append(f"{code.co_name} ({path}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+
+class RequestProfile:
+    """A running profile of the current request."""
+
+    def __init__(self):
+        self.id = datetime.utcnow().strftime('%Y%m%dT%H%M%S') + '-' + uuid.uuid4().hex[:6]
+        self.started_at = time.perf_counter()
+        # Taken now: a streamed response is stopped outside the request context
+        self.method = request.method
+        self.path = request.full_path.rstrip('?')
+        self.endpoint = request.endpoint
+        self.sampler = SamplingProfiler(threading.get_ident())
+        self.owns_tracemalloc = not tracemalloc.is_tracing()
+
+    def start(self):
+        if self.owns_tracemalloc:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.sampler.start()
+
+    def stop(self, status_code: int = None) -> dict:
+        self.sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self.owns_tracemalloc:
+            tracemalloc.stop()
+
+        allocations = [
+            {
+                'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                'size': stat.size,
+                'count': stat.count,
+            }
+            for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+        ]
+        return {
+            'id': self.id,
+            'created_at': datetime.utcnow().isoformat(),
+            'method': self.method,
+            'path': self.path,
+            'endpoint': self.endpoint,
+            'status': status_code,
+            'duration_ms': round((time.perf_counter() - self.started_at) * 1000, 1),
+            'sample_interval_ms': self.sampler.interval * 1000,
+            'samples': sum(self.sampler.stacks.values()),
+            'memory_current': current,
+            'memory_peak': peak,
+            'stacks': dict(self.sampler.stacks.most_common()),
+            'allocations': allocations,
+        }
+
+
+def _serializer(app):
+    return URLSafeTimedSerializer(app.secret_key, salt='request-profile')
+
+
+def make_profile_token(app) -> str:
+    """Create a signed token that enables profiling for an admin session."""
+    return _serializer(app).dumps('profile')
+
+
+def _valid_token(app, token: str) -> bool:
+    try:
+        _serializer(app).loads(token, max_age=TOKEN_MAX_AGE)
+        return True
+    except BadSignature:
+        return False
+
+
+def profile_dir(app) -> str:
+    return os.path.join(app.instance_path, 'profiles')
+
+
+def list_profiles(app) -> list:
+    """Return metadata of stored profiles, newest first."""
+    directory = profile_dir(app)
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith('.json'):
+            profile = load_profile(app, name[:-len('.json')])
+            if profile:
+                profile.pop('stacks', None)
+                profile.pop('allocations', None)
+                profiles.append(profile)
+    return profiles
+
+
+def load_profile(app, profile_id: str):
+    """Load a stored profile by id, or None if it does not exist."""
+    if os.sep in profile_id or profile_id.startswith('.'):
+        return None
+    path = os.path.join(profile_dir(app), profile_id + '.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def folded_stacks(profile: dict) -> str:
+    """Render stacks in folded format for flamegraph.pl or speedscope."""
+    return ''.join(f"{stack} {count}\n" for stack, count in profile['stacks'].items())
+
+
+def _save_profile(app, profile: dict):
+    directory = profile_dir(app)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, profile['id'] + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False)
+
+
+def init_request_profiler(app, is_authorized):
+    """Register the profiling hooks.
+
+    Args:
+        app: The Flask app
+        is_authorized: Callable returning True if the current session may profile
+    """
+    def start_profile():
+        token = request.args.get(PROFILE_PARAM) or request.headers.get(PROFILE_HEADER)
+        if not token:
+            return
+        if not is_authorized() or not _valid_token(app, token):
+            logger.warning("Rejected profiling request for %s", request.path)
+            return
+        if not _profile_lock.acquire(blocking=False):
+            logger.info("Skipped profiling %s: another profile is running", request.path)
+            return
+        g._profile = RequestProfile()
+        g._profile.start()
+
+    def store_profile(active, status_code):
+        try:
+            profile = active.stop(status_code)
+            _save_profile(app, profile)
+            logger.info("Stored profile %s for %s (%s samples)", profile['id'], profile['path'], profile['samples'])
+        finally:
+            _profile_lock.release()
+
+    def finish_profile(response):
+        active = g.pop('_profile', None)
+        if active is None:
+            return response
+        response.headers['X-Profile-Id'] = active.id
+        if response.is_streamed:
+            # The body renders while it is sent; stop when it has been
+            response.call_on_close(lambda: store_profile(active, response.status_code))
+        else:
+            store_profile(active, response.status_code)
+        return response
+
+    def abort_profile(exc):
+        active = g.pop('_profile', None)
+        if active is not None:
+            active.sampler.stop()
+            if active.owns_tracemalloc:
+                tracemalloc.stop()
+            _profile_lock.release()
+
+    app.before_request(start_profile)
+    app.after_request(finish_profile)
+    app.teardown_request(abort_profile)
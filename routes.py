@@ -1,14 +1,28 @@
 import os
 import json
 import logging
-from flask import render_template, request, redirect, url_for, jsonify, session, flash
+from flask import (render_template, request, redirect, url_for, jsonify, session, flash, make_response,
+                   get_template_attribute)
 from werkzeug.utils import secure_filename
 from app import app
-from supabase_client import supabase_client
+from supabase_client import get_supabase_client
+from async_supabase_client import get_async_supabase_client
 from models import create_sample_lesson_content
+from course_transfer import export_course, import_course
+from changes_feed import Cursor, read_changes, DEFAULT_LIMIT, MAX_LIMIT
+from streaming import stream_flushed_template
+from progress import (lesson_index, progress_summary, parse_cookie, cookie_value, new_learner_id,
+                      COOKIE_NAME as LEARNER_COOKIE, COOKIE_PATH as LEARNER_COOKIE_PATH,
+                      COOKIE_MAX_AGE as LEARNER_COOKIE_MAX_AGE)
+from http_cache import (page_validator, index_validator, not_modified, cacheable,
+                        surrogate_keys_for_change, purge)
+from request_profiler import (init_request_profiler, make_profile_token, list_profiles,
+                              load_profile, folded_stacks, PROFILE_PARAM)
+from collections import Counter
+from dataclasses import asdict
 import uuid
-from PIL import Image
 import io
+from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
@@ -26,97 +40,95 @@ def allowed_file(filename):
 def is_admin():
     return session.get('admin_logged_in', False)
 
+# Admins can profile any single request with a signed token
+init_request_profiler(app, is_admin)
+
 @app.route('/')
 def index():
     """Main page showing all levels and sections"""
     initialize_sample_data()  # Create sample data if needed
-    levels = supabase_client.get_all_levels()
+    levels_with_sections = get_supabase_client().get_course_tree()
     
-    # Get sections for each level
-    levels_with_sections = []
-    for level in levels:
-        sections = supabase_client.get_sections_by_level(level['id'])
-        
-        # Get lessons for each section
-        sections_with_lessons = []
-        for section in sections:
-            lessons = supabase_client.get_lessons_by_section(section['id'])
-            section_data = section.copy()
-            section_data['lessons'] = lessons
-            sections_with_lessons.append(section_data)
-        
-        level_data = level.copy()
-        level_data['sections'] = sections_with_lessons
-        levels_with_sections.append(level_data)
+    validator = index_validator(levels_with_sections)
+    response = not_modified(validator)
+    if response is not None:
+        return response
     
-    return render_template('index.html', levels=levels_with_sections)
+    return cacheable(make_response(render_template('index.html', levels=levels_with_sections)), validator)
 
 @app.route('/level-<int:level_order>')
 def level_page(level_order):
     """Level page showing sections and lessons"""
-    levels = supabase_client.get_all_levels()
     level = None
     
-    for l in levels:
-        if l['order_index'] == level_order:
+    # The cached tree is shared and immutable, so it is used as is
+    for l in get_supabase_client().get_course_tree():
+        if l.order_index == level_order:
             level = l
             break
     
     if not level:
         return "Level not found", 404
     
-    sections = supabase_client.get_sections_by_level(level['id'])
-    
-    # Get lessons for each section
-    sections_with_lessons = []
-    for section in sections:
-        lessons = supabase_client.get_lessons_by_section(section['id'])
-        section_data = section.copy()
-        section_data['lessons'] = lessons
-        sections_with_lessons.append(section_data)
+    validator = page_validator((level,), (f'level-{level.id}',))
+    response = not_modified(validator)
+    if response is not None:
+        return response
     
-    return render_template('level.html', level=level, sections=sections_with_lessons)
+    return cacheable(make_response(render_template('level.html', level=level, sections=level.sections)), validator)
 
 @app.route('/level-<int:level_order>/section-<int:section_order>-<section_name>/lesson-<int:lesson_order>-<lesson_name>')
 def lesson_page(level_order, section_order, section_name, lesson_order, lesson_name):
     """Individual lesson page"""
-    levels = supabase_client.get_all_levels()
+    levels = get_supabase_client().get_all_levels()
     level = None
     
     for l in levels:
-        if l['order_index'] == level_order:
+        if l.order_index == level_order:
             level = l
             break
     
     if not level:
         return "Level not found", 404
     
-    sections = supabase_client.get_sections_by_level(level['id'])
+    sections = get_supabase_client().get_sections_by_level(level.id)
     section = None
     
     for s in sections:
-        if s['order_index'] == section_order:
+        if s.order_index == section_order:
             section = s
             break
     
     if not section:
         return "Section not found", 404
     
-    lessons = supabase_client.get_lessons_by_section(section['id'])
+    lessons = get_supabase_client().get_lessons_by_section(section.id)
     lesson = None
     
     for l in lessons:
-        if l['order_index'] == lesson_order:
+        if l.order_index == lesson_order:
             lesson = l
             break
     
     if not lesson:
         return "Lesson not found", 404
     
+    # Summaries carry updated_at, so a revalidation needs no content
+    validator = page_validator((level, section) + tuple(lessons),
+                               (f'level-{level.id}', f'section-{section.id}', f'lesson-{lesson.id}'))
+    response = not_modified(validator)
+    if response is not None:
+        return response
+    
+    # The list holds summaries; only the current lesson needs its content
+    lesson = get_supabase_client().get_lesson_by_id(lesson.id)
+    if not lesson:
+        return "Lesson not found", 404
+    
     # Find previous and next lessons
     current_index = None
     for i, l in enumerate(lessons):
-        if l['id'] == lesson['id']:
+        if l.id == lesson.id:
             current_index = i
             break
     
@@ -128,13 +140,82 @@ def lesson_page(level_order, section_order, section_name, lesson_order, lesson_n
         if current_index < len(lessons) - 1:
             next_lesson = lessons[current_index + 1]
     
-    return render_template('lesson.html', 
-                         level=level, 
-                         section=section, 
-                         lesson=lesson, 
-                         lessons=lessons,
-                         prev_lesson=prev_lesson,
-                         next_lesson=next_lesson)
+    # Stream so the header and breadcrumb reach the browser before the
+    # theory and quiz are rendered
+    return cacheable(stream_flushed_template('lesson.html',
+                                             level=level,
+                                             section=section,
+                                             lesson=lesson,
+                                             lessons=lessons,
+                                             prev_lesson=prev_lesson,
+                                             next_lesson=next_lesson), validator)
+
+@app.route('/api/changes')
+def api_changes():
+    """Levels, sections, lessons and deletes after a cursor, for delta sync"""
+    since = request.args.get('since')
+    limit = min(max(request.args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+    try:
+        cursor = Cursor.decode(since) if since else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        feed = read_changes(get_supabase_client(), cursor, limit, app.config['CHANGES_SETTLE_SECONDS'])
+    except Exception as e:
+        logger.error("Reading the changes feed failed: %s", e)
+        return jsonify({'error': 'Changes are unavailable'}), 503
+    
+    # New changes keep arriving after a cursor already handed out, so shared
+    # caches must revalidate every time
+    response = jsonify(feed)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def progress_response(bits, index):
+    """Progress of one learner; never stored by shared caches"""
+    response = jsonify(progress_summary(bits, index))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/api/progress')
+def api_progress():
+    """Completed lessons and per-level progress of the learner in the cookie"""
+    db = get_supabase_client()
+    index = lesson_index(db.get_course_tree())
+    learner_id, revision = parse_cookie(request.cookies.get(LEARNER_COOKIE))
+    if learner_id is None:
+        return progress_response(0, index)
+    
+    try:
+        progress = db.progress.load(learner_id, index, revision)
+    except Exception as e:
+        logger.error("Reading progress of learner %s failed: %s", learner_id, e)
+        return jsonify({'error': 'Progress is unavailable'}), 503
+    return progress_response(progress.bits, index)
+
+@app.route('/api/progress/<int:lesson_id>', methods=['POST'])
+def api_complete_lesson(lesson_id):
+    """Mark a lesson completed for the learner in the cookie (a new learner without one)"""
+    db = get_supabase_client()
+    index = lesson_index(db.get_course_tree())
+    if lesson_id not in index.ordinals:
+        return jsonify({'error': 'Lesson not found'}), 404
+    
+    learner_id, revision = parse_cookie(request.cookies.get(LEARNER_COOKIE))
+    learner_id = learner_id or new_learner_id()
+    try:
+        progress = db.progress.complete(learner_id, lesson_id, index, revision)
+    except Exception as e:
+        logger.error("Saving progress of learner %s failed: %s", learner_id, e)
+        return jsonify({'error': 'Progress is unavailable'}), 503
+    
+    # The cookie goes to /api/progress only, so public pages stay shared
+    response = progress_response(progress.bits, index)
+    response.set_cookie(LEARNER_COOKIE, cookie_value(learner_id, progress.revision),
+                        max_age=LEARNER_COOKIE_MAX_AGE, path=LEARNER_COOKIE_PATH,
+                        httponly=True, samesite='Lax', secure=request.is_secure)
+    return response
 
 # Admin routes
 @app.route('/bod')
@@ -168,29 +249,96 @@ def admin_logout():
     return redirect(url_for('admin_login'))
 
 @app.route('/bod/dashboard')
-def admin_dashboard():
+async def admin_dashboard():
     """Admin dashboard"""
     if not is_admin():
         return redirect(url_for('admin_login'))
     
-    levels = supabase_client.get_all_levels()
-    
-    # Get sections and lessons for each level
-    levels_with_data = []
-    for level in levels:
-        sections = supabase_client.get_sections_by_level(level['id'])
-        sections_with_lessons = []
-        for section in sections:
-            lessons = supabase_client.get_lessons_by_section(section['id'])
-            section_data = section.copy()
-            section_data['lessons'] = lessons
-            sections_with_lessons.append(section_data)
-        
-        level_data = level.copy()
-        level_data['sections'] = sections_with_lessons
-        levels_with_data.append(level_data)
+    # Read uncached, so the admin always sees the current state of the course.
+    # Only the levels and the precomputed counters are needed up front; each
+    # level's sections are loaded by admin.js when it is expanded
+    db = get_async_supabase_client()
+    levels, stats = await db.run(db.gather(db.get_all_levels(), db.get_course_stats()))
+    
+    return render_template('admin/dashboard.html', levels=levels, stats=stats)
+
+@app.route('/bod/level/<int:level_id>/sections')
+async def admin_level_sections(level_id):
+    """Sections and lessons of one level as an HTML fragment for admin.js"""
+    if not is_admin():
+        return jsonify({'error': 'Unauthorized'}), 401
     
-    return render_template('admin/dashboard.html', levels=levels_with_data)
+    db = get_async_supabase_client()
+    sections, stats = await db.run(db.gather(db.get_level_sections(level_id), db.get_course_stats()))
+    
+    return get_template_attribute('admin/course_nodes.html', 'section_list')(sections, stats)
+
+def purge_pages(table, row_id=None, parent_id=None):
+    """Report the surrogate keys of public pages showing a row about to change.
+
+    Returns:
+        the purged keys, which also name the levels and sections whose
+        counters the change affects
+    """
+    keys = surrogate_keys_for_change(get_supabase_client().get_course_tree(), table, row_id, parent_id)
+    purge(keys)
+    return keys
+
+def wants_json():
+    """Whether the admin request came from admin.js rather than a plain form post"""
+    return request.accept_mimetypes.best == 'application/json'
+
+# Dashboard node of each table and the macro rendering it
+NODE_MACROS = {'levels': ('level', 'level_card'), 'sections': ('section', 'section_card'),
+               'lessons': ('lesson', 'lesson_row')}
+
+def stats_patch(stats, keys):
+    """Counters of the course and of the levels and sections named by keys"""
+    if stats is None:
+        return {}
+    patch = {'course': asdict(stats.course)}
+    for key in keys:
+        scope, _, scope_id = key.partition('-')
+        scope_stats = {'level': stats.levels, 'section': stats.sections}.get(scope, {})
+        if scope_id.isdigit() and int(scope_id) in scope_stats:
+            patch[key] = asdict(scope_stats[int(scope_id)])
+    return patch
+
+def missing_title():
+    if wants_json():
+        return jsonify({'error': 'Title is required'}), 400
+    return redirect(url_for('admin_dashboard'))
+
+def admin_change(table, action, keys, node=None, row_id=None, parent_id=None):
+    """Answer an admin create, update or delete.
+
+    Plain form posts are sent back to the dashboard. admin.js gets only the
+    changed node (the rendered HTML of a created node, the new title of an
+    updated one, the id of a deleted one) and the counters the change moved.
+    """
+    if not wants_json():
+        return redirect(url_for('admin_dashboard'))
+    if node is None and action != 'deleted':
+        return jsonify({'error': 'Operation failed'}), 500
+    
+    kind, macro = NODE_MACROS[table]
+    node_id = f'{kind}-{node.id if node else row_id}'
+    data = {'action': action, 'id': node_id}
+    # Evicted by the write, so this is one query to course_stats
+    stats = get_supabase_client().get_course_stats()
+    if action == 'created':
+        data['parent'] = {'levels': 'course', 'sections': f'level-{parent_id}',
+                          'lessons': f'section-{parent_id}'}[table]
+        render = get_template_attribute('admin/course_nodes.html', macro)
+        if table == 'lessons':
+            data['html'] = str(render(node))
+        else:
+            scope_stats = (stats.levels if table == 'levels' else stats.sections) if stats else {}
+            data['html'] = str(render(node, scope_stats.get(node.id)))
+    elif action == 'updated':
+        data['title'] = node.title
+    data['stats'] = stats_patch(stats, keys + [node_id])
+    return jsonify(data)
 
 # Admin CRUD operations
 @app.route('/bod/create_level', methods=['POST'])
@@ -199,12 +347,14 @@ def create_level():
         return redirect(url_for('admin_login'))
     
     title = request.form.get('title')
-    if title:
-        levels = supabase_client.get_all_levels()
-        order_index = len(levels) + 1
-        supabase_client.create_level(title, order_index)
-    
-    return redirect(url_for('admin_dashboard'))
+    if not title:
+        return missing_title()
+    
+    levels = get_supabase_client().get_all_levels()
+    order_index = len(levels) + 1
+    keys = purge_pages('levels')
+    level = get_supabase_client().create_level(title, order_index)
+    return admin_change('levels', 'created', keys, level)
 
 @app.route('/bod/update_level/<int:level_id>', methods=['POST'])
 def update_level(level_id):
@@ -212,18 +362,21 @@ def update_level(level_id):
         return redirect(url_for('admin_login'))
     
     title = request.form.get('title')
-    if title:
-        supabase_client.update_level(level_id, title)
+    if not title:
+        return missing_title()
     
-    return redirect(url_for('admin_dashboard'))
+    keys = purge_pages('levels', level_id)
+    level = get_supabase_client().update_level(level_id, title)
+    return admin_change('levels', 'updated', keys, level)
 
 @app.route('/bod/delete_level/<int:level_id>', methods=['POST'])
 def delete_level(level_id):
     if not is_admin():
         return redirect(url_for('admin_login'))
     
-    supabase_client.delete_level(level_id)
-    return redirect(url_for('admin_dashboard'))
+    keys = purge_pages('levels', level_id)
+    get_supabase_client().delete_level(level_id)
+    return admin_change('levels', 'deleted', keys, row_id=level_id)
 
 @app.route('/bod/create_section/<int:level_id>', methods=['POST'])
 def create_section(level_id):
@@ -231,12 +384,14 @@ def create_section(level_id):
         return redirect(url_for('admin_login'))
     
     title = request.form.get('title')
-    if title:
-        sections = supabase_client.get_sections_by_level(level_id)
-        order_index = len(sections) + 1
-        supabase_client.create_section(level_id, title, order_index)
-    
-    return redirect(url_for('admin_dashboard'))
+    if not title:
+        return missing_title()
+    
+    sections = get_supabase_client().get_sections_by_level(level_id)
+    order_index = len(sections) + 1
+    keys = purge_pages('sections', parent_id=level_id)
+    section = get_supabase_client().create_section(level_id, title, order_index)
+    return admin_change('sections', 'created', keys, section, parent_id=level_id)
 
 @app.route('/bod/update_section/<int:section_id>', methods=['POST'])
 def update_section(section_id):
@@ -244,18 +399,21 @@ def update_section(section_id):
         return redirect(url_for('admin_login'))
     
     title = request.form.get('title')
-    if title:
-        supabase_client.update_section(section_id, title)
+    if not title:
+        return missing_title()
     
-    return redirect(url_for('admin_dashboard'))
+    keys = purge_pages('sections', section_id)
+    section = get_supabase_client().update_section(section_id, title)
+    return admin_change('sections', 'updated', keys, section)
 
 @app.route('/bod/delete_section/<int:section_id>', methods=['POST'])
 def delete_section(section_id):
     if not is_admin():
         return redirect(url_for('admin_login'))
     
-    supabase_client.delete_section(section_id)
-    return redirect(url_for('admin_dashboard'))
+    keys = purge_pages('sections', section_id)
+    get_supabase_client().delete_section(section_id)
+    return admin_change('sections', 'deleted', keys, row_id=section_id)
 
 @app.route('/bod/create_lesson/<int:section_id>', methods=['POST'])
 def create_lesson(section_id):
@@ -263,25 +421,27 @@ def create_lesson(section_id):
         return redirect(url_for('admin_login'))
     
     title = request.form.get('title')
-    if title:
-        lessons = supabase_client.get_lessons_by_section(section_id)
-        order_index = len(lessons) + 1
-        
-        # Create lesson with sample content if it's the first lesson
-        content = None
-        if order_index == 1:  # First lesson gets sample content
-            content = create_sample_lesson_content()
-        
-        supabase_client.create_lesson(section_id, title, order_index, content)
+    if not title:
+        return missing_title()
     
-    return redirect(url_for('admin_dashboard'))
+    lessons = get_supabase_client().get_lessons_by_section(section_id)
+    order_index = len(lessons) + 1
+    
+    # Create lesson with sample content if it's the first lesson
+    content = None
+    if order_index == 1:  # First lesson gets sample content
+        content = create_sample_lesson_content()
+    
+    keys = purge_pages('lessons', parent_id=section_id)
+    lesson = get_supabase_client().create_lesson(section_id, title, order_index, content)
+    return admin_change('lessons', 'created', keys, lesson, parent_id=section_id)
 
 @app.route('/bod/edit_lesson/<int:lesson_id>')
 def edit_lesson(lesson_id):
     if not is_admin():
         return redirect(url_for('admin_login'))
     
-    lesson = supabase_client.get_lesson_by_id(lesson_id)
+    lesson = get_supabase_client().get_lesson_by_id(lesson_id)
     if not lesson:
         return "Lesson not found", 404
     
@@ -331,16 +491,159 @@ def update_lesson(lesson_id):
         'tasks': tasks_data
     }
     
-    supabase_client.update_lesson(lesson_id, title, content)
-    return redirect(url_for('admin_dashboard'))
+    keys = purge_pages('lessons', lesson_id)
+    lesson = get_supabase_client().update_lesson(lesson_id, title, content)
+    return admin_change('lessons', 'updated', keys, lesson)
 
 @app.route('/bod/delete_lesson/<int:lesson_id>', methods=['POST'])
 def delete_lesson(lesson_id):
     if not is_admin():
         return redirect(url_for('admin_login'))
     
-    supabase_client.delete_lesson(lesson_id)
-    return redirect(url_for('admin_dashboard'))
+    keys = purge_pages('lessons', lesson_id)
+    get_supabase_client().delete_lesson(lesson_id)
+    return admin_change('lessons', 'deleted', keys, row_id=lesson_id)
+
+@app.route('/bod/export')
+def export_course_ndjson():
+    """Download the whole course as NDJSON"""
+    if not is_admin():
+        return redirect(url_for('admin_login'))
+    
+    filename = f"course-{datetime.utcnow():%Y%m%d-%H%M%S}.ndjson"
+    return app.response_class(export_course(get_supabase_client()), mimetype='application/x-ndjson',
+                              headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.route('/bod/import', methods=['POST'])
+def import_course_ndjson():
+    """Upsert the course from an uploaded NDJSON export"""
+    if not is_admin():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return jsonify({'error': 'No file provided'}), 400
+    
+    try:
+        stats = import_course(get_supabase_client(), file.stream)
+        purge(['course'])
+        return jsonify(stats)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error("Course import failed: %s", e)
+        return jsonify({'error': 'Import failed'}), 500
+
+def integer_arg(args, name, default):
+    """An integer from the query string or a JSON body; JSON floats and booleans are rejected"""
+    value = args.get(name, default)
+    if isinstance(value, str):
+        return int(value)
+    if type(value) is not int:
+        raise TypeError(f"{name} must be an integer")
+    return value
+
+def level_exam(level_id, args):
+    """Questions of the exam of a level as chosen by size and seed, or None if there is no level"""
+    # NumPy is only needed in exam mode, so keep it out of worker start-up
+    from exam_grading import draw_exam, DEFAULT_EXAM_SIZE
+    
+    size = max(1, integer_arg(args, 'size', DEFAULT_EXAM_SIZE))
+    seed = integer_arg(args, 'seed', 0)
+    db = get_supabase_client()
+    level = next((l for l in db.get_course_tree() if l.id == level_id), None)
+    if level is None:
+        return None
+    lessons = [lesson for section in level.sections for lesson in section.lessons]
+    # The quizzes of the whole level in one query rather than loading each lesson's content
+    quizzes = db.get_lesson_quizzes(tuple(lesson.id for lesson in lessons if lesson.quiz_count))
+    return draw_exam(((lesson.id, quizzes.get(lesson.id)) for lesson in lessons), size, seed)
+
+@app.route('/bod/exam/<int:level_id>')
+def admin_exam(level_id):
+    """An exam drawn from the quizzes of a level, without the answers"""
+    if not is_admin():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        questions = level_exam(level_id, request.args)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size and seed must be integers'}), 400
+    if questions is None:
+        return jsonify({'error': 'Level not found'}), 404
+    
+    return jsonify({
+        'level_id': level_id,
+        'seed': request.args.get('seed', 0, type=int),
+        'questions': [{'lesson_id': q.lesson_id, 'number': q.number, 'question': q.question,
+                       'options': list(q.options)} for q in questions],
+    })
+
+@app.route('/bod/exam/<int:level_id>/grade', methods=['POST'])
+def admin_grade_exam(level_id):
+    """Grade a class: {"size", "seed", "submissions": [{"student", "answers"}]}"""
+    if not is_admin():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    from exam_grading import grade_exam
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('submissions'), list):
+        return jsonify({'error': 'Expected JSON with a submissions list'}), 400
+    try:
+        questions = level_exam(level_id, data)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size and seed must be integers'}), 400
+    if questions is None:
+        return jsonify({'error': 'Level not found'}), 404
+    try:
+        return jsonify(grade_exam(questions, data['submissions']))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/bod/profiles')
+def admin_profiles():
+    """List stored request profiles"""
+    if not is_admin():
+        return redirect(url_for('admin_login'))
+    
+    return render_template('admin/profiles.html',
+                         profiles=list_profiles(app),
+                         profile_param=PROFILE_PARAM,
+                         profile_token=make_profile_token(app))
+
+@app.route('/bod/profiles/<profile_id>')
+def admin_profile(profile_id):
+    """Show hot stacks and top allocation sites of a stored profile"""
+    if not is_admin():
+        return redirect(url_for('admin_login'))
+    
+    profile = load_profile(app, profile_id)
+    if not profile:
+        return "Profile not found", 404
+    
+    # Self time: samples where the function was the innermost frame
+    self_samples = Counter()
+    for stack, count in profile['stacks'].items():
+        self_samples[stack.rsplit(';', 1)[-1]] += count
+    
+    return render_template('admin/profile.html',
+                         profile=profile,
+                         hot_functions=self_samples.most_common(30),
+                         hot_stacks=list(profile['stacks'].items())[:30])
+
+@app.route('/bod/profiles/<profile_id>/folded')
+def admin_profile_folded(profile_id):
+    """Download stacks in folded format for flame graph tools"""
+    if not is_admin():
+        return redirect(url_for('admin_login'))
+    
+    profile = load_profile(app, profile_id)
+    if not profile:
+        return "Profile not found", 404
+    
+    return app.response_class(folded_stacks(profile), mimetype='text/plain',
+                              headers={'Content-Disposition': f'attachment; filename={profile_id}.folded'})
 
 @app.route('/bod/upload_image', methods=['POST'])
 def upload_image():
@@ -376,6 +679,9 @@ def upload_image():
         # If it's an image (not SVG), process it
         if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')):
             try:
+                # Pillow is only needed here, so keep it out of worker start-up
+                from PIL import Image
+
                 image = Image.open(io.BytesIO(file_content))
                 # Convert to RGB if necessary
                 if image.mode in ('RGBA', 'LA', 'P'):
@@ -391,10 +697,10 @@ def upload_image():
                 file_content = output.getvalue()
                 unique_filename = unique_filename.rsplit('.', 1)[0] + '.jpg'
             except Exception as e:
-                logger.error(f"Error processing image: {e}")
+                logger.error("Error processing image: %s", e)
         
         # Upload to Supabase Storage
-        public_url = supabase_client.upload_image(unique_filename, file_content)
+        public_url = get_supabase_client().upload_image(unique_filename, file_content)
         
         if public_url:
             return jsonify({'url': public_url})
@@ -402,21 +708,21 @@ def upload_image():
             return jsonify({'error': 'Failed to upload image'}), 500
             
     except Exception as e:
-        logger.error(f"Error uploading image: {e}")
+        logger.error("Error uploading image: %s", e)
         return jsonify({'error': 'Upload failed'}), 500
 
 # Initialize sample data on first request
 def initialize_sample_data():
     """Initialize database with sample data if it's empty"""
     try:
-        levels = supabase_client.get_all_levels()
+        levels = get_supabase_client().get_all_levels()
         if not levels:
             logger.info("Creating sample data...")
-            level = supabase_client.create_level("Основы DOM", 1)
+            level = get_supabase_client().create_level("Основы DOM", 1)
             if level:
-                section = supabase_client.create_section(level['id'], "Введение в DOM", 1)
+                section = get_supabase_client().create_section(level.id, "Введение в DOM", 1)
                 if section:
                     content = create_sample_lesson_content()
-                    supabase_client.create_lesson(section['id'], "Что такое DOM", 1, content)
+                    get_supabase_client().create_lesson(section.id, "Что такое DOM", 1, content)
     except Exception as e:
-        logger.error(f"Error creating sample data: {e}")
+        logger.error("Error creating sample data: %s", e)
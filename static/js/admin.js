@@ -19,6 +19,9 @@ function initializeAdmin() {
     // Initialize keyboard shortcuts
     initKeyboardShortcuts();
     
+    // Submit dashboard forms in the background and patch the page
+    initAjaxForms();
+    
     console.log('Admin panel initialized');
 }
 
@@ -234,6 +237,160 @@ function validateField(field) {
     return isValid;
 }
 
+/**
+ * Submit forms marked data-ajax with fetch and apply the JSON answer in place,
+ * instead of reloading the whole dashboard after every change
+ */
+function initAjaxForms() {
+    document.addEventListener('submit', function(e) {
+        const form = e.target;
+        // Forms that failed validation are already prevented
+        if (!form.matches('form[data-ajax]') || e.defaultPrevented) return;
+        e.preventDefault();
+        submitAjaxForm(form);
+    });
+}
+
+/**
+ * Post a form asking for JSON and apply the change it describes
+ */
+function submitAjaxForm(form) {
+    fetch(form.action, {
+        method: 'POST',
+        body: new FormData(form),
+        headers: { 'Accept': 'application/json' }
+    })
+        .then(response => {
+            // Expired sessions are redirected to the login page
+            if (!(response.headers.get('Content-Type') || '').includes('application/json')) {
+                window.location = response.url;
+                return null;
+            }
+            return response.json().then(data => {
+                if (!response.ok) throw new Error(data.error || response.statusText);
+                return data;
+            });
+        })
+        .then(data => {
+            if (!data) return;
+            applyChange(data);
+            form.reset();
+            closeAllModals();
+        })
+        .catch(error => {
+            alert('Ошибка: ' + error.message);
+        });
+}
+
+/**
+ * Patch the dashboard with a created, updated or deleted node
+ */
+function applyChange(change) {
+    if (change.action === 'created') {
+        const parent = document.getElementById(change.parent);
+        const children = parent && parent.querySelector('[data-children]');
+        // A level that was never expanded gets the new node when it is loaded
+        if (children && !children.hasAttribute('data-src')) {
+            children.insertAdjacentHTML('beforeend', change.html);
+            updateEmptyMarker(children);
+            refreshIcons();
+        }
+    } else {
+        const node = document.getElementById(change.id);
+        if (node && change.action === 'updated') {
+            node.querySelector('[data-title]').textContent = change.title;
+        } else if (node) {
+            const children = node.parentElement.closest('[data-children]');
+            node.remove();
+            if (children) updateEmptyMarker(children);
+        }
+    }
+    applyStats(change.stats || {});
+}
+
+/**
+ * Show the "empty" placeholder of a list only when it has no nodes
+ */
+function updateEmptyMarker(children) {
+    const empty = children.querySelector(':scope > [data-empty]');
+    if (empty) {
+        empty.classList.toggle('hidden', children.querySelector(':scope > [id]') !== null);
+    }
+}
+
+/**
+ * Update counters rendered with data-stats="<scope>" data-stat="<name>"
+ */
+function applyStats(stats) {
+    Object.entries(stats).forEach(([scope, values]) => {
+        Object.entries(values).forEach(([name, value]) => {
+            document.querySelectorAll(`[data-stats="${scope}"][data-stat="${name}"]`).forEach(el => {
+                el.textContent = name === 'content_bytes' ? formatBytes(value) : value;
+            });
+        });
+    });
+}
+
+/**
+ * Same output as Jinja's filesizeformat filter
+ */
+function formatBytes(bytes) {
+    if (bytes === 1) return '1 Byte';
+    if (bytes < 1000) return bytes + ' Bytes';
+    const units = ['kB', 'MB', 'GB', 'TB'];
+    let value = bytes / 1000;
+    let unit = 0;
+    while (value >= 1000 && unit < units.length - 1) {
+        value /= 1000;
+        unit++;
+    }
+    return value.toFixed(1) + ' ' + units[unit];
+}
+
+/**
+ * Expand or collapse a level, loading its sections on first expand
+ */
+function toggleLevel(levelId) {
+    const body = document.querySelector(`#level-${levelId} [data-level-body]`);
+    if (!body) return;
+    body.classList.toggle('hidden');
+    if (!body.classList.contains('hidden')) {
+        loadChildren(body.querySelector('[data-children][data-src]'));
+    }
+}
+
+/**
+ * Replace a placeholder with the HTML fragment at its data-src
+ */
+function loadChildren(container) {
+    if (!container) return;
+    const src = container.dataset.src;
+    container.removeAttribute('data-src');
+    fetch(src, { headers: { 'Accept': 'text/html' } })
+        .then(response => {
+            if (!response.ok) throw new Error(response.statusText);
+            return response.text();
+        })
+        .then(html => {
+            container.innerHTML = html;
+            refreshIcons();
+        })
+        .catch(() => {
+            // Try again on the next expand
+            container.setAttribute('data-src', src);
+            container.innerHTML = '<p class="text-red-600 text-center py-4">Не удалось загрузить разделы</p>';
+        });
+}
+
+/**
+ * Render Feather icons in inserted HTML
+ */
+function refreshIcons() {
+    if (typeof feather !== 'undefined') {
+        feather.replace();
+    }
+}
+
 /**
  * Initialize keyboard shortcuts
  */
@@ -242,7 +399,7 @@ function initKeyboardShortcuts() {
         // Ctrl+S to save (prevent browser save dialog)
         if (e.ctrlKey && e.key === 's') {
             e.preventDefault();
-            const form = document.querySelector('form');
+            const form = document.querySelector('form[data-save-shortcut]');
             if (form) {
                 form.submit();
             }
@@ -295,7 +452,8 @@ window.AdminPanel = {
     closeImageUpload,
     uploadImage,
     validateField,
-    closeAllModals
+    closeAllModals,
+    toggleLevel
 };
 
 // Add CSS classes for form validation
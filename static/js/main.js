@@ -20,6 +20,9 @@ function initializeApp() {
     // Initialize tooltips and other UI enhancements
     initUIEnhancements();
     
+    // Show completed lessons and level progress
+    initProgress();
+    
     console.log('DOM Course app initialized');
 }
 
@@ -221,6 +224,60 @@ function trackProgress(action, data) {
     console.log('Progress:', action, data);
 }
 
+// Set once this browser has completed a lesson, so other visitors never
+// request their (empty) progress
+const LEARNER_FLAG = 'dom_course_learner';
+
+/**
+ * Fetch the learner's progress and mark it on the page
+ */
+function initProgress() {
+    if (!localStorage.getItem(LEARNER_FLAG)) return;
+    if (!document.querySelector('[data-level-progress], [data-lesson-id]')) return;
+    
+    fetch('/api/progress', { credentials: 'same-origin' })
+        .then(response => response.ok ? response.json() : null)
+        .then(progress => progress && applyProgress(progress))
+        .catch(error => console.error('Progress unavailable:', error));
+}
+
+/**
+ * Record a completed lesson for this browser
+ * @param {Number} lessonId - ID of the completed lesson
+ */
+function completeLesson(lessonId) {
+    return fetch(`/api/progress/${lessonId}`, { method: 'POST', credentials: 'same-origin' })
+        .then(response => {
+            if (response.ok) {
+                localStorage.setItem(LEARNER_FLAG, '1');
+                trackProgress('lesson_completed', { lessonId });
+            }
+        })
+        .catch(error => console.error('Saving progress failed:', error));
+}
+
+/**
+ * Show ticks on completed lessons, the share of each level done and the
+ * next unfinished lesson
+ * @param {Object} progress - Response of /api/progress
+ */
+function applyProgress(progress) {
+    progress.completed.forEach(lessonId => {
+        const tick = document.querySelector(`[data-lesson-id="${lessonId}"] [data-lesson-done]`);
+        if (tick) tick.classList.remove('hidden');
+    });
+    
+    Object.entries(progress.levels).forEach(([levelId, level]) => {
+        const label = document.querySelector(`[data-level-progress="${levelId}"]`);
+        if (!label || !level.total || !level.done) return;
+        label.textContent = `Пройдено ${level.done} из ${level.total} уроков (${level.percent}%)`;
+        label.classList.remove('hidden');
+        
+        const next = level.next_lesson_id && document.querySelector(`[data-lesson-id="${level.next_lesson_id}"]`);
+        if (next) next.classList.add('ring-2', 'ring-course-blue');
+    });
+}
+
 /**
  * Error handling
  */
@@ -242,5 +299,6 @@ window.DOMCourse = {
     copyToClipboard,
     debounce,
     isInViewport,
-    trackProgress
+    trackProgress,
+    completeLesson
 };
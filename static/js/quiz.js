@@ -90,6 +90,10 @@ function handleQuizAnswer(questionIndex, selectedOption, questionElement) {
     
     // Track progress (could be enhanced for analytics)
     console.log(`Question ${questionIndex + 1}: ${isCorrect ? 'Correct' : 'Incorrect'}`);
+    
+    if (getQuizStats().completed) {
+        document.dispatchEvent(new CustomEvent('quiz:completed'));
+    }
 }
 
 /**
@@ -0,0 +1,84 @@
+"""
+Streaming template responses with explicit flush points.
+
+Templates mark where the page may be sent early with FLUSH_MARKER. Output
+up to each marker is buffered and sent as one chunk, so the browser gets
+the head, CSS and page header while the rest of the template is still
+rendering, without paying for one tiny write per template expression.
+
+The first chunk is rendered before the response is returned, so the render
+time in the Server-Timing header covers it; the rest renders after the
+after_request hooks, and request_metrics logs the full render time when the
+stream ends.
+"""
+from flask import current_app, stream_template
+from compression import minify_html
+
+FLUSH_MARKER = '<!-- flush -->'
+
+
+def _split_at_markers(chunks):
+    buffer = []
+    for chunk in chunks:
+        if FLUSH_MARKER not in chunk:
+            buffer.append(chunk)
+            continue
+        # The marker is template text, so it never spans two chunks
+        *parts, rest = chunk.split(FLUSH_MARKER)
+        for part in parts:
+            buffer.append(part)
+            yield ''.join(buffer)
+            buffer = []
+        buffer.append(rest)
+    html = ''.join(buffer)
+    if html:
+        yield html
+
+
+def _minified(chunks):
+    """Minify chunk by chunk to the same bytes as minify_html of the whole page.
+
+    A chunk's trailing space is held back until the next chunk, so a
+    whitespace run across a flush point still becomes a single space and
+    the page is stripped at both ends.
+    """
+    held_space = False
+    started = False
+    for chunk in chunks:
+        html = minify_html(chunk, strip=False)
+        if html.startswith(' '):
+            held_space, html = started, html[1:]
+        if not html:
+            continue
+        if held_space:
+            html = ' ' + html
+        held_space = html.endswith(' ')
+        started = True
+        yield html[:-1] if held_space else html
+
+
+def _prepend(first, chunks):
+    # A generator rather than itertools.chain, so closing the response
+    # closes the template stream
+    if first is not None:
+        yield first
+    yield from chunks
+
+
+def _flushed_chunks(chunks, minify: bool):
+    chunks = _split_at_markers(chunks)
+    return _minified(chunks) if minify else chunks
+
+
+def stream_flushed_template(template_name: str, **context):
+    """Render a template as a streamed text/html response, one chunk per flush marker."""
+    minify = current_app.config.get('MINIFY_HTML', False)
+    chunks = _flushed_chunks(stream_template(template_name, **context), minify)
+    first = next(chunks, None)
+    response = current_app.response_class(
+        _prepend(first, chunks),
+        mimetype='text/html',
+    )
+    # Ask nginx-style proxies not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
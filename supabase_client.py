@@ -1,18 +1,119 @@
 import os
 import logging
-from supabase import create_client, Client
-from typing import List, Dict, Any, Optional, Union
+import time
+import functools
+import threading
+from dataclasses import replace
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union, TYPE_CHECKING
 from datetime import datetime
+from cache import TTLCache, SingleFlight
+from changes_feed import SOURCES as CHANGE_SOURCES, TIME_COLUMNS as CHANGE_TIME_COLUMNS, parse_time
+from db_routing import primary_reads_pinned
+from course_snapshot import SnapshotStore, DEFAULT_SNAPSHOT_PATH
+from progress import ProgressStore
+from models import CourseStats, Level, Section, Lesson, as_models, to_models
+from request_metrics import db_call, record_cache_hit, record_collapsed_read, record_snapshot_read
+
+if TYPE_CHECKING:
+    import httpx
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
+# Seconds a read result stays in the per-worker cache (0 disables caching)
+DEFAULT_CACHE_TTL = 300
+# After a failed read, serve from the snapshot for this many seconds before
+# trying Supabase again, so an outage does not cost a timeout per read
+UPSTREAM_RETRY_INTERVAL = 10
+# Seconds reads stay on the primary after a change, for the replica to catch up
+DEFAULT_REPLICA_LAG = 10
+# PostgREST caps a response at 1000 rows by default
+PAGE_SIZE = 1000
+
+# Explicit column sets. Lists of lessons carry quiz_count and tasks_count
+# (computed columns defined in database_migration.sql) instead of the content
+# JSONB, which only get_lesson_by_id fetches.
+LEVEL_COLUMNS = 'id,title,order_index,created_at,updated_at'
+SECTION_COLUMNS = 'id,level_id,title,order_index,created_at,updated_at'
+LESSON_SUMMARY_COLUMNS = 'id,section_id,title,order_index,quiz_count,tasks_count,created_at,updated_at'
+LESSON_COLUMNS = 'id,section_id,title,order_index,content,created_at,updated_at'
+TOMBSTONE_TABLE = 'course_tombstones'
+TOMBSTONE_COLUMNS = 'id,table_name,row_id,deleted_at'
+COURSE_STATS_COLUMNS = 'scope,scope_id,level_id,levels,sections,lessons,quiz_questions,tasks,content_bytes'
+LEARNER_PROGRESS_COLUMNS = 'learner_id,lesson_order,completed,revision'
+# Postgres error code of a primary key conflict
+UNIQUE_VIOLATION = '23505'
+TABLE_COLUMNS = {'levels': LEVEL_COLUMNS, 'sections': SECTION_COLUMNS, 'lessons': LESSON_COLUMNS}
+
+
+def cached_read(method):
+    """Serve a read method from the client cache, keyed by method name and arguments.
+
+    Empty results and results of reads that failed or were answered from the
+    snapshot (including nested reads, e.g. by get_course_tree) are not
+    cached, so they are retried on the next call.
+
+    On a miss, concurrent calls with the same key share one upstream read,
+    so an expired entry under load costs a single query. With a read
+    replica, a request pinned to the primary (db_routing.py) still uses
+    cached entries, since invalidate() dropped those its write changed; its
+    misses are read from the primary on their own, not shared with a read
+    that may go to the replica, and fill the cache.
+    """
+    def read(self, key, args):
+        # The previous leader may have filled the entry since our miss
+        hit, value = self.cache.get(key)
+        if hit:
+            return value
+        degraded_before = getattr(self._reads, 'degraded', 0)
+        value = method(self, *args)
+        if value and getattr(self._reads, 'degraded', 0) == degraded_before:
+            self.cache.set(key, value)
+        return value
+
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        key = (method.__name__,) + args
+        hit, value = self.cache.get(key)
+        if hit:
+            record_cache_hit()
+            return value
+        if self.replica is not None and primary_reads_pinned():
+            return read(self, key, args)
+        value, shared = self._inflight.do(key, lambda: read(self, key, args))
+        if shared:
+            record_collapsed_read()
+        return value
+    return wrapper
+
+
 class SupabaseClient:
-    def __init__(self):
-        """Initialize Supabase client with environment variables."""
+    def __init__(self, http_client: Optional["httpx.Client"] = None):
+        """Initialize Supabase client with environment variables.
+
+        Args:
+            http_client: HTTP client shared by all threads; defaults to the
+                pooled, retrying client from http_transport
+        """
         self.url = os.environ.get("SUPABASE_URL")
         self.key = os.environ.get("SUPABASE_ANON_KEY")
         self.service_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-        self.client: Optional[Client] = None
+        self.http_client = http_client
+        self.client: Optional["Client"] = None
+        self.cache = TTLCache(float(os.environ.get("COURSE_CACHE_TTL", DEFAULT_CACHE_TTL)))
+        # Identical cache misses in flight at the same time share one read
+        self._inflight = SingleFlight()
+        # An empty COURSE_SNAPSHOT_PATH disables the snapshot
+        self.snapshot = SnapshotStore(os.environ.get("COURSE_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH) or None)
+        self._upstream_down_until = 0.0
+        self._reads = threading.local()
+        # Optional read replica near this region; writes always go to url
+        self.read_url = os.environ.get("SUPABASE_READ_URL")
+        self.replica: Optional["Client"] = None
+        self.replica_lag = float(os.environ.get("SUPABASE_REPLICA_LAG", DEFAULT_REPLICA_LAG))
+        self._primary_until = 0.0
+        # Completion bitmaps of learners (progress.py)
+        self.progress = ProgressStore(self)
         self._ensure_connection()
 
     def _ensure_connection(self):
@@ -22,41 +123,322 @@ class SupabaseClient:
             return
             
         try:
+            # supabase and the HTTP stack are heavy to import, so load them
+            # when the first client is built rather than with the app
+            from supabase import create_client, ClientOptions
+            from http_transport import build_http_client
+
+            if self.http_client is None:
+                self.http_client = build_http_client()
             # Use service key for full access if available
-            self.client = create_client(self.url, self.service_key or self.key)
+            self.client = create_client(
+                self.url,
+                self.service_key or self.key,
+                options=ClientOptions(httpx_client=self.http_client)
+            )
+            if self.read_url:
+                self.replica = create_client(
+                    self.read_url,
+                    self.service_key or self.key,
+                    options=ClientOptions(httpx_client=self.http_client)
+                )
             logger.info("Supabase client initialized successfully")
+            if self.replica is not None:
+                logger.info("Reading the course from replica %s", self.read_url)
         except Exception as e:
-            logger.error(f"Failed to initialize Supabase client: {e}")
+            logger.error("Failed to initialize Supabase client: %s", e)
             self.client = None
 
+    @db_call
     def is_connected(self) -> bool:
         """Check if the client is connected to Supabase."""
         if not self.client:
             return False
         try:
             # Simple query to check connection
-            self.client.table('levels').select('*').limit(1).execute()
+            self.client.table('levels').select('id').limit(1).execute()
             return True
         except Exception as e:
-            logger.error(f"Connection check failed: {e}")
+            logger.error("Connection check failed: %s", e)
             return False
 
+    def _reader(self):
+        """Client for course reads: the replica, unless recent writes need the primary."""
+        if self.replica is None or primary_reads_pinned() or time.monotonic() < self._primary_until:
+            return self.client
+        return self.replica
+
+    def _upstream_available(self) -> bool:
+        return self.client is not None and time.monotonic() >= self._upstream_down_until
+
+    def _read_failed(self, error: Exception):
+        """Serve reads from the snapshot for a while after Supabase failed."""
+        self._upstream_down_until = time.monotonic() + UPSTREAM_RETRY_INTERVAL
+        logger.warning("Supabase read failed, serving from snapshot for %ss: %s", UPSTREAM_RETRY_INTERVAL, error)
+
+    def _from_snapshot(self, method_name: str, *args, default=None):
+        """Answer a read from the on-disk snapshot (read-only mode)."""
+        self._reads.degraded = getattr(self._reads, 'degraded', 0) + 1
+        snapshot = self.snapshot.get()
+        if snapshot is None:
+            return default
+        record_snapshot_read()
+        return getattr(snapshot, method_name)(*args)
+
+    def load_snapshot(self) -> int:
+        """Fill the read cache from the snapshot on disk, unless the course changed since it was written.
+
+        Returns:
+            Number of levels loaded (0 if there is no current snapshot)
+        """
+        snapshot = self.snapshot.get()
+        if snapshot is None or not self._snapshot_is_current(snapshot):
+            return 0
+        levels = to_models(snapshot.get_all_levels(), Level)
+        self.cache.set(('get_all_levels',), levels)
+        for level in levels:
+            sections = to_models(snapshot.get_sections_by_level(level.id), Section)
+            self.cache.set(('get_sections_by_level', level.id), sections)
+            for section in sections:
+                self.cache.set(('get_lessons_by_section', section.id),
+                               to_models(snapshot.get_lessons_by_section(section.id), Lesson,
+                                         self.get_lesson_content))
+        return len(levels)
+
+    def _snapshot_is_current(self, snapshot) -> bool:
+        """Whether no change in the changes feed is newer than the snapshot's high-water mark.
+
+        While Supabase cannot be reached the snapshot is all there is, so it
+        counts as current.
+        """
+        try:
+            latest = self.get_latest_change_time()
+        except Exception as e:
+            logger.warning("Cannot check the course snapshot against Supabase, using it: %s", e)
+            return True
+        if latest is None:
+            return True
+        if snapshot.high_water is None or parse_time(latest) > parse_time(snapshot.high_water):
+            logger.info("Course snapshot generation %s is older than the last change at %s",
+                        snapshot.generation, latest)
+            return False
+        return True
+
+    @db_call
+    def get_latest_change_time(self) -> Optional[str]:
+        """Time of the newest change in the changes feed (None if there is none); raises on failure."""
+        if not self.client:
+            raise RuntimeError("Supabase client is not initialized")
+        latest = None
+        for source in CHANGE_SOURCES:
+            column = CHANGE_TIME_COLUMNS[source]
+            response = self.client.table(TOMBSTONE_TABLE if source == 'tombstones' else source)\
+                .select(column)\
+                .order(column, desc=True)\
+                .limit(1)\
+                .execute()
+            if response.data and (latest is None or parse_time(response.data[0][column]) > parse_time(latest)):
+                latest = response.data[0][column]
+        return latest
+
+    @db_call
+    def _select_page(self, table: str, offset: int) -> List[Dict[str, Any]]:
+        response = self.client.table(table)\
+            .select(TABLE_COLUMNS[table])\
+            .order('id')\
+            .range(offset, offset + PAGE_SIZE - 1)\
+            .execute()
+        return response.data
+
+    def _select_all(self, table: str) -> List[Dict[str, Any]]:
+        return list(self.iter_table(table))
+
+    def iter_table(self, table: str) -> Iterator[Dict[str, Any]]:
+        """Yield every row of a table in id order, one page in memory at a time.
+
+        Raises on failure, like fetch_course_rows.
+        """
+        if not self.client:
+            raise RuntimeError("Supabase client is not initialized")
+        offset = 0
+        while True:
+            page = self._select_page(table, offset)
+            yield from page
+            if len(page) < PAGE_SIZE:
+                return
+            offset += len(page)
+
+    @db_call
+    def upsert_rows(self, table: str, rows: List[Dict[str, Any]]) -> int:
+        """Insert or replace rows by id in one request; raises on failure.
+
+        The cache is not touched: callers doing bulk writes clear it once
+        they are done.
+        """
+        if not self.client:
+            raise RuntimeError("Supabase client is not initialized")
+        self.client.table(table).upsert(rows).execute()
+        return len(rows)
+
+    @db_call
+    def get_changed_rows(self, source: str, since_time: Optional[str], since_id: Optional[int],
+                         until: str, limit: int) -> List[Dict[str, Any]]:
+        """Rows of a changes feed source after a position, oldest first; raises on failure.
+
+        Args:
+            source: 'levels', 'sections', 'lessons' or 'tombstones'
+            since_time: Return rows changed after this time (None: from the start)
+            since_id: Also return rows changed exactly at since_time with a
+                larger id (None: only later times)
+            until: Return only rows changed before this time
+        """
+        if not self.client:
+            raise RuntimeError("Supabase client is not initialized")
+        column = CHANGE_TIME_COLUMNS[source]
+        if source == 'tombstones':
+            query = self.client.table(TOMBSTONE_TABLE).select(TOMBSTONE_COLUMNS)
+        else:
+            query = self.client.table(source).select(TABLE_COLUMNS[source])
+        query = query.lt(column, until)
+        if since_time is not None and since_id is not None:
+            query = query.or_(f'{column}.gt."{since_time}",and({column}.eq."{since_time}",id.gt.{since_id})')
+        elif since_time is not None:
+            query = query.gt(column, since_time)
+        response = query.order(column).order('id').limit(limit).execute()
+        return response.data
+
+    @db_call
+    def sync_id_sequences(self):
+        """Move the id sequences past rows inserted with explicit ids."""
+        if not self.client:
+            raise RuntimeError("Supabase client is not initialized")
+        self.client.rpc('sync_course_sequences').execute()
+
+    def fetch_course_rows(self) -> Dict[str, Any]:
+        """Fetch every level, section and lesson, bypassing the cache.
+
+        The time of the newest change is read first and returned as
+        'high_water': the rows include every change up to it.
+
+        Unlike the other methods this raises on failure, so a snapshot is
+        never written from a partial course.
+        """
+        if not self.client:
+            raise RuntimeError("Supabase client is not initialized")
+        rows: Dict[str, Any] = {'high_water': self.get_latest_change_time()}
+        rows.update((table, self._select_all(table)) for table in ('levels', 'sections', 'lessons'))
+        return rows
+
+    def refresh_snapshot(self):
+        """Rewrite the snapshot in the background from the current database."""
+        self.snapshot.schedule_write(self.fetch_course_rows)
+
+    def invalidate(self, table: str, row: Optional[Dict[str, Any]] = None, deleted: bool = False,
+                   refresh_snapshot: bool = True):
+        """Evict cached reads affected by a change to a row of the given table.
+
+        Args:
+            table: One of 'levels', 'sections' or 'lessons'
+            row: The changed row; parent ids are used to evict exact keys
+            deleted: Whether the row was deleted (children are evicted too)
+            refresh_snapshot: Rewrite the on-disk snapshot; the worker that
+                made the change does this, workers told about it do not
+        """
+        row = row or {}
+        # Until the replica has the change, refill evicted entries from the primary
+        self._primary_until = time.monotonic() + self.replica_lag
+        self.cache.delete(('get_course_tree',))
+        self.cache.delete(('get_course_stats',))
+        if table == 'levels':
+            self.cache.delete(('get_all_levels',))
+            if deleted:
+                self.cache.delete_prefix('get_sections_by_level')
+                self.cache.delete_prefix('get_lessons_by_section')
+                self.cache.delete_prefix('get_lesson_by_id')
+        elif table == 'sections':
+            if 'level_id' in row:
+                self.cache.delete(('get_sections_by_level', row['level_id']))
+            else:
+                self.cache.delete_prefix('get_sections_by_level')
+            if deleted:
+                if 'id' in row:
+                    self.cache.delete(('get_lessons_by_section', row['id']))
+                else:
+                    self.cache.delete_prefix('get_lessons_by_section')
+                self.cache.delete_prefix('get_lesson_by_id')
+        elif table == 'lessons':
+            if 'section_id' in row:
+                self.cache.delete(('get_lessons_by_section', row['section_id']))
+            else:
+                self.cache.delete_prefix('get_lessons_by_section')
+            if 'id' in row:
+                self.cache.delete(('get_lesson_by_id', row['id']))
+            else:
+                self.cache.delete_prefix('get_lesson_by_id')
+        if refresh_snapshot:
+            self.refresh_snapshot()
+
+    @cached_read
+    def get_course_tree(self) -> Tuple[Level, ...]:
+        """Get all levels with their sections and each section's lessons.
+
+        The tree is cached as a whole; its lesson tuples are the same
+        objects as the cached per-section lists.
+        """
+        return tuple(
+            replace(level, sections=tuple(
+                replace(section, lessons=self.get_lessons_by_section(section.id))
+                for section in self.get_sections_by_level(level.id)
+            ))
+            for level in self.get_all_levels()
+        )
+
+    def get_lesson_content(self, lesson_id: int) -> Optional[Dict[str, Any]]:
+        """Content of a lesson, served from the get_lesson_by_id cache."""
+        lesson = self.get_lesson_by_id(lesson_id)
+        return lesson.content if lesson else None
+
+    @cached_read
+    @db_call
+    def get_course_stats(self) -> Optional[CourseStats]:
+        """Counters of the course, each level and each section in one query.
+
+        The course_stats table is kept up to date by triggers (see
+        database_migration.sql), so this never walks the lessons. Returns None
+        if Supabase is unavailable; the snapshot has no statistics.
+        """
+        if not self._upstream_available():
+            return None
+        try:
+            response = self._reader().table('course_stats').select(COURSE_STATS_COLUMNS).execute()
+            return CourseStats.from_rows(response.data)
+        except Exception as e:
+            logger.error("Error fetching course stats: %s", e)
+            self._read_failed(e)
+            return None
+
     # ===== LEVELS =====
-    def get_all_levels(self) -> List[Dict[str, Any]]:
+    @cached_read
+    @as_models(Level)
+    @db_call
+    def get_all_levels(self) -> Tuple[Level, ...]:
         """Get all levels ordered by order_index."""
-        if not self.client:
-            return []
+        if not self._upstream_available():
+            return self._from_snapshot('get_all_levels', default=[])
         try:
-            response = self.client.table('levels')\
-                .select('*')\
+            response = self._reader().table('levels')\
+                .select(LEVEL_COLUMNS)\
                 .order('order_index')\
                 .execute()
             return response.data
         except Exception as e:
-            logger.error(f"Error fetching levels: {e}")
-            return []
+            logger.error("Error fetching levels: %s", e)
+            self._read_failed(e)
+            return self._from_snapshot('get_all_levels', default=[])
 
-    def create_level(self, title: str, order_index: int) -> Optional[Dict[str, Any]]:
+    @as_models(Level)
+    @db_call
+    def create_level(self, title: str, order_index: int) -> Optional[Level]:
         """Create a new level."""
         if not self.client:
             return None
@@ -67,12 +449,15 @@ class SupabaseClient:
                     'order_index': order_index
                 })\
                 .execute()
+            self.invalidate('levels')
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error creating level: {e}")
+            logger.error("Error creating level: %s", e)
             return None
 
-    def update_level(self, level_id: int, title: str) -> Optional[Dict[str, Any]]:
+    @as_models(Level)
+    @db_call
+    def update_level(self, level_id: int, title: str) -> Optional[Level]:
         """Update an existing level."""
         if not self.client:
             return None
@@ -84,11 +469,13 @@ class SupabaseClient:
                 })\
                 .eq('id', level_id)\
                 .execute()
+            self.invalidate('levels')
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error updating level: {e}")
+            logger.error("Error updating level: %s", e)
             return None
 
+    @db_call
     def delete_level(self, level_id: int) -> bool:
         """Delete a level by ID."""
         if not self.client:
@@ -98,28 +485,35 @@ class SupabaseClient:
                 .delete()\
                 .eq('id', level_id)\
                 .execute()
+            self.invalidate('levels', deleted=True)
             return True
         except Exception as e:
-            logger.error(f"Error deleting level: {e}")
+            logger.error("Error deleting level: %s", e)
             return False
 
     # ===== SECTIONS =====
-    def get_sections_by_level(self, level_id: int) -> List[Dict[str, Any]]:
+    @cached_read
+    @as_models(Section)
+    @db_call
+    def get_sections_by_level(self, level_id: int) -> Tuple[Section, ...]:
         """Get all sections for a specific level."""
-        if not self.client:
-            return []
+        if not self._upstream_available():
+            return self._from_snapshot('get_sections_by_level', level_id, default=[])
         try:
-            response = self.client.table('sections')\
-                .select('*')\
+            response = self._reader().table('sections')\
+                .select(SECTION_COLUMNS)\
                 .eq('level_id', level_id)\
                 .order('order_index')\
                 .execute()
             return response.data
         except Exception as e:
-            logger.error(f"Error fetching sections: {e}")
-            return []
+            logger.error("Error fetching sections: %s", e)
+            self._read_failed(e)
+            return self._from_snapshot('get_sections_by_level', level_id, default=[])
 
-    def create_section(self, level_id: int, title: str, order_index: int) -> Optional[Dict[str, Any]]:
+    @as_models(Section)
+    @db_call
+    def create_section(self, level_id: int, title: str, order_index: int) -> Optional[Section]:
         """Create a new section in a level."""
         if not self.client:
             return None
@@ -131,12 +525,15 @@ class SupabaseClient:
                     'order_index': order_index
                 })\
                 .execute()
+            self.invalidate('sections', {'level_id': level_id})
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error creating section: {e}")
+            logger.error("Error creating section: %s", e)
             return None
             
-    def update_section(self, section_id: int, title: str) -> Optional[Dict[str, Any]]:
+    @as_models(Section)
+    @db_call
+    def update_section(self, section_id: int, title: str) -> Optional[Section]:
         """Update an existing section."""
         if not self.client:
             return None
@@ -148,11 +545,13 @@ class SupabaseClient:
                 })\
                 .eq('id', section_id)\
                 .execute()
+            self.invalidate('sections', response.data[0] if response.data else None)
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error updating section: {e}")
+            logger.error("Error updating section: %s", e)
             return None
             
+    @db_call
     def delete_section(self, section_id: int) -> bool:
         """Delete a section by ID.
         
@@ -170,32 +569,39 @@ class SupabaseClient:
                 .delete()\
                 .eq('id', section_id)\
                 .execute()
+            self.invalidate('sections', response.data[0] if response.data else {'id': section_id}, deleted=True)
                 
             # Return True if any rows were affected
             return bool(response.data and len(response.data) > 0)
             
         except Exception as e:
-            logger.error(f"Error deleting section {section_id}: {e}")
+            logger.error("Error deleting section %s: %s", section_id, e)
             return False
 
     # ===== LESSONS =====
-    def get_lessons_by_section(self, section_id: int) -> List[Dict[str, Any]]:
-        """Get all lessons for a specific section."""
-        if not self.client:
-            return []
+    @cached_read
+    @as_models(Lesson)
+    @db_call
+    def get_lessons_by_section(self, section_id: int) -> Tuple[Lesson, ...]:
+        """Get summary rows (no content) of all lessons in a section."""
+        if not self._upstream_available():
+            return self._from_snapshot('get_lessons_by_section', section_id, default=[])
         try:
-            response = self.client.table('lessons')\
-                .select('*')\
+            response = self._reader().table('lessons')\
+                .select(LESSON_SUMMARY_COLUMNS)\
                 .eq('section_id', section_id)\
                 .order('order_index')\
                 .execute()
             return response.data
         except Exception as e:
-            logger.error(f"Error fetching lessons: {e}")
-            return []
+            logger.error("Error fetching lessons: %s", e)
+            self._read_failed(e)
+            return self._from_snapshot('get_lessons_by_section', section_id, default=[])
 
+    @as_models(Lesson)
+    @db_call
     def create_lesson(self, section_id: int, title: str, order_index: int, 
-                     content: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+                     content: Optional[Dict] = None) -> Optional[Lesson]:
         """Create a new lesson in a section."""
         if not self.client:
             return None
@@ -211,27 +617,52 @@ class SupabaseClient:
             response = self.client.table('lessons')\
                 .insert(data)\
                 .execute()
+            self.invalidate('lessons', {'section_id': section_id})
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error creating lesson: {e}")
+            logger.error("Error creating lesson: %s", e)
             return None
 
-    def get_lesson_by_id(self, lesson_id: int) -> Optional[Dict[str, Any]]:
-        """Get a specific lesson by ID."""
-        if not self.client:
-            return None
+    @cached_read
+    @as_models(Lesson)
+    @db_call
+    def get_lesson_by_id(self, lesson_id: int) -> Optional[Lesson]:
+        """Get a specific lesson by ID, including its content."""
+        if not self._upstream_available():
+            return self._from_snapshot('get_lesson_by_id', lesson_id)
         try:
-            response = self.client.table('lessons')\
-                .select('*')\
+            response = self._reader().table('lessons')\
+                .select(LESSON_COLUMNS)\
                 .eq('id', lesson_id)\
                 .single()\
                 .execute()
             return response.data if response.data else None
         except Exception as e:
-            logger.error(f"Error fetching lesson {lesson_id}: {e}")
-            return None
+            logger.error("Error fetching lesson %s: %s", lesson_id, e)
+            self._read_failed(e)
+            return self._from_snapshot('get_lesson_by_id', lesson_id)
+
+    @db_call
+    def get_lesson_quizzes(self, lesson_ids: Tuple[int, ...]) -> Dict[int, Optional[List[Dict[str, Any]]]]:
+        """Quizzes of several lessons by lesson id, in one query for only the quiz of the content."""
+        if not lesson_ids:
+            return {}
+        if not self._upstream_available():
+            return self._from_snapshot('get_lesson_quizzes', lesson_ids, default={})
+        try:
+            response = self._reader().table('lessons')\
+                .select('id,quiz:content->quiz')\
+                .in_('id', list(lesson_ids))\
+                .execute()
+            return {row['id']: row.get('quiz') for row in response.data}
+        except Exception as e:
+            logger.error("Error fetching lesson quizzes: %s", e)
+            self._read_failed(e)
+            return self._from_snapshot('get_lesson_quizzes', lesson_ids, default={})
             
-    def update_lesson(self, lesson_id: int, title: str, content: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    @as_models(Lesson)
+    @db_call
+    def update_lesson(self, lesson_id: int, title: str, content: Dict[str, Any]) -> Optional[Lesson]:
         """Update an existing lesson.
         
         Args:
@@ -256,13 +687,15 @@ class SupabaseClient:
                 .update(update_data)\
                 .eq('id', lesson_id)\
                 .execute()
+            self.invalidate('lessons', response.data[0] if response.data else {'id': lesson_id})
                 
             return response.data[0] if response.data else None
             
         except Exception as e:
-            logger.error(f"Error updating lesson {lesson_id}: {e}")
+            logger.error("Error updating lesson %s: %s", lesson_id, e)
             return None
             
+    @db_call
     def delete_lesson(self, lesson_id: int) -> bool:
         """Delete a lesson by ID.
         
@@ -280,15 +713,82 @@ class SupabaseClient:
                 .delete()\
                 .eq('id', lesson_id)\
                 .execute()
+            self.invalidate('lessons', response.data[0] if response.data else {'id': lesson_id})
                 
             # Return True if any rows were affected
             return bool(response.data and len(response.data) > 0)
             
         except Exception as e:
-            logger.error(f"Error deleting lesson {lesson_id}: {e}")
+            logger.error("Error deleting lesson %s: %s", lesson_id, e)
             return False
 
+    # ===== LEARNER PROGRESS =====
+    # Progress is read from the primary and is not served from the snapshot:
+    # saves compare against the latest revision. These methods raise on failure.
+    @cached_read
+    @db_call
+    def get_lesson_order(self, version: str) -> Optional[Tuple[int, ...]]:
+        """Lesson ids of a stored ordering; orderings never change once stored."""
+        if not self.client:
+            raise RuntimeError("Supabase client is not initialized")
+        response = self.client.table('lesson_orders')\
+            .select('lesson_ids')\
+            .eq('version', version)\
+            .execute()
+        return tuple(response.data[0]['lesson_ids']) if response.data else None
+
+    @db_call
+    def save_lesson_order(self, version: str, lesson_ids: Tuple[int, ...]):
+        """Store an ordering of lessons unless it is stored already."""
+        if not self.client:
+            raise RuntimeError("Supabase client is not initialized")
+        self.client.table('lesson_orders')\
+            .upsert({'version': version, 'lesson_ids': list(lesson_ids)}, ignore_duplicates=True)\
+            .execute()
+
+    @db_call
+    def get_learner_progress(self, learner_id: str) -> Optional[Dict[str, Any]]:
+        """The learner_progress row of a learner, None for a new learner."""
+        if not self.client:
+            raise RuntimeError("Supabase client is not initialized")
+        response = self.client.table('learner_progress')\
+            .select(LEARNER_PROGRESS_COLUMNS)\
+            .eq('learner_id', learner_id)\
+            .execute()
+        return response.data[0] if response.data else None
+
+    @db_call
+    def save_learner_progress(self, learner_id: str, lesson_order: str, completed: str, revision: int) -> bool:
+        """Save a learner's bitmap as revision if the stored row is the revision before.
+
+        Args:
+            completed: The bitmap as a bytea literal (progress.encode_bitmap)
+            revision: 1 inserts the learner's first row
+
+        Returns:
+            False if another write saved that revision first
+        """
+        if not self.client:
+            raise RuntimeError("Supabase client is not initialized")
+        row = {'lesson_order': lesson_order, 'completed': completed, 'revision': revision,
+               'updated_at': datetime.utcnow().isoformat()}
+        if revision == 1:
+            try:
+                self.client.table('learner_progress').insert({'learner_id': learner_id, **row}).execute()
+                return True
+            except Exception as e:
+                if getattr(e, 'code', None) == UNIQUE_VIOLATION:
+                    return False
+                raise
+        response = self.client.table('learner_progress')\
+            .update(row)\
+            .eq('learner_id', learner_id)\
+            .eq('revision', revision - 1)\
+            .execute()
+        return bool(response.data)
+
     # ===== FILE UPLOADS =====
+    @db_call
     def upload_file(self, bucket_name: str, file_path: str, file_content: bytes, 
                    content_type: str = 'image/jpeg') -> Optional[str]:
         """Upload a file to Supabase storage."""
@@ -318,8 +818,21 @@ class SupabaseClient:
             return result.public_url if hasattr(result, 'public_url') else None
             
         except Exception as e:
-            logger.error(f"Error uploading file: {e}")
+            logger.error("Error uploading file: %s", e)
             return None
 
-# Global instance
-supabase_client = SupabaseClient()
+_client: Optional[SupabaseClient] = None
+_client_lock = threading.Lock()
+
+
+def get_supabase_client() -> SupabaseClient:
+    """Return the process-wide client, building it on first use.
+
+    Safe to call from any thread; the client is created exactly once.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SupabaseClient()
+    return _client
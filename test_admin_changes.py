@@ -0,0 +1,52 @@
+JSON = {'Accept': 'application/json'}
+
+
+def test_form_posts_still_redirect_to_the_dashboard(admin):
+    response = admin.post('/bod/create_section/1', data={'title': 'Новый раздел'})
+    assert response.status_code == 302 and response.location.endswith('/bod/dashboard')
+    assert admin.post('/bod/create_section/1', data={}).status_code == 302
+
+
+def test_create_returns_the_rendered_node_and_changed_counters(admin):
+    response = admin.post('/bod/create_lesson/2', data={'title': 'Новый урок'}, headers=JSON)
+    data = response.get_json()
+    lesson_id = max(admin.store.tables['lessons'])
+    assert (data['action'], data['id'], data['parent']) == ('created', f'lesson-{lesson_id}', 'section-2')
+    assert f'id="lesson-{lesson_id}"' in data['html'] and 'Новый урок' in data['html']
+    assert set(data['stats']) == {'course', 'level-1', 'section-2'}
+    assert data['stats']['course']['lessons'] == 13
+    assert data['stats']['section-2']['lessons'] == 4
+
+    section = admin.post('/bod/create_section/2', data={'title': 'Раздел'}, headers=JSON).get_json()
+    assert section['parent'] == 'level-2' and 'Нет уроков' in section['html']
+    assert section['stats']['level-2']['sections'] == 3
+
+
+def test_update_and_delete_return_only_the_change(admin):
+    data = admin.post('/bod/update_section/3', data={'title': 'Переименован'}, headers=JSON).get_json()
+    assert data == {'action': 'updated', 'id': 'section-3', 'title': 'Переименован',
+                    'stats': data['stats']}
+    assert 'html' not in data
+
+    data = admin.post('/bod/delete_level/2', headers=JSON).get_json()
+    assert (data['action'], data['id']) == ('deleted', 'level-2')
+    assert data['stats']['course']['levels'] == 1 and 'level-2' not in data['stats']
+
+    response = admin.post('/bod/update_level/1', data={'title': ''}, headers=JSON)
+    assert response.status_code == 400 and response.get_json()['error']
+
+
+def test_dashboard_loads_sections_lazily(admin):
+    response = admin.get('/bod/dashboard')
+    # The queries ran on the worker's event loop and still count for the request
+    assert 'db;dur=' in response.headers['Server-Timing'] and 'desc="2 calls"' in response.headers['Server-Timing']
+    page = response.get_data(as_text=True)
+    assert 'id="level-1"' in page and 'id="section-1"' not in page
+    assert '/bod/level/1/sections' in page
+
+    trips = admin.store.round_trips
+    fragment = admin.get('/bod/level/2/sections').get_data(as_text=True)
+    assert 'id="section-3"' in fragment and 'id="section-4"' in fragment and 'id="section-1"' not in fragment
+    assert 'id="lesson-7"' in fragment
+    # Sections, lessons of both sections (concurrently) and the counters
+    assert admin.store.round_trips - trips == 4
@@ -0,0 +1,62 @@
+import io
+import json
+import logging
+import threading
+from flask import Flask
+from app_logging import JsonFormatter, QueueLogging, init_request_id
+
+
+class Recorder:
+    """Argument whose str() records the thread that formatted the message."""
+
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.current_thread().name)
+        return 'recorded'
+
+
+def make_logging():
+    output = io.StringIO()
+    target = logging.StreamHandler(output)
+    target.setFormatter(JsonFormatter())
+    queued = QueueLogging(target)
+    logger = logging.getLogger('test_app_logging')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.handlers = [queued.handler]
+    queued.start()
+    return queued, logger, output
+
+
+def test_records_are_formatted_on_the_listener_thread():
+    queued, logger, output = make_logging()
+    argument = Recorder()
+    logger.info('value %s', argument, extra={'fields': {'event': 'test'}})
+    logger.debug('suppressed %s', argument)
+    queued.stop()
+
+    line = json.loads(output.getvalue())
+    assert line['message'] == 'value recorded'
+    assert line['event'] == 'test'
+    assert line['request_id'] is None
+    assert argument.threads and threading.current_thread().name not in argument.threads
+
+
+def test_request_id_is_logged_and_echoed():
+    queued, logger, output = make_logging()
+    app = Flask(__name__)
+    init_request_id(app)
+
+    @app.route('/')
+    def index():
+        logger.warning('inside')
+        return 'ok'
+
+    client = app.test_client()
+    assert client.get('/', headers={'X-Request-ID': 'abc123'}).headers['X-Request-ID'] == 'abc123'
+    generated = client.get('/').headers['X-Request-ID']
+    queued.stop()
+
+    assert [json.loads(line)['request_id'] for line in output.getvalue().splitlines()] == ['abc123', generated]
@@ -0,0 +1,59 @@
+import time
+import threading
+from cache import SingleFlight, TTLCache
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = TTLCache(10)
+    cache.set(('get_all_levels',), ('level',))
+    cache.set(('get_sections_by_level', 1), ())
+    assert cache.get(('get_all_levels',)) == (True, ('level',))
+    # A cached empty result is still a hit
+    assert cache.get(('get_sections_by_level', 1)) == (True, ())
+    now[0] = 111.0
+    assert cache.get(('get_all_levels',)) == (False, None)
+    assert len(cache) == 1
+
+
+def test_delete_prefix_and_disabled_cache():
+    cache = TTLCache(300)
+    for key in [('get_sections_by_level', 1), ('get_sections_by_level', 2), ('get_lesson_by_id', 1)]:
+        cache.set(key, 'value')
+    cache.delete_prefix('get_sections_by_level')
+    assert len(cache) == 1 and cache.get(('get_lesson_by_id', 1))[0]
+    cache.delete(('get_lesson_by_id', 1))
+    assert len(cache) == 0
+
+    disabled = TTLCache(0)
+    disabled.set(('get_all_levels',), 'value')
+    assert disabled.get(('get_all_levels',)) == (False, None)
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    runs, results = [], []
+
+    def fetch():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return 'tree'
+
+    leader = threading.Thread(target=lambda: results.append(flight.do('key', fetch)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('key', fetch))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flight.collapsed < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert len(runs) == 1 and sorted(results) == [('tree', False)] + [('tree', True)] * 3
+    # Once done, the next call runs again
+    assert flight.do('key', lambda: 'fresh') == ('fresh', False)
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import multiprocessing
+import pytest
+from benchmarks.fake_supabase import FakeCourseStore, FakeSupabaseClient
+from cache_listener import CacheInvalidationListener
+
+# A disposable database: the test recreates the schema from database_schema.sql
+# and database_migration.sql
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database_schema.sql')
+MIGRATION = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database_migration.sql')
+WORKERS = 3
+
+CACHED_KEYS = [
+    ('get_all_levels',),
+    ('get_sections_by_level', 1),
+    ('get_sections_by_level', 2),
+    ('get_lessons_by_section', 1),
+    ('get_lessons_by_section', 2),
+    ('get_lesson_by_id', 1),
+    ('get_lesson_by_id', 2),
+]
+
+
+def seeded_client():
+    client = FakeSupabaseClient(FakeCourseStore())
+    client.cache.ttl = 300
+    for key in CACHED_KEYS:
+        client.cache.set(key, ['cached'])
+    return client
+
+
+def cached_keys(client):
+    return [key for key in CACHED_KEYS if client.cache.get(key)[0]]
+
+
+def notification(table, op, row, old=None):
+    change = {'table': table, 'op': op, 'row': row}
+    if old:
+        change['old'] = old
+    return json.dumps(change)
+
+
+def test_lesson_update_evicts_only_that_lesson():
+    client = seeded_client()
+    listener = CacheInvalidationListener(client, dsn='')
+    listener.apply(notification('lessons', 'UPDATE', {'id': 1, 'section_id': 1}, {'id': 1, 'section_id': 1}))
+    assert ('get_lesson_by_id', 1) not in cached_keys(client)
+    assert ('get_lessons_by_section', 1) not in cached_keys(client)
+    assert cached_keys(client) == [key for key in CACHED_KEYS
+                                   if key not in {('get_lesson_by_id', 1), ('get_lessons_by_section', 1)}]
+
+
+def test_moved_section_evicts_old_and_new_parent():
+    client = seeded_client()
+    listener = CacheInvalidationListener(client, dsn='')
+    listener.apply(notification('sections', 'UPDATE', {'id': 1, 'level_id': 2}, {'id': 1, 'level_id': 1}))
+    remaining = cached_keys(client)
+    assert ('get_sections_by_level', 1) not in remaining
+    assert ('get_sections_by_level', 2) not in remaining
+    assert ('get_all_levels',) in remaining
+    assert ('get_lessons_by_section', 1) in remaining
+
+
+def test_malformed_payload_is_ignored():
+    client = seeded_client()
+    CacheInvalidationListener(client, dsn='').apply('not json')
+    assert cached_keys(client) == CACHED_KEYS
+
+
+def _worker(dsn, ready, done, results):
+    """A stand-in gunicorn worker: a seeded cache and a listener thread."""
+    client = seeded_client()
+    listener = CacheInvalidationListener(client, dsn)
+    listener.start()
+    listener.listening.wait(10)
+    ready.release()
+    done.wait(10)
+    results.put(cached_keys(client))
+    listener.stop()
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason='set TEST_DATABASE_URL to a disposable PostgreSQL database')
+def test_change_is_evicted_in_every_worker():
+    import psycopg2
+
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        for path in (SCHEMA, MIGRATION):
+            with open(path, encoding='utf-8') as f:
+                cursor.execute(f.read())
+        cursor.execute("INSERT INTO levels (id, title, order_index) VALUES (1, 'Основы', 1)")
+        cursor.execute("INSERT INTO sections (id, level_id, title, order_index) VALUES (1, 1, 'Введение', 1)")
+        cursor.execute("INSERT INTO lessons (id, section_id, title, order_index) VALUES "
+                       "(1, 1, 'Что такое DOM', 1), (2, 1, 'Узлы', 2)")
+
+    context = multiprocessing.get_context('spawn')
+    ready = context.Semaphore(0)
+    done = context.Event()
+    results = context.Queue()
+    workers = [context.Process(target=_worker, args=(TEST_DATABASE_URL, ready, done, results))
+               for _ in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    for _ in workers:
+        assert ready.acquire(timeout=30)
+
+    with conn.cursor() as cursor:
+        cursor.execute("UPDATE lessons SET title = 'Что такое DOM?' WHERE id = 1")
+    # Notifications are delivered asynchronously after the commit
+    time.sleep(1)
+    done.set()
+
+    remaining = [results.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join(10)
+    conn.close()
+
+    expected = [key for key in CACHED_KEYS
+                if key not in {('get_lesson_by_id', 1), ('get_lessons_by_section', 1)}]
+    assert remaining == [expected] * WORKERS
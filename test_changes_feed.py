@@ -0,0 +1,54 @@
+from changes_feed import Cursor, read_changes
+
+
+def read_all(db, cursor=None, limit=5):
+    changes = []
+    while True:
+        page = read_changes(db, cursor, limit, settle_seconds=0)
+        changes += page['changes']
+        cursor = Cursor.decode(page['cursor']) if page['cursor'] else cursor
+        if not page['has_more']:
+            return changes, cursor
+
+
+def test_pages_cover_every_row_once_with_parents_first(db):
+    # All generated rows share one updated_at, so pages split inside ties
+    changes, cursor = read_all(db, limit=5)
+    keys = [(change['table'], change['row']['id']) for change in changes]
+    assert len(keys) == len(set(keys)) == 2 + 4 + 12
+    assert [table for table, _ in keys] == ['levels'] * 2 + ['sections'] * 4 + ['lessons'] * 12
+
+    page = read_changes(db, cursor, settle_seconds=0)
+    assert page['changes'] == [] and not page['has_more']
+    assert Cursor.decode(page['cursor']) == cursor
+
+
+def test_deltas_include_updates_and_cascaded_deletes(db):
+    _, cursor = read_all(db)
+    db.update_lesson(1, 'Новое название', {'theory': ''})
+    db.delete_level(2)
+
+    changes, _ = read_all(db, cursor)
+    assert changes[0]['op'] == 'upsert' and changes[0]['row']['title'] == 'Новое название'
+    deletes = {(change['table'], change['id']) for change in changes if change['op'] == 'delete'}
+    assert deletes == {('levels', 2), ('sections', 3), ('sections', 4)} | {('lessons', i) for i in range(7, 13)}
+
+
+def test_recent_changes_wait_for_the_settle_time(db):
+    _, cursor = read_all(db)
+    db.update_section(1, 'Только что')
+    assert read_changes(db, cursor, settle_seconds=60)['changes'] == []
+    assert len(read_changes(db, cursor, settle_seconds=0)['changes']) == 1
+
+
+def test_changes_endpoint(client, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'CHANGES_SETTLE_SECONDS', 0)
+
+    response = client.get('/api/changes?limit=10')
+    assert response.status_code == 200 and response.headers['Cache-Control'] == 'no-cache'
+    data = response.get_json()
+    assert len(data['changes']) == 10 and data['has_more']
+    rest = client.get(f"/api/changes?since={data['cursor']}&limit=1000").get_json()
+    assert len(rest['changes']) == 8 and not rest['has_more']
+
+    assert client.get('/api/changes?since=not-a-cursor').status_code == 400
@@ -0,0 +1,74 @@
+import gzip
+import brotli
+import pytest
+from flask import Flask
+import compression
+from compression import init_compression, minify_html
+
+PAGE = '''<html>
+  <body>
+    <h1>  Урок  </h1>
+    <pre>  a
+    b</pre>  <code>x  =  1</code>
+    <textarea>  ввод
+</textarea>
+    <script>if (a  <  b) {
+  go();
+}</script>
+    ''' + '<p>Теория   урока</p>\n' * 100 + '''
+  </body>
+</html>
+'''
+
+
+def make_app():
+    app = Flask(__name__)
+    init_compression(app)
+
+    @app.route('/page')
+    def page():
+        return PAGE
+
+    return app
+
+
+def test_whitespace_survives_in_preserved_blocks():
+    html = minify_html(PAGE)
+    assert html.startswith('<html> <body> <h1> Урок </h1>')
+    for block in ('<pre>  a\n    b</pre>', '<code>x  =  1</code>', '<textarea>  ввод\n</textarea>',
+                  '<script>if (a  <  b) {\n  go();\n}</script>'):
+        assert block in html
+    assert '<p>Теория урока</p> <p>' in html
+
+
+@pytest.mark.parametrize('accept, encoding, decode', [
+    ('gzip', 'gzip', gzip.decompress),
+    ('gzip, br', 'br', brotli.decompress),
+    ('br;q=0.5, gzip', 'gzip', gzip.decompress),
+])
+def test_encoding_is_negotiated(accept, encoding, decode):
+    response = make_app().test_client().get('/page', headers={'Accept-Encoding': accept})
+    assert response.headers['Content-Encoding'] == encoding
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert decode(response.data).decode('utf-8') == minify_html(PAGE)
+
+
+def test_compressed_bodies_are_cached_per_encoding(monkeypatch):
+    calls = []
+    real_compress = compression.compress
+    monkeypatch.setattr(compression, 'compress', lambda body, encoding: calls.append(encoding)
+                        or real_compress(body, encoding))
+    client = make_app().test_client()
+
+    gzipped = client.get('/page', headers={'Accept-Encoding': 'gzip'})
+    assert client.get('/page', headers={'Accept-Encoding': 'gzip'}).data == gzipped.data
+    br = client.get('/page', headers={'Accept-Encoding': 'br'})
+    assert br.headers['Content-Encoding'] == 'br' and br.data != gzipped.data
+    assert calls == ['gzip', 'br']
+
+    # A client without gzip/br gets the minified body, never a cached compressed one
+    for accept in ('identity', None):
+        plain = client.get('/page', headers={'Accept-Encoding': accept} if accept else {})
+        assert 'Content-Encoding' not in plain.headers
+        assert 'Accept-Encoding' in plain.headers['Vary']
+        assert plain.get_data(as_text=True) == minify_html(PAGE)
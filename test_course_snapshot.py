@@ -0,0 +1,125 @@
+import json
+import httpx
+import pytest
+from benchmarks.fixtures import generate_course
+from course_snapshot import CourseSnapshot, SnapshotStore, write_snapshot
+from http_transport import build_http_client
+from models import Level, Section, lesson_summary
+from supabase_client import SupabaseClient
+
+
+@pytest.fixture
+def course():
+    return generate_course(12, lessons_per_section=3)
+
+
+@pytest.fixture(autouse=True)
+def supabase_env(monkeypatch, tmp_path):
+    monkeypatch.setenv('SUPABASE_URL', 'http://supabase.test')
+    monkeypatch.setenv('SUPABASE_ANON_KEY', 'header.payload.signature')
+    monkeypatch.delenv('SUPABASE_SERVICE_ROLE_KEY', raising=False)
+    monkeypatch.setenv('COURSE_CACHE_TTL', '300')
+    monkeypatch.setenv('COURSE_SNAPSHOT_PATH', str(tmp_path / 'course.snapshot'))
+
+
+def test_snapshot_round_trip(course, tmp_path):
+    path = str(tmp_path / 'course.snapshot')
+    write_snapshot(path, course['levels'], course['sections'], course['lessons'])
+    snapshot = CourseSnapshot(path)
+
+    assert snapshot.get_all_levels() == course['levels']
+    assert snapshot.get_sections_by_level(2) == [s for s in course['sections'] if s['level_id'] == 2]
+    assert snapshot.get_lessons_by_section(11) == [lesson_summary(l) for l in course['lessons'] if l['section_id'] == 11]
+    assert snapshot.get_lesson_by_id(7) == course['lessons'][6]
+    assert snapshot.get_lesson_by_id(10 ** 6) is None
+    assert snapshot.get_lesson_quizzes((7, 10 ** 6)) == {7: course['lessons'][6]['content']['quiz']}
+
+
+def test_store_picks_up_rewritten_snapshot(course, tmp_path):
+    path = str(tmp_path / 'course.snapshot')
+    store = SnapshotStore(path)
+    assert store.get() is None
+
+    write_snapshot(path, course['levels'], course['sections'], course['lessons'])
+    first = store.get()
+    assert store.get() is first
+
+    write_snapshot(path, course['levels'][:1], [], [])
+    second = store.get()
+    assert second.generation > first.generation
+    assert len(second.get_all_levels()) == 1
+    # The replaced file stays readable through the old mapping
+    assert first.get_lesson_by_id(1) == course['lessons'][0]
+
+
+def test_corrupt_snapshot_is_ignored(tmp_path):
+    path = tmp_path / 'course.snapshot'
+    path.write_bytes(b'not a snapshot at all')
+    assert SnapshotStore(str(path)).get() is None
+
+
+def test_reads_fall_back_to_snapshot_when_supabase_is_down(course):
+    upstream = {'up': True, 'calls': 0}
+
+    def handler(request):
+        upstream['calls'] += 1
+        if not upstream['up']:
+            raise httpx.ConnectError('connection refused', request=request)
+        table = request.url.path.rsplit('/', 1)[-1]
+        offset = int(request.url.params.get('offset', 0))
+        limit = int(request.url.params.get('limit', 1000))
+        rows = course.get(table, [])[offset:offset + limit]
+        return httpx.Response(200, content=json.dumps(rows), headers={'content-type': 'application/json'})
+
+    http_client = build_http_client(transport=httpx.MockTransport(handler), backoff=0, retries=0)
+    client = SupabaseClient(http_client=http_client)
+    assert client.snapshot.write_now(client.fetch_course_rows)
+
+    upstream['up'] = False
+    assert client.get_all_levels() == tuple(Level.from_row(level) for level in course['levels'])
+    assert client.get_lesson_by_id(5).content == course['lessons'][4]['content']
+
+    # Within the retry interval Supabase is not asked again
+    calls = upstream['calls']
+    assert client.get_sections_by_level(1) == tuple(Section.from_row(s) for s in course['sections'] if s['level_id'] == 1)
+    assert upstream['calls'] == calls
+
+    # Snapshot answers are not cached, so recovery is picked up at once
+    upstream['up'] = True
+    client._upstream_down_until = 0.0
+    client.get_all_levels()
+    assert upstream['calls'] == calls + 1
+
+
+def test_load_snapshot_fills_cache_after_checking_for_changes(course):
+    latest = {'time': None}
+    requests = []
+
+    def handler(request):
+        # Only the newest change of each changes feed source is read
+        requests.append(request.url.path.rsplit('/', 1)[-1])
+        assert request.url.params['limit'] == '1' and request.url.params['order'].endswith('.desc')
+        column = request.url.params['select']
+        rows = [{column: latest['time']}] if latest['time'] and column == 'updated_at' else []
+        return httpx.Response(200, content=json.dumps(rows), headers={'content-type': 'application/json'})
+
+    http_client = build_http_client(transport=httpx.MockTransport(handler), backoff=0)
+    client = SupabaseClient(http_client=http_client)
+    high_water = max(row['updated_at'] for row in course['lessons'])
+    write_snapshot(client.snapshot.path, course['levels'], course['sections'], course['lessons'], high_water)
+
+    assert client.load_snapshot() == len(course['levels'])
+    assert requests == ['levels', 'sections', 'lessons', 'course_tombstones']
+    tree = client.get_course_tree()
+    assert sum(len(section.lessons) for level in tree for section in level.sections) == len(course['lessons'])
+
+    # A change made while no worker was running makes the snapshot stale
+    client.cache.clear()
+    latest['time'] = high_water
+    assert client.load_snapshot() == len(course['levels'])
+    latest['time'] = '2999-01-01T00:00:00'
+    assert client.load_snapshot() == 0
+    # A snapshot without a high-water mark cannot be checked
+    write_snapshot(client.snapshot.path, course['levels'], course['sections'], course['lessons'])
+    latest['time'] = high_water
+    assert client.load_snapshot() == 0
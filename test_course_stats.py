@@ -0,0 +1,141 @@
+import os
+import pytest
+from benchmarks.fake_supabase import FakeCourseStore, FakeSupabaseClient
+from benchmarks.fixtures import generate_course
+from models import CourseStats, Stats
+
+# A disposable database: the Postgres test recreates the schema from database_schema.sql
+# and database_migration.sql
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database_schema.sql')
+MIGRATION = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database_migration.sql')
+
+
+def test_course_stats_from_rows():
+    stats = CourseStats.from_rows([
+        {'scope': 'course', 'scope_id': 0, 'levels': 1, 'sections': 2, 'lessons': 3,
+         'quiz_questions': 4, 'tasks': 5, 'content_bytes': 600},
+        {'scope': 'level', 'scope_id': 7, 'sections': 2, 'lessons': 3},
+        {'scope': 'section', 'scope_id': 9, 'level_id': 7, 'lessons': 1, 'tasks': 2},
+    ])
+    assert stats.course == Stats(1, 2, 3, 4, 5, 600)
+    assert stats.levels[7].sections == 2 and stats.levels[7].quiz_questions == 0
+    assert stats.sections[9] == Stats(lessons=1, tasks=2)
+
+
+def test_stats_add_up_and_follow_writes():
+    course = generate_course(4, lessons_per_section=3, sections_per_level=2)
+    db = FakeSupabaseClient(FakeCourseStore(course))
+
+    stats = db.get_course_stats()
+    assert (stats.course.levels, stats.course.sections, stats.course.lessons) == (2, 4, 12)
+    assert stats.course.quiz_questions == sum(len(lesson['content'].get('quiz', [])) for lesson in course['lessons'])
+    assert sum(level.lessons for level in stats.levels.values()) == stats.course.lessons
+    assert sum(section.content_bytes for section in stats.sections.values()) == stats.course.content_bytes
+
+    # Served from the cache until a write invalidates it
+    round_trips = db.store.round_trips
+    assert db.get_course_stats() is stats
+    assert db.store.round_trips == round_trips
+
+    db.create_lesson(1, 'Новый урок', 10, {'quiz': [{}, {}], 'tasks': [{}]})
+    after = db.get_course_stats()
+    assert after.course.lessons == 13
+    assert after.sections[1].quiz_questions == stats.sections[1].quiz_questions + 2
+    assert after.levels[1].tasks == stats.levels[1].tasks + 1
+
+    db.delete_level(2)
+    assert db.get_course_stats().course == Stats(1, 2, 7, after.levels[1].quiz_questions,
+                                                 after.levels[1].tasks, after.levels[1].content_bytes)
+
+
+def run_sql(cursor, path):
+    with open(path, encoding='utf-8') as f:
+        cursor.execute(f.read())
+
+
+def insert_course(cursor, course):
+    from psycopg2.extras import Json
+    for level in course['levels']:
+        cursor.execute("INSERT INTO levels (id, title, order_index) VALUES (%s, %s, %s)",
+                       (level['id'], level['title'], level['order_index']))
+    for section in course['sections']:
+        cursor.execute("INSERT INTO sections (id, level_id, title, order_index) VALUES (%s, %s, %s, %s)",
+                       (section['id'], section['level_id'], section['title'], section['order_index']))
+    for lesson in course['lessons']:
+        cursor.execute("INSERT INTO lessons (id, section_id, title, order_index, content) VALUES (%s, %s, %s, %s, %s)",
+                       (lesson['id'], lesson['section_id'], lesson['title'], lesson['order_index'],
+                        Json(lesson['content'])))
+
+
+STATS_QUERY = ("SELECT scope, scope_id, level_id, levels, sections, lessons, quiz_questions, tasks, content_bytes "
+               "FROM course_stats ORDER BY scope, scope_id")
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason='set TEST_DATABASE_URL to a disposable PostgreSQL database')
+def test_triggers_match_a_rebuild():
+    import psycopg2
+    from psycopg2.extras import Json
+
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    run_sql(cursor, SCHEMA)
+    run_sql(cursor, MIGRATION)
+
+    def assert_matches_rebuild(step):
+        cursor.execute(STATS_QUERY)
+        maintained = cursor.fetchall()
+        cursor.execute("SELECT rebuild_course_stats()")
+        cursor.execute(STATS_QUERY)
+        assert maintained == cursor.fetchall(), step
+
+    insert_course(cursor, generate_course(4, lessons_per_section=3, sections_per_level=2))
+    assert_matches_rebuild('insert')
+
+    cursor.execute("UPDATE lessons SET content = %s WHERE id = 1", (Json({'quiz': [{}], 'tasks': []}),))
+    assert_matches_rebuild('edit content')
+    # Lesson 2 goes to a section of the other level
+    cursor.execute("UPDATE lessons SET section_id = 4, order_index = 100 WHERE id = 2")
+    assert_matches_rebuild('move lesson')
+    cursor.execute("UPDATE sections SET level_id = 2, order_index = 100 WHERE id = 2")
+    assert_matches_rebuild('move section')
+    cursor.execute("DELETE FROM lessons WHERE id = 7")
+    assert_matches_rebuild('delete lesson')
+    cursor.execute("DELETE FROM sections WHERE id = 3")
+    assert_matches_rebuild('delete section')
+    cursor.execute("DELETE FROM levels WHERE id = 1")
+    assert_matches_rebuild('delete level')
+    cursor.execute("SELECT lessons FROM course_stats WHERE scope = 'course'")
+    assert cursor.fetchone()[0] > 0
+    conn.close()
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason='set TEST_DATABASE_URL to a disposable PostgreSQL database')
+def test_migration_upgrades_a_live_database():
+    import psycopg2
+
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    # Only the course tables, with a course in them, as before the migration existed
+    run_sql(cursor, SCHEMA)
+    insert_course(cursor, generate_course(4, lessons_per_section=3, sections_per_level=2))
+
+    # Applying it again changes nothing
+    for _ in range(2):
+        run_sql(cursor, MIGRATION)
+        cursor.execute("SELECT COUNT(*) FROM lessons")
+        assert cursor.fetchone()[0] == 12
+        cursor.execute("SELECT levels, sections, lessons FROM course_stats WHERE scope = 'course'")
+        assert cursor.fetchone() == (2, 4, 12)
+    cursor.execute("SELECT quiz_count(lessons) > 0 FROM lessons WHERE id = 1")
+    assert cursor.fetchone()[0]
+
+    # The triggers are in place
+    cursor.execute("DELETE FROM lessons WHERE id = 1")
+    cursor.execute("SELECT lessons FROM course_stats WHERE scope = 'course'")
+    assert cursor.fetchone()[0] == 11
+    cursor.execute("SELECT table_name, row_id FROM course_tombstones")
+    assert cursor.fetchall() == [('lessons', 1)]
+    conn.close()
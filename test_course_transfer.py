@@ -0,0 +1,64 @@
+import io
+import math
+import itertools
+import pytest
+from benchmarks.fake_supabase import FakeCourseStore, FakeSupabaseClient
+from benchmarks.fixtures import generate_course
+from course_transfer import export_course, import_course
+from supabase_client import PAGE_SIZE
+
+
+@pytest.fixture(scope='module')
+def course():
+    return generate_course(2000, lessons_per_section=5)
+
+
+def test_round_trip_of_10k_lessons(course):
+    assert len(course['lessons']) == 10000
+    source = FakeSupabaseClient(FakeCourseStore(course))
+    target = FakeSupabaseClient(FakeCourseStore())
+
+    lines = export_course(source)
+    header = next(lines)
+    # Pages are fetched as the export is consumed
+    assert source.store.round_trips == 0
+
+    stats = import_course(target, itertools.chain([header], lines), batch_size=300)
+    assert (stats['levels'], stats['sections'], stats['lessons']) == (200, 2000, 10000)
+    assert target.store.tables == source.store.tables
+    pages = sum(len(course[table]) // PAGE_SIZE + 1 for table in course)
+    assert source.store.round_trips == pages
+    batches = sum(math.ceil(len(course[table]) / 300) for table in course)
+    assert target.store.round_trips == batches + 1  # + sync_id_sequences
+
+
+def test_import_replaces_rows_with_the_same_id():
+    course = generate_course(2, lessons_per_section=2)
+    target = FakeSupabaseClient(FakeCourseStore(course))
+    edited = dict(course['lessons'][0], title='Новое название')
+    export = ''.join(export_course(FakeSupabaseClient(FakeCourseStore({'lessons': [edited]}))))
+
+    import_course(target, io.StringIO(export))
+    assert target.store.get('lessons', edited['id'])['title'] == 'Новое название'
+    assert len(target.store.tables['lessons']) == len(course['lessons'])
+
+
+@pytest.mark.parametrize('export, error', [
+    ('', 'empty'),
+    ('{"format": "something-else"}\n', 'Line 1: not a'),
+    ('[1]\n', 'Line 1: not a'),
+    ('{"format": "dom-learn-course", "version": 1}\n\n3\n', 'Line 3 is not a course row'),
+    ('{"format": "dom-learn-course", "version": 1}\n"x"\n', 'Line 2 is not a course row'),
+    ('{"format": "dom-learn-course", "version": 1}\n{"table": "lessons", "row": {"id": 1}}\n'
+     '{"table": "levels", "row": {"id": 1}}\n', 'must come before'),
+    ('{"format": "dom-learn-course", "version": 1}\n{oops\n', 'Line 2'),
+])
+def test_malformed_export_is_rejected(export, error):
+    with pytest.raises(ValueError, match=error):
+        import_course(FakeSupabaseClient(FakeCourseStore()), io.StringIO(export))
+
+
+def test_import_endpoint_names_the_bad_line(admin):
+    export = b'{"format": "dom-learn-course", "version": 1}\n[1]\n'
+    response = admin.post('/bod/import', data={'file': (io.BytesIO(export), 'course.ndjson')})
+    assert response.status_code == 400 and response.get_json()['error'] == 'Line 2 is not a course row'
@@ -0,0 +1,95 @@
+import copy
+import time
+import pytest
+from benchmarks.fake_supabase import FakeCourseStore, FakeSupabaseClient
+from db_routing import REPLAY_HEADER, SESSION_KEY
+
+
+@pytest.fixture
+def stores(store):
+    return store, FakeCourseStore(copy.deepcopy({table: list(rows.values()) for table, rows in store.tables.items()}))
+
+
+def test_reads_use_the_replica_until_a_change(stores):
+    primary, replica = stores
+    db = FakeSupabaseClient(primary, replica=replica)
+    replica.update('levels', 1, {'title': 'С реплики'})
+    assert db.get_all_levels()[0].title == 'С реплики'
+
+    db.update_level(2, 'Новое')
+    # The replica has not caught up; evicted entries are refilled from the primary
+    assert [level.title for level in db.get_all_levels()][1] == 'Новое'
+    assert db.get_all_levels()[0].title != 'С реплики'
+
+    db._primary_until = time.monotonic()
+    db.cache.clear()
+    assert db.get_all_levels()[0].title == 'С реплики'
+
+
+@pytest.fixture
+def db(stores):
+    primary, replica = stores
+    fake = FakeSupabaseClient(primary, replica=replica)
+    fake.cache.ttl = 300
+    fake.replica_lag = 0
+    return fake
+
+
+def test_session_reads_its_writes_from_the_primary(admin, monkeypatch):
+    monkeypatch.setitem(admin.application.config, 'READ_REPLICA', True)
+    admin.get('/')
+    response = admin.post('/bod/update_level/1', data={'title': 'Свежее название'})
+    assert response.status_code == 302
+    with admin.session_transaction() as session:
+        assert session[SESSION_KEY] > time.time()
+
+    # The replica has not caught up: the entries the write evicted are
+    # refilled from the primary, the rest of the tree comes from the cache
+    trips = admin.store.round_trips
+    assert 'Свежее название' in admin.get('/').get_data(as_text=True)
+    assert admin.store.round_trips - trips == 1
+    trips = admin.store.round_trips
+    admin.get('/')
+    admin.get('/level-1')
+    assert admin.store.round_trips == trips
+
+    with admin.session_transaction() as session:
+        session[SESSION_KEY] = time.time() - 1
+    admin.fake.cache.clear()
+    assert 'Свежее название' not in admin.get('/').get_data(as_text=True)
+
+
+def test_writes_are_replayed_to_the_primary_region(admin, monkeypatch):
+    monkeypatch.setitem(admin.application.config, 'PRIMARY_REGION', 'ams')
+    monkeypatch.setitem(admin.application.config, 'FLY_REGION', 'sin')
+
+    response = admin.post('/bod/update_level/1', data={'title': 'Не здесь'})
+    assert response.status_code == 409 and response.headers[REPLAY_HEADER] == 'region=ams'
+    assert admin.fake.store.get('levels', 1)['title'] != 'Не здесь'
+    assert admin.get('/level-1').status_code == 200
+    assert REPLAY_HEADER not in admin.post('/bod/login', data={}).headers
+
+    monkeypatch.setitem(admin.application.config, 'FLY_REGION', 'ams')
+    assert admin.post('/bod/update_level/1', data={'title': 'Здесь'}).status_code == 302
+
+
+def test_without_a_replica_writes_do_not_pin_reads(store, monkeypatch):
+    import routes
+    from app import app
+
+    db = FakeSupabaseClient(store)
+    db.cache.ttl = 300
+    monkeypatch.setattr(routes, 'get_supabase_client', lambda: db)
+    monkeypatch.setitem(app.config, 'READ_REPLICA', False)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+
+    assert client.post('/bod/update_level/1', data={'title': 'Свежее название'}).status_code == 302
+    with client.session_transaction() as session:
+        assert SESSION_KEY not in session
+    assert 'Свежее название' in client.get('/').get_data(as_text=True)
+    # The refilled cache serves the next page
+    trips = store.round_trips
+    client.get('/')
+    assert store.round_trips == trips
@@ -0,0 +1,92 @@
+import math
+import random
+import numpy as np
+import pytest
+from exam_grading import UNANSWERED, ExamQuestion, draw_exam, grade, grade_exam
+
+
+def naive_grade(key, answers):
+    """Per-student loop with the textbook formulas, to check the vectorized pass."""
+    scores = [sum(answer == right for answer, right in zip(row, key)) for row in answers]
+    difficulty, discrimination = [], []
+    for q, right in enumerate(key):
+        x = [1.0 if row[q] == right else 0.0 for row in answers]
+        rest = [score - xi for score, xi in zip(scores, x)]
+        mx, mr = sum(x) / len(x), sum(rest) / len(rest)
+        covariance = sum((a - mx) * (b - mr) for a, b in zip(x, rest))
+        spread = math.sqrt(sum((a - mx) ** 2 for a in x) * sum((b - mr) ** 2 for b in rest))
+        difficulty.append(mx)
+        discrimination.append(covariance / spread if spread else float('nan'))
+    return scores, difficulty, discrimination
+
+
+def test_grading_matches_a_per_student_loop():
+    rng = random.Random(7)
+    key = [rng.randrange(4) for _ in range(30)]
+    # Stronger students answer more questions right, so discrimination is positive
+    answers = [[right if rng.random() < skill else rng.choice([UNANSWERED, 0, 1, 2, 3]) for right in key]
+               for skill in (rng.random() for _ in range(200))]
+
+    report = grade(np.array(key, dtype=np.int8), np.array(answers, dtype=np.int8))
+    scores, difficulty, discrimination = naive_grade(key, answers)
+    assert report.scores.tolist() == scores
+    assert np.allclose(report.difficulty, difficulty)
+    assert np.allclose(report.discrimination, discrimination, equal_nan=True)
+    assert report.discrimination.mean() > 0.2
+    assert report.option_counts.sum(axis=1).tolist() == [200] * 30
+    assert report.option_counts[:, 0].tolist() == [row.count(UNANSWERED) for row in zip(*answers)]
+
+
+def test_report_of_a_small_class():
+    questions = [ExamQuestion(1, n, f'Q{n}', ('a', 'b', 'c'), right) for n, right in enumerate([0, 2])]
+    submissions = [{'student': 'anna', 'answers': [0, 2]},
+                   {'student': 'boris', 'answers': [1, 2]},
+                   {'student': 'vera', 'answers': [None, 2]}]
+
+    report = grade_exam(questions, submissions)
+    assert [(s['student'], s['score'], s['percent']) for s in report['students']] == \
+        [('anna', 2, 100.0), ('boris', 1, 50.0), ('vera', 1, 50.0)]
+    first, second = report['questions']
+    assert first['difficulty'] == 0.333 and first['unanswered'] == 1 and first['option_counts'] == [1, 1, 0]
+    # Everyone got it right: no spread, so no discrimination
+    assert second['difficulty'] == 1.0 and second['discrimination'] is None
+    assert report['mean_percent'] == 66.7
+
+    with pytest.raises(ValueError):
+        grade_exam(questions, [{'answers': [0]}])
+    for answers in ([0, 5], [0, 3], [0, -1], [0, 257], [0, '1'], [0, 1.9], [0, True]):
+        with pytest.raises(ValueError):
+            grade_exam(questions, [{'answers': answers}])
+
+
+def test_exam_endpoints(client):
+    assert client.get('/bod/exam/1').status_code == 401
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+
+    client.fake.get_course_tree()
+    trips = client.store.round_trips
+    exam = client.get('/bod/exam/1?size=5&seed=3').get_json()
+    # The cached tree and one query for the quizzes
+    assert client.store.round_trips - trips == 1
+    assert len(exam['questions']) == 5 and 'correct_answer' not in exam['questions'][0]
+    quizzes = [(lesson.id, client.fake.get_lesson_by_id(lesson.id).content['quiz'])
+               for section in client.fake.get_course_tree()[0].sections for lesson in section.lessons]
+    questions = draw_exam(quizzes, 5, 3)
+    assert [q['question'] for q in exam['questions']] == [q.question for q in questions]
+
+    key = [q.correct_answer for q in questions]
+    response = client.post('/bod/exam/1/grade', json={
+        'size': 5, 'seed': 3,
+        'submissions': [{'student': 1, 'answers': key}, {'student': 2, 'answers': [None] * 5}]})
+    assert [s['score'] for s in response.get_json()['students']] == [5, 0]
+
+    assert client.post('/bod/exam/1/grade', json={'size': 5, 'seed': 3,
+                                                  'submissions': [{'answers': [0]}]}).status_code == 400
+    assert client.post('/bod/exam/1/grade', json={'size': None, 'submissions': []}).status_code == 400
+    for seed in (3.7, True, '3.7'):
+        assert client.post('/bod/exam/1/grade', json={'size': 5, 'seed': seed,
+                                                      'submissions': []}).status_code == 400
+    assert client.get('/bod/exam/1?seed=3.7').status_code == 400
+    assert len(client.get('/bod/exam/1?size=-3').get_json()['questions']) == 1
+    assert client.get('/bod/exam/99').status_code == 404
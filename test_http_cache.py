@@ -0,0 +1,43 @@
+import pytest
+from http_cache import surrogate_keys_for_change
+
+LESSON_URL = '/level-1/section-1-intro/lesson-1-intro'
+
+
+@pytest.mark.parametrize('url', ['/', '/level-1', LESSON_URL])
+def test_matching_etag_gets_304_without_rendering(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag.startswith('W/"')
+    assert response.headers['Last-Modified']
+    assert 'course' in response.headers['Surrogate-Key'].split()
+
+    trips = client.store.round_trips
+    revalidated = client.get(url, headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert revalidated.headers['ETag'] == etag
+    assert client.store.round_trips == trips
+
+
+def test_admin_update_purges_and_changes_validator(client):
+    page = client.get(LESSON_URL)
+    assert page.headers['Surrogate-Key'] == 'course level-1 section-1 lesson-1'
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+
+    response = client.post('/bod/update_lesson/1', data={'title': 'Что такое DOM?', 'theory': '<p>Новая</p>'})
+    assert response.headers['X-Surrogate-Purge'].split() == ['index', 'level-1', 'section-1', 'lesson-1']
+    assert client.get(LESSON_URL, headers={'If-None-Match': page.headers['ETag']}).status_code == 200
+
+
+def test_surrogate_keys_for_change(db):
+    tree = db.get_course_tree()
+    assert surrogate_keys_for_change(tree, 'levels') == ['index']
+    assert surrogate_keys_for_change(tree, 'levels', 2) == ['index', 'level-2']
+    assert surrogate_keys_for_change(tree, 'sections', parent_id=2) == ['index', 'level-2']
+    assert surrogate_keys_for_change(tree, 'sections', 3) == ['index', 'level-2', 'section-3']
+    assert surrogate_keys_for_change(tree, 'lessons', 4) == ['index', 'level-1', 'section-2', 'lesson-4']
+    assert surrogate_keys_for_change(tree, 'lessons', parent_id=4) == ['index', 'level-2', 'section-4']
+    assert surrogate_keys_for_change(tree, 'lessons', 999) == ['course']
@@ -0,0 +1,59 @@
+import os
+import sys
+import subprocess
+import threading
+import supabase_client
+from concurrent.futures import ThreadPoolExecutor
+
+# Cumulative `import app` time allowed, in milliseconds (python -X importtime)
+IMPORT_TIME_BUDGET_MS = float(os.environ.get('IMPORT_TIME_BUDGET_MS', '500'))
+
+# Loaded on first use, never by importing the app
+LAZY_MODULES = ['supabase', 'postgrest', 'httpx', 'http_transport', 'PIL', 'numpy']
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_python(*args):
+    env = dict(os.environ, APP_ENV='development')
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env,
+                          check=True, capture_output=True, text=True)
+
+
+def import_time_ms(module):
+    """Cumulative import time of a module in a fresh interpreter."""
+    stderr = run_python('-X', 'importtime', '-c', f'import {module}').stderr
+    for line in stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    raise AssertionError(f'no importtime entry for {module}')
+
+
+def test_import_app_within_budget():
+    # Best of three absorbs a cold filesystem cache on the first run
+    elapsed = min(import_time_ms('app') for _ in range(3))
+    assert elapsed < IMPORT_TIME_BUDGET_MS, f'import app took {elapsed:.0f} ms'
+
+
+def test_import_app_defers_heavy_modules():
+    check = 'import sys, app; print(" ".join(m for m in sys.argv[1:] if m in sys.modules))'
+    loaded = run_python('-c', check, *LAZY_MODULES).stdout.split()
+    assert loaded == []
+
+
+def test_client_is_built_once_on_first_use(monkeypatch):
+    built = []
+
+    class CountingClient:
+        def __init__(self):
+            built.append(threading.get_ident())
+
+    monkeypatch.setattr(supabase_client, '_client', None)
+    monkeypatch.setattr(supabase_client, 'SupabaseClient', CountingClient)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        clients = list(pool.map(lambda _: supabase_client.get_supabase_client(), range(64)))
+
+    assert len(built) == 1
+    assert all(client is clients[0] for client in clients)
@@ -0,0 +1,57 @@
+import pytest
+from dataclasses import FrozenInstanceError
+from benchmarks.fake_supabase import FakeCourseStore, FakeSupabaseClient
+from benchmarks.fixtures import generate_course
+from models import Lesson
+
+
+@pytest.fixture
+def client():
+    client = FakeSupabaseClient(FakeCourseStore(generate_course(3, lessons_per_section=2)))
+    client.cache.ttl = 300
+    return client
+
+
+def test_course_tree_is_shared_and_immutable(client):
+    tree = client.get_course_tree()
+    assert client.get_course_tree() is tree
+    section = tree[0].sections[0]
+    # Lessons in the tree are the cached per-section tuple, not copies
+    assert section.lessons is client.get_lessons_by_section(section.id)
+    with pytest.raises(FrozenInstanceError):
+        section.title = 'changed'
+    assert not hasattr(section, '__dict__')
+
+
+def test_lesson_content_is_loaded_on_access(client):
+    lesson = client.get_course_tree()[0].sections[0].lessons[0]
+    assert lesson.loaded_content is None
+    trips = client.store.round_trips
+    assert lesson.content == client.store.get('lessons', lesson.id)['content']
+    assert client.store.round_trips == trips + 1
+    # Later accesses are served from the get_lesson_by_id cache
+    assert lesson.content['theory']
+    assert client.store.round_trips == trips + 1
+
+
+def test_lesson_lists_carry_counts_instead_of_content(client):
+    lesson = client.get_lessons_by_section(1)[0]
+    content = client.store.get('lessons', lesson.id)['content']
+    assert lesson.loaded_content is None
+    assert (lesson.quiz_count, lesson.tasks_count) == (len(content['quiz']), len(content.get('tasks') or []))
+    # Like PostgREST, the fake server rejects columns the schema does not have
+    with pytest.raises(Exception, match='column lessons.quiz_total does not exist'):
+        client.client.table('lessons').select('id,quiz_total').execute()
+
+
+def test_write_evicts_course_tree(client):
+    tree = client.get_course_tree()
+    client.update_level(tree[0].id, 'Новое название')
+    assert client.get_course_tree()[0].title == 'Новое название'
+
+
+def test_counts_are_derived_from_content():
+    lesson = Lesson.from_row({'id': 1, 'section_id': 1, 'title': 'DOM', 'order_index': 1,
+                              'content': {'quiz': [{}, {}], 'tasks': [{}]}})
+    assert (lesson.quiz_count, lesson.tasks_count) == (2, 1)
+    assert lesson.content == {'quiz': [{}, {}], 'tasks': [{}]}
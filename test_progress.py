@@ -0,0 +1,79 @@
+from benchmarks.fake_supabase import FakeSupabaseClient
+from progress import (LessonIndex, decode_bitmap, encode_bitmap, level_progress, progress_summary,
+                      parse_cookie, COOKIE_NAME, COOKIE_PATH)
+
+LEARNER = '0b5d2f3e-8c1a-4f7e-9d6b-2a4c6e8f0a1b'
+
+
+def test_level_progress_from_the_bitmap(store):
+    index = LessonIndex.from_tree(FakeSupabaseClient(store).get_course_tree())
+    assert index.levels == {1: (0, 6), 2: (6, 12)}
+
+    bits = 0
+    for lesson_id in (1, 2, 4, 8):
+        bits |= 1 << index.ordinals[lesson_id]
+    assert level_progress(bits, index, 1) == {'done': 3, 'total': 6, 'percent': 50, 'next_lesson_id': 3}
+    assert level_progress(bits, index, 2)['next_lesson_id'] == 7
+    assert progress_summary(bits, index)['completed'] == [1, 2, 4, 8]
+
+    assert encode_bitmap(bits) == '\\x8b'
+    assert decode_bitmap(encode_bitmap(bits)) == bits and decode_bitmap('\\x') == 0
+    assert parse_cookie(f'{LEARNER}.3') == (LEARNER, 3) and parse_cookie('nonsense.1') == (None, 0)
+
+
+def test_bitmaps_follow_reordered_and_deleted_lessons(store):
+    db = FakeSupabaseClient(store)
+    index = LessonIndex.from_tree(db.get_course_tree())
+    for lesson_id in (2, 3, 5):
+        db.progress.complete(LEARNER, lesson_id, index)
+
+    # Move lesson 3 to the front of its section and delete lesson 2
+    store.update('lessons', 3, {'order_index': 0})
+    db.delete_lesson(2)
+    moved = LessonIndex.from_tree(db.get_course_tree())
+    assert moved.version != index.version and moved.ordinals[3] == 0
+
+    # Another worker, which never saw the old ordering, remaps the stored bitmap
+    other = FakeSupabaseClient(store)
+    progress = other.progress.load(LEARNER, moved)
+    assert progress_summary(progress.bits, moved)['completed'] == [3, 5]
+    assert level_progress(progress.bits, moved, 1)['next_lesson_id'] == 1
+
+    other.progress.complete(LEARNER, 1, moved)
+    assert store.learners[LEARNER]['lesson_order'] == moved.version
+
+
+def test_concurrent_workers_keep_both_completions(store):
+    first, second = FakeSupabaseClient(store), FakeSupabaseClient(store)
+    index = LessonIndex.from_tree(first.get_course_tree())
+    first.progress.complete(LEARNER, 1, index)
+    second.progress.load(LEARNER, index)
+    first.progress.complete(LEARNER, 2, index)
+
+    # The second worker's cached bitmap is one revision behind; its save loses the race and retries
+    saved = second.progress.complete(LEARNER, 3, index)
+    assert saved.revision == 3 and progress_summary(saved.bits, index)['completed'] == [1, 2, 3]
+
+    # A stale worker reads again when the cookie has a newer revision
+    third = FakeSupabaseClient(store)
+    third.progress.load(LEARNER, index)
+    second.progress.complete(LEARNER, 4, index)
+    assert progress_summary(third.progress.load(LEARNER, index).bits, index)['completed'] == [1, 2, 3]
+    assert progress_summary(third.progress.load(LEARNER, index, 4).bits, index)['completed'] == [1, 2, 3, 4]
+
+
+def test_progress_endpoints(client):
+    assert client.get('/api/progress').get_json()['completed'] == []
+    response = client.post('/api/progress/4')
+    assert response.status_code == 200 and response.headers['Cache-Control'] == 'no-store'
+    assert f'Path={COOKIE_PATH}' in response.headers['Set-Cookie']
+    cookie = client.get_cookie(COOKIE_NAME, path=COOKIE_PATH)
+    assert parse_cookie(cookie.value)[1] == 1
+
+    client.post('/api/progress/1')
+    data = client.get('/api/progress').get_json()
+    assert data['completed'] == [1, 4]
+    assert data['levels']['1'] == {'done': 2, 'total': 6, 'percent': 33, 'next_lesson_id': 2}
+    assert client.post('/api/progress/999').status_code == 404
+    # Public pages do not get the cookie
+    assert client.get_cookie(COOKIE_NAME, path='/') is None
@@ -0,0 +1,73 @@
+from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
+from rate_limit import RateLimiter, init_rate_limit, route_group
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_refills_at_rate():
+    clock = Clock()
+    limiter = RateLimiter({'public': {'per_ip': (2, 3)}}, clock=clock)
+    assert [limiter.check('public', '1.1.1.1') for _ in range(3)] == [0, 0, 0]
+    assert limiter.check('public', '1.1.1.1') == 0.5
+    # Other clients have their own bucket
+    assert limiter.check('public', '2.2.2.2') == 0
+    clock.now = 0.5
+    assert limiter.check('public', '1.1.1.1') == 0
+    assert limiter.check('public', '1.1.1.1') > 0
+
+
+def test_global_bucket_caps_all_clients():
+    limiter = RateLimiter({'api': {'per_ip': (10, 10), 'global': (1, 2)}}, clock=Clock())
+    assert limiter.check('api', 'a') == 0
+    assert limiter.check('api', 'b') == 0
+    assert limiter.check('api', 'c') == 1.0
+
+
+def test_global_reject_keeps_the_client_token():
+    clock = Clock()
+    limiter = RateLimiter({'api': {'per_ip': (0.1, 1), 'global': (1, 1)}}, clock=clock)
+    assert limiter.check('api', 'a') == 0
+    assert limiter.check('api', 'b') == 1.0
+    clock.now = 1.0
+    # b was turned away by the global bucket and still has its one token
+    assert limiter.check('api', 'b') == 0
+
+
+def test_route_groups():
+    assert route_group('GET', '/static/css/style.css') is None
+    assert route_group('GET', '/level-1') == 'public'
+    assert route_group('POST', '/bod/login') == 'login'
+    assert route_group('POST', '/bod/upload_image') == 'upload'
+    assert route_group('POST', '/bod/delete_lesson/3') == 'admin'
+    assert route_group('GET', '/bod') == 'admin'
+    assert route_group('GET', '/bod/edit_lesson/3') == 'admin'
+    assert route_group('GET', '/api/lessons/3') == 'api'
+
+
+def test_over_limit_request_gets_429_before_the_view():
+    app = Flask(__name__)
+    app.config.update(RATE_LIMIT_ENABLED=True, RATE_LIMITS={'public': {'per_ip': (0.1, 2)}})
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+    init_rate_limit(app)
+    calls = []
+
+    @app.route('/')
+    def index():
+        calls.append(1)
+        return 'ok'
+
+    client = app.test_client()
+    forwarded = {'X-Forwarded-For': '203.0.113.7'}
+    assert [client.get('/', headers=forwarded).status_code for _ in range(3)] == [200, 200, 429]
+    response = client.get('/', headers=forwarded)
+    assert response.headers['Retry-After'] == '10'
+    assert len(calls) == 2
+    # The limit follows the forwarded client address, not the proxy's
+    assert client.get('/', headers={'X-Forwarded-For': '203.0.113.8'}).status_code == 200
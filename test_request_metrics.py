@@ -0,0 +1,70 @@
+import re
+import asyncio
+import logging
+from flask import Flask, render_template_string
+from request_metrics import db_call, init_request_metrics, record_cache_hit, record_snapshot_read
+
+
+@db_call
+def get_level(level_id):
+    return {'id': level_id}
+
+
+@db_call
+async def get_section(section_id):
+    return {'id': section_id}
+
+
+def make_app(threshold):
+    app = Flask(__name__)
+    app.config['ROUNDTRIP_WARN_THRESHOLD'] = threshold
+    init_request_metrics(app)
+
+    @app.route('/levels/<int:count>')
+    def levels(count):
+        found = [get_level(n) for n in range(count)]
+        found.append(asyncio.run(get_section(1)))
+        record_cache_hit()
+        return render_template_string('{% for l in found %}<p>{{ l.id }}</p>{% endfor %}', found=found)
+
+    @app.route('/snapshot')
+    def snapshot():
+        for n in range(5):
+            record_snapshot_read()
+            get_level(n)
+        return 'ok'
+
+    return app
+
+
+def timing(response):
+    return dict(re.findall(r'(\w+);(?:dur=[\d.]+;)?(?:desc="([^"]*)")?', response.headers['Server-Timing']))
+
+
+def test_server_timing_counts_calls_and_render_time():
+    response = make_app(10).test_client().get('/levels/3')
+    header = response.headers['Server-Timing']
+    assert timing(response) == {'db': '4 calls', 'cache': '1 hits', 'tpl': '', 'app': ''}
+    assert re.search(r'tpl;dur=\d+\.\d', header) and re.search(r'app;dur=\d+\.\d', header)
+    assert timing(make_app(10).test_client().get('/snapshot'))['snapshot'] == '5 reads'
+
+
+def test_request_log_line(caplog):
+    with caplog.at_level(logging.INFO, logger='request_metrics'):
+        make_app(10).test_client().get('/levels/2')
+    fields = caplog.records[-1].fields
+    assert fields['event'] == 'request' and fields['endpoint'] == 'levels' and fields['status'] == 200
+    assert fields['db_calls'] == 3 and fields['cache_hits'] == 1 and fields['template_ms'] >= 0
+
+
+def test_warning_above_the_round_trip_threshold(caplog):
+    client = make_app(3).test_client()
+    with caplog.at_level(logging.WARNING, logger='request_metrics'):
+        client.get('/levels/2')
+        assert not caplog.records
+        client.get('/levels/3')
+        assert 'made 4 Supabase round trips (threshold 3)' in caplog.records[-1].getMessage()
+        caplog.clear()
+        # Reads served from the snapshot made no round trip
+        client.get('/snapshot')
+        assert not caplog.records
@@ -0,0 +1,56 @@
+import tracemalloc
+from flask import Flask, session
+from request_profiler import (PROFILE_HEADER, PROFILE_PARAM, init_request_profiler, list_profiles,
+                              load_profile, make_profile_token)
+
+
+def make_app(tmp_path):
+    app = Flask(__name__, instance_path=str(tmp_path))
+    app.secret_key = 'test'
+    init_request_profiler(app, lambda: session.get('admin_logged_in', False))
+
+    @app.route('/tracing')
+    def tracing():
+        return {'tracing': tracemalloc.is_tracing()}
+
+    return app
+
+
+def test_profiling_needs_a_signed_token_and_an_admin_session(tmp_path):
+    app = make_app(tmp_path)
+    client = app.test_client()
+    token = make_profile_token(app)
+
+    # A valid token alone is not enough
+    response = client.get(f'/tracing?{PROFILE_PARAM}={token}')
+    assert 'X-Profile-Id' not in response.headers and not response.json['tracing']
+
+    with client.session_transaction() as s:
+        s['admin_logged_in'] = True
+    other = Flask(__name__)
+    other.secret_key = 'other'
+    for forged in ('nonsense', make_profile_token(other)):
+        response = client.get(f'/tracing?{PROFILE_PARAM}={forged}')
+        assert 'X-Profile-Id' not in response.headers and not response.json['tracing']
+    assert 'X-Profile-Id' not in client.get('/tracing').headers
+    assert list_profiles(app) == []
+
+    response = client.get(f'/tracing?{PROFILE_PARAM}={token}')
+    profile = load_profile(app, response.headers['X-Profile-Id'])
+    assert profile['path'] == f'/tracing?{PROFILE_PARAM}={token}' and profile['status'] == 200
+    assert profile['endpoint'] == 'tracing' and profile['memory_peak'] > 0
+    response = client.get('/tracing', headers={PROFILE_HEADER: token})
+    assert 'X-Profile-Id' in response.headers
+    assert {p['id'] for p in list_profiles(app)} == {response.headers['X-Profile-Id'], profile['id']}
+
+
+def test_tracemalloc_runs_only_while_profiling(tmp_path):
+    app = make_app(tmp_path)
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['admin_logged_in'] = True
+
+    assert not tracemalloc.is_tracing()
+    assert client.get(f'/tracing?{PROFILE_PARAM}={make_profile_token(app)}').json['tracing']
+    assert not tracemalloc.is_tracing()
+    assert not client.get('/tracing').json['tracing']
@@ -0,0 +1,65 @@
+import re
+import zlib
+import logging
+import brotli
+from flask import make_response, render_template
+from compression import compress, compress_stream, minify_html
+from streaming import FLUSH_MARKER, _flushed_chunks
+
+LESSON_URL = '/level-1/section-1-intro/lesson-1-intro'
+
+
+def test_chunks_are_cut_at_flush_markers():
+    rendered = ['<head>', '<h1>Урок</h1>', FLUSH_MARKER + '\n<div>', 'Теория', '</div>' + FLUSH_MARKER, '<nav></nav>']
+    chunks = list(_flushed_chunks(rendered, minify=False))
+    assert chunks == ['<head><h1>Урок</h1>', '\n<div>Теория</div>', '<nav></nav>']
+
+
+def test_each_compressed_chunk_decodes_on_arrival():
+    chunks = ['<p>Введение</p>' * 50, '<p>Теория</p>' * 50, '<nav></nav>']
+
+    gzip_blocks = list(compress_stream(chunks, 'gzip'))
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk, block in zip(chunks, gzip_blocks):
+        assert decoder.decompress(block) == chunk.encode('utf-8')
+
+    br_decoder = brotli.Decompressor()
+    for chunk, block in zip(chunks, compress_stream(chunks, 'br')):
+        assert br_decoder.process(block) == chunk.encode('utf-8')
+
+
+def test_unflushed_stream_compresses_like_the_whole_body():
+    lines = [f'{{"table": "lessons", "row": {{"id": {n}, "title": "Урок {n}"}}}}\n' for n in range(2000)]
+    body = ''.join(lines).encode('utf-8')
+    for encoding, decode in (('gzip', lambda data: zlib.decompress(data, 16 + zlib.MAX_WBITS)),
+                             ('br', brotli.decompress)):
+        flushed = b''.join(compress_stream(lines, encoding))
+        unflushed = b''.join(compress_stream(lines, encoding, flush_chunks=False))
+        assert decode(unflushed) == body
+        assert len(unflushed) < 1.1 * len(compress(body, encoding)) < len(flushed)
+
+
+def test_minified_chunks_match_minifying_the_whole_page():
+    rendered = ['  <head>\n', '<title>Урок</title>  ' + FLUSH_MARKER, '\n  <p>Теория</p>\n' + FLUSH_MARKER,
+                '  \n' + FLUSH_MARKER, '<pre>  код\n</pre>  ', FLUSH_MARKER + ' <nav></nav>\n']
+    whole = minify_html(''.join(rendered).replace(FLUSH_MARKER, ''))
+    assert ''.join(_flushed_chunks(rendered, minify=True)) == whole
+
+
+def test_lesson_page_stream_matches_the_plain_render(client, monkeypatch, caplog):
+    import routes
+    monkeypatch.setitem(client.application.config, 'MINIFY_HTML', True)
+
+    with caplog.at_level(logging.INFO, logger='request_metrics'):
+        streamed = client.get(LESSON_URL)
+        assert streamed.is_streamed
+        body = streamed.get_data(as_text=True)
+        streamed.close()
+    # The first chunk renders before the headers are sent; the log line has the full render
+    assert float(re.search(r'tpl;dur=([\d.]+)', streamed.headers['Server-Timing']).group(1)) > 0
+    logged = [record.fields for record in caplog.records if getattr(record, 'fields', {}).get('event') == 'request']
+    assert logged[-1]['endpoint'] == 'lesson_page' and logged[-1]['template_ms'] > 0
+
+    monkeypatch.setattr(routes, 'stream_flushed_template', lambda name, **context: make_response(
+        minify_html(render_template(name, **context).replace(FLUSH_MARKER, ''))))
+    assert client.get(LESSON_URL).get_data(as_text=True) == body
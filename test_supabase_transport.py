@@ -0,0 +1,186 @@
+import json
+import time
+import asyncio
+import threading
+import httpx
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from async_supabase_client import AsyncSupabaseClient, WorkerLoop
+from http_transport import build_async_http_client, build_http_client
+from models import Level
+from supabase_client import SupabaseClient
+
+# Any JWT-shaped string passes the supabase-py key check
+TEST_KEY = 'header.payload.signature'
+
+
+@pytest.fixture(autouse=True)
+def supabase_env(monkeypatch):
+    monkeypatch.setenv('SUPABASE_URL', 'http://supabase.test')
+    monkeypatch.setenv('SUPABASE_ANON_KEY', TEST_KEY)
+    monkeypatch.delenv('SUPABASE_SERVICE_ROLE_KEY', raising=False)
+    monkeypatch.setenv('COURSE_CACHE_TTL', '0')
+    monkeypatch.setenv('COURSE_SNAPSHOT_PATH', '')
+
+
+def make_client(handler, **kwargs):
+    http_client = build_http_client(transport=httpx.MockTransport(handler), backoff=0, **kwargs)
+    return SupabaseClient(http_client=http_client)
+
+
+def json_response(status, data):
+    return httpx.Response(status, content=json.dumps(data), headers={'content-type': 'application/json'})
+
+
+def test_reads_retry_transient_502():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return json_response(502, {'message': 'Bad gateway'})
+        return json_response(200, [{'id': 1, 'title': 'Основы DOM', 'order_index': 1}])
+
+    client = make_client(handler)
+    assert client.get_all_levels() == (Level(id=1, title='Основы DOM', order_index=1),)
+    assert len(calls) == 3
+
+
+def test_reads_retry_connection_errors():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ConnectError('connection refused', request=request)
+        return json_response(200, [])
+
+    client = make_client(handler)
+    assert client.get_all_levels() == ()
+    assert len(calls) == 2
+
+
+def test_reads_give_up_after_retries():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return json_response(504, {'message': 'Gateway timeout'})
+
+    client = make_client(handler, retries=2)
+    assert client.get_all_levels() == ()
+    assert len(calls) == 3
+
+
+def test_writes_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return json_response(502, {'message': 'Bad gateway'})
+
+    client = make_client(handler)
+    assert client.create_level('Новый уровень', 1) is None
+    assert [request.method for request in calls] == ['POST']
+
+
+def test_shared_client_is_thread_safe():
+    """Many threads share one client the way gthread workers do."""
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def handler(request):
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        level_id = int(request.url.params['level_id'].removeprefix('eq.'))
+        threading.Event().wait(0.001)
+        with lock:
+            in_flight -= 1
+        return json_response(200, [
+            {'id': level_id * 100 + i, 'level_id': level_id, 'title': f'Раздел {i}', 'order_index': i}
+            for i in range(1, 4)
+        ])
+
+    client = make_client(handler)
+
+    def worker(level_id):
+        for _ in range(25):
+            sections = client.get_sections_by_level(level_id)
+            assert [s.level_id for s in sections] == [level_id] * 3
+            assert [s.id for s in sections] == [level_id * 100 + i for i in range(1, 4)]
+        return level_id
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        assert sorted(pool.map(worker, range(1, 33))) == list(range(1, 33))
+    assert max_in_flight > 1
+
+
+def test_lesson_lists_do_not_fetch_content():
+    selects = {}
+
+    def handler(request):
+        selects[request.url.params['select']] = request.url.path
+        return json_response(200, [])
+
+    client = make_client(handler)
+    client.get_lessons_by_section(1)
+    client.get_lesson_by_id(1)
+
+    summary, full = list(selects)
+    assert 'content' not in summary.split(',') and 'quiz_count' in summary.split(',')
+    assert 'content' in full.split(',')
+
+
+def test_concurrent_identical_reads_share_one_query():
+    threads = 16
+    calls = []
+    release = threading.Event()
+
+    def handler(request):
+        calls.append(request)
+        # Hold the first query until every other thread is waiting on it
+        release.wait(5)
+        return json_response(200, [{'id': 1, 'title': 'Основы DOM', 'order_index': 1}])
+
+    client = make_client(handler)
+
+    def wait_for_followers():
+        deadline = time.monotonic() + 5
+        while client._inflight.collapsed < threads - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+
+    threading.Thread(target=wait_for_followers).start()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda _: client.get_all_levels(), range(threads)))
+
+    assert len(calls) == 1
+    assert client._inflight.collapsed == threads - 1
+    assert all(result is results[0] for result in results)
+
+
+
+def test_worker_async_client_is_shared_by_event_loops():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.method)
+        if len(calls) == 1:
+            return json_response(502, {'message': 'Bad gateway'})
+        return json_response(200, [{'id': 1, 'title': 'Основы DOM', 'order_index': 1}])
+
+    http_client = build_async_http_client(transport=httpx.MockTransport(handler), backoff=0)
+    db = AsyncSupabaseClient(http_client=http_client, worker_loop=WorkerLoop())
+    db.worker_loop.run_sync(db._ensure_connection())
+
+    # Each async view runs on a new event loop; the queries run on the worker's
+    for _ in range(2):
+        assert asyncio.run(db.run(db.get_all_levels())) == (Level(id=1, title='Основы DOM', order_index=1),)
+    # The first read was retried
+    assert calls == ['GET', 'GET', 'GET']
+
+    db.worker_loop.run_sync(db.close())
+    assert http_client.is_closed and db.client is None
@@ -0,0 +1,134 @@
+import os
+import runpy
+import logging
+import threading
+import pytest
+from flask import Flask
+import supabase_client
+import warmup
+from benchmarks.fake_supabase import FakeSupabaseClient
+from changes_feed import SOURCES
+from config import CONFIGS, DevelopmentConfig, ProductionConfig, get_config
+from course_snapshot import SnapshotStore
+
+TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+GUNICORN_CONF = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+
+
+def test_production_config(monkeypatch):
+    monkeypatch.setenv('APP_ENV', 'Production')
+    assert get_config() is ProductionConfig
+    assert get_config('development') is DevelopmentConfig
+    with pytest.raises(ValueError):
+        get_config('staging')
+
+    config = ProductionConfig
+    assert not config.DEBUG and not config.TEMPLATES_AUTO_RELOAD
+    assert config.LOG_JSON and config.LOG_LEVEL == logging.INFO
+    assert config.WARMUP_ON_START and config.JINJA_BYTECODE_CACHE and config.CACHE_INVALIDATION_LISTENER
+    assert config.LOGGER_LEVELS['werkzeug'] == logging.WARNING
+    # Development keeps the conveniences production turns off
+    assert DevelopmentConfig.DEBUG and not DevelopmentConfig.WARMUP_ON_START
+    assert set(CONFIGS) == {'development', 'production'}
+
+
+def test_gunicorn_preloads_and_warms_up(monkeypatch):
+    # A copy of the environment without APP_ENV, so the one the config sets does not leak
+    environ = {name: value for name, value in os.environ.items() if name != 'APP_ENV'}
+    monkeypatch.setattr(os, 'environ', {**environ, 'WEB_CONCURRENCY': '3'})
+    conf = runpy.run_path(GUNICORN_CONF)
+    assert os.environ['APP_ENV'] == 'production'
+    assert conf['preload_app'] and conf['workers'] == 3 and conf['worker_class'] == 'gthread'
+
+    import cache_listener
+    from app import app
+    calls = []
+    monkeypatch.setattr(warmup, 'warmup_templates', lambda app: calls.append('templates'))
+    monkeypatch.setattr(warmup, 'warmup_course', lambda app: calls.append('course'))
+    monkeypatch.setattr(cache_listener, 'start_listener', lambda app: calls.append('listener'))
+
+    monkeypatch.setitem(app.config, 'WARMUP_ON_START', True)
+    conf['when_ready'](None)
+    conf['post_worker_init'](None)
+    assert calls == ['templates', 'listener', 'course']
+
+    calls.clear()
+    monkeypatch.setitem(app.config, 'WARMUP_ON_START', False)
+    conf['when_ready'](None)
+    conf['post_worker_init'](None)
+    assert calls == ['listener']
+
+
+def test_warmup_course_fills_the_cache_and_writes_a_snapshot(store, tmp_path, monkeypatch):
+    from app import app
+    path = str(tmp_path / 'course.snapshot')
+    first = FakeSupabaseClient(store)
+    first.cache.ttl = 300
+    first.snapshot = SnapshotStore(path)
+    monkeypatch.setattr(supabase_client, 'get_supabase_client', lambda: first)
+    warmup.warmup_course(app)
+    assert os.path.exists(path)
+    trips = store.round_trips
+    first.get_course_tree()
+    assert store.round_trips == trips
+
+    # The next worker boots from the snapshot after checking each changes feed source for changes
+    second = FakeSupabaseClient(store)
+    second.cache.ttl = 300
+    second.snapshot = SnapshotStore(path)
+    monkeypatch.setattr(supabase_client, 'get_supabase_client', lambda: second)
+    warmup.warmup_course(app)
+    assert len(second.get_course_tree()) == 2
+    assert store.round_trips == trips + len(SOURCES)
+
+    # A change made while no worker was running is not served from the old snapshot
+    store.update('lessons', 1, {'title': 'Новое название', 'updated_at': '2999-01-01T00:00:00'})
+    third = FakeSupabaseClient(store)
+    third.cache.ttl = 300
+    third.snapshot = SnapshotStore(path)
+    monkeypatch.setattr(supabase_client, 'get_supabase_client', lambda: third)
+    warmup.warmup_course(app)
+    assert third.get_course_tree()[0].sections[0].lessons[0].title == 'Новое название'
+    assert third.snapshot.get().high_water == '2999-01-01T00:00:00'
+
+
+def test_one_worker_at_a_time_builds_the_snapshot(tmp_path):
+    path = str(tmp_path / 'course.snapshot')
+    building, waited = threading.Event(), []
+
+    def other_worker():
+        with SnapshotStore(path).build_lock():
+            waited.append(building.is_set())
+
+    with SnapshotStore(path).build_lock():
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        thread.join(0.2)
+        # Still waiting for the lock
+        assert thread.is_alive() and waited == []
+        building.set()
+    thread.join(5)
+    assert waited == [True]
+
+
+def templates_app(cache_dir):
+    app = Flask(__name__, template_folder=TEMPLATES)
+    app.config.update(JINJA_BYTECODE_CACHE=True, JINJA_BYTECODE_CACHE_DIR=str(cache_dir))
+    warmup.init_template_cache(app)
+    return app
+
+
+def test_second_boot_reuses_the_compiled_templates(tmp_path, monkeypatch):
+    first = templates_app(tmp_path)
+    names = warmup.warmup_templates(first)
+    assert 'lesson.html' in names and 'admin/dashboard.html' in names
+    assert len(list(tmp_path.glob('__jinja2_*.cache'))) == len(names)
+
+    second = templates_app(tmp_path)
+    compiled = []
+    compile_source = second.jinja_env.compile
+    monkeypatch.setattr(second.jinja_env, 'compile', lambda *args, **kwargs: compiled.append(args[1])
+                        or compile_source(*args, **kwargs))
+    assert set(warmup.warmup_templates(second)) == set(names)
+    assert compiled == []
+
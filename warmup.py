@@ -0,0 +1,79 @@
+"""
+Warmup hooks run before a worker starts accepting traffic.
+"""
+import os
+import time
+import logging
+from jinja2 import FileSystemBytecodeCache
+
+logger = logging.getLogger(__name__)
+
+
+def init_template_cache(app):
+    """Use a persistent Jinja bytecode cache shared by all workers on the machine.
+
+    Compiled templates are stored in JINJA_BYTECODE_CACHE_DIR (default:
+    instance/jinja_cache) keyed by template source checksum, so a deploy
+    with changed templates recompiles only those.
+    """
+    if not app.config.get('JINJA_BYTECODE_CACHE'):
+        return
+    directory = app.config.get('JINJA_BYTECODE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def warmup_templates(app):
+    """Load and compile every template into the Jinja environment cache.
+
+    Returns:
+        dict mapping template name to load time in milliseconds
+    """
+    start = time.perf_counter()
+    timings = {}
+    for name in app.jinja_env.list_templates():
+        template_start = time.perf_counter()
+        app.jinja_env.get_template(name)
+        timings[name] = (time.perf_counter() - template_start) * 1000
+
+    source = 'bytecode cache' if app.jinja_env.bytecode_cache else 'source'
+    slowest = ', '.join(f"{name} {ms:.1f} ms" for name, ms in
+                        sorted(timings.items(), key=lambda item: -item[1])[:3])
+    logger.info("Loaded %s templates from %s in %.1f ms (slowest: %s)",
+                len(timings), source, (time.perf_counter() - start) * 1000, slowest)
+    return timings
+
+
+def warmup_course(app):
+    """Populate the data-layer cache with the full course tree.
+
+    A current on-disk snapshot is used when there is one, so the worker
+    makes a single Supabase round trip at boot; otherwise the tree is
+    fetched and the snapshot rewritten. Workers hold the snapshot's build
+    lock meanwhile, so only the first of them rebuilds it and the others
+    load what it wrote.
+    """
+    from supabase_client import get_supabase_client
+
+    start = time.perf_counter()
+    client = get_supabase_client()
+    with client.snapshot.build_lock():
+        level_count = client.load_snapshot()
+        if level_count:
+            logger.info("Loaded course tree (%s levels) from snapshot in %.1f ms",
+                        level_count, (time.perf_counter() - start) * 1000)
+            return
+
+        with app.app_context():
+            levels = client.get_course_tree()
+        logger.info("Loaded course tree (%s levels) in %.1f ms", len(levels), (time.perf_counter() - start) * 1000)
+        if levels:
+            client.snapshot.write_now(client.fetch_course_rows)
+
+
+def warmup(app):
+    """Run all warmup steps if the app config enables them."""
+    if not app.config.get('WARMUP_ON_START'):
+        return
+    warmup_templates(app)
+    warmup_course(app)